@@ -0,0 +1,256 @@
+"""
+Goal Quest Achievement Backfill - Evaluate achievements over full history
+Loads a user's completion log into NumPy arrays once and derives every
+streak, count, perfect-day and diversity counter in vectorized passes, then
+bulk-inserts the unlocked Achievement rows and refreshes achievement_progress.
+Used when importing or migrating users instead of replaying events one by one.
+
+Run from the command line:
+    python achievement_backfill.py [--user-id N]
+"""
+
+import argparse
+import time as timer
+from collections import Counter
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from database import (
+    SessionLocal, Achievement, AchievementProgress, Completion, DailyRollup, Goal, Habit, Note,
+    DEFAULT_USER_ID, init_db
+)
+from achievements import ALL_ACHIEVEMENTS, AchievementDef, MOTIVATION_TRADITIONS
+from achievement_engine import (
+    ACHIEVEMENT_ENGINE, EventContext, STAT_NAMES, achievement_columns, get_unlocked_keys
+)
+from gameplay import get_habit_xp
+
+
+# Counters read from current state rather than history
+STATE_COUNTERS = ["level", "total_xp", "lifetime_gold", "min_stat", "stat_total", "monarch"] + STAT_NAMES + [
+    "stats_trained", "scheduled_habits", "colored_habits", "described_habits", "habit_age",
+    "goal_categories", "account_age", "profile_completed", "avatar_chosen", "documents_uploaded",
+    "motivations_read", "traditions_read",
+] + [f"motivations_{tradition}" for tradition in MOTIVATION_TRADITIONS]
+
+# (day ordinals, running value) - running value is non-decreasing, so the
+# day a target was first reached is found with searchsorted
+Milestones = Tuple[np.ndarray, np.ndarray]
+
+
+def load_completion_frame(db, user_id: int = DEFAULT_USER_ID) -> pd.DataFrame:
+    """One row per (habit, day) completed, with the habit's category and difficulty"""
+    rows = db.query(
+        Completion.habit_id, Completion.date, Habit.category, Habit.difficulty
+    ).join(
+        Habit, Habit.id == Completion.habit_id
+    ).filter(
+        Completion.user_id == user_id,
+        Completion.completed == True
+    ).all()
+    frame = pd.DataFrame(rows, columns=["habit_id", "date", "category", "difficulty"])
+    frame = frame.drop_duplicates(["habit_id", "date"])
+    frame["day"] = np.array([d.toordinal() for d in frame["date"]], dtype=np.int64)
+    return frame.sort_values(["habit_id", "day"], kind="mergesort").reset_index(drop=True)
+
+
+def run_lengths(habit_ids: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    Length of the consecutive-day run ending at each row.
+    Input must be sorted by (habit_id, day) without duplicates.
+    """
+    n = len(days)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (habit_ids[1:] != habit_ids[:-1]) | (np.diff(days) != 1)
+    start_index = np.flatnonzero(starts)
+    run_id = np.cumsum(starts) - 1
+    return np.arange(n) - start_index[run_id] + 1
+
+
+def _running_count(days: np.ndarray) -> Milestones:
+    days = np.sort(days)
+    return days, np.arange(1, len(days) + 1)
+
+
+def _running_max(days: np.ndarray, values: np.ndarray) -> Milestones:
+    order = np.argsort(days, kind="mergesort")
+    return days[order], np.maximum.accumulate(values[order]) if len(values) else values
+
+
+def _per_day(days: pd.Series, values: pd.Series) -> Milestones:
+    return _running_max(days.to_numpy(dtype=np.int64), values.to_numpy(dtype=np.int64))
+
+
+def completion_milestones(db, frame: pd.DataFrame, user_id: int = DEFAULT_USER_ID) -> Dict[str, Milestones]:
+    """Every completion-derived counter as a running series over days"""
+    milestones: Dict[str, Milestones] = {}
+    habit_ids = frame["habit_id"].to_numpy()
+    days = frame["day"].to_numpy()
+
+    milestones["completions"] = _running_count(days)
+    milestones["hard_completions"] = _running_count(days[frame["difficulty"].to_numpy() == 3])
+    for category, group in frame.groupby("category"):
+        milestones[f"completions_{category}"] = _running_count(group["day"].to_numpy())
+
+    # Streaks: longest run so far, and habits holding a 7+ day run on each day
+    streaks = run_lengths(habit_ids, days)
+    milestones["streak"] = _running_max(days, streaks)
+    long_runs = frame.loc[streaks >= 7].groupby("day")["habit_id"].size()
+    milestones["habits_streak_7"] = _per_day(long_runs.index.to_series(), long_runs)
+
+    # Diversity: distinct categories per day
+    diversity = frame.groupby("day")["category"].nunique()
+    milestones["categories_today"] = _per_day(diversity.index.to_series(), diversity)
+
+    # Perfect days: every active habit that existed that day was completed
+    per_day = frame.groupby("day")["habit_id"].nunique()
+    created = np.sort(np.array([
+        (created_at or datetime.min).date().toordinal()
+        for (created_at,) in db.query(Habit.created_at).filter(Habit.user_id == user_id, Habit.active == True)
+    ], dtype=np.int64))
+    existing = np.searchsorted(created, per_day.index.to_numpy(), side="right")
+    perfect = per_day.index.to_numpy()[(existing > 0) & (per_day.to_numpy() >= existing)]
+    milestones["perfect_days"] = _running_count(perfect)
+    milestones["perfect_today"] = (perfect[:1], np.ones(min(len(perfect), 1), dtype=np.int64))
+
+    # Daily XP: recorded rollups where present, base-reward estimate otherwise
+    xp_by_difficulty = {difficulty: get_habit_xp(difficulty) for difficulty in frame["difficulty"].unique()}
+    estimated = frame["difficulty"].map(xp_by_difficulty).groupby(frame["day"]).sum()
+    recorded = pd.Series({
+        day.toordinal(): (xp or 0) - (achievement_xp or 0)
+        for day, xp, achievement_xp in db.query(
+            DailyRollup.date, DailyRollup.xp_earned, DailyRollup.achievement_xp
+        ).filter(DailyRollup.user_id == user_id)
+    }, dtype=np.int64)
+    daily_xp = pd.concat([estimated, recorded], axis=1).fillna(0).max(axis=1).astype(np.int64)
+    milestones["daily_xp"] = _per_day(daily_xp.index.to_series(), daily_xp)
+    return milestones
+
+
+def collection_counters(db, user_id: int = DEFAULT_USER_ID) -> Dict[str, int]:
+    """Counts over a user's habits, goals, goal steps and notes"""
+    counts: Counter = Counter()
+    counts["habits_created"] = db.query(func.count(Habit.id)).filter(Habit.user_id == user_id).scalar() or 0
+    counts["notes_created"] = db.query(func.count(Note.id)).filter(Note.user_id == user_id).scalar() or 0
+
+    rows = db.query(
+        Goal.category, Goal.difficulty, Goal.priority, Goal.completed, func.count(Goal.id)
+    ).filter(
+        Goal.user_id == user_id
+    ).group_by(Goal.category, Goal.difficulty, Goal.priority, Goal.completed).all()
+    for category, difficulty, priority, completed, count in rows:
+        counts["goals_created"] += count
+        if completed:
+            counts["goals_completed"] += count
+            counts[f"goals_completed_{category}"] += count
+            if difficulty == 3:
+                counts["hard_goals_completed"] += count
+            if priority:
+                counts["priority_goals_completed"] += count
+
+    for (steps,) in db.query(Goal.steps).filter(Goal.user_id == user_id):
+        counts["steps_completed"] += sum(
+            1 for step in (steps or []) if step.get("completed") or step.get("completed_at")
+        )
+    return dict(counts)
+
+
+def _reached_on(milestones: Optional[Milestones], target: int) -> Optional[datetime]:
+    """When a running series first reached target"""
+    if milestones is None:
+        return None
+    days, running = milestones
+    index = np.searchsorted(running, target, side="left")
+    if index >= len(days):
+        return None
+    return datetime.combine(date.fromordinal(int(days[index])), time.min)
+
+
+def backfill_achievements(db, user_id: int = DEFAULT_USER_ID,
+                          definitions: List[AchievementDef] = ALL_ACHIEVEMENTS) -> List[str]:
+    """
+    Unlock every achievement the user's history already satisfies and set
+    achievement_progress to the historical values, then commit.
+    Rewards are not paid: totals such as XP and gold already include them.
+    Returns the newly unlocked keys.
+    """
+    milestones = completion_milestones(db, load_completion_frame(db, user_id), user_id)
+    values = {name: int(running[-1]) if len(running) else 0 for name, (_, running) in milestones.items()}
+    values.update(collection_counters(db, user_id))
+    ctx = EventContext(db, "backfill", {}, user_id)
+    values.update({name: ctx.read(name) for name in STATE_COUNTERS})
+
+    tracked = [a for a in definitions if a.counter is not None]
+    unlocked = get_unlocked_keys(db, user_id=user_id)
+    now = datetime.now()
+    newly_unlocked: Dict[str, datetime] = {}
+
+    # The unlock count depends on everything else, so settle it last
+    pending = [a for a in tracked if a.key not in unlocked]
+    while True:
+        values["achievements_unlocked"] = len(unlocked) + len(newly_unlocked)
+        reached = [
+            a for a in pending
+            if a.key not in newly_unlocked and values.get(a.counter, 0) >= a.target
+        ]
+        if not reached:
+            break
+        for achievement in reached:
+            newly_unlocked[achievement.key] = _reached_on(
+                milestones.get(achievement.counter), achievement.target
+            ) or now
+
+    by_key = {a.key: a for a in definitions}
+    existing = {
+        row.key: row for row in db.query(Achievement).filter(
+            Achievement.user_id == user_id,
+            Achievement.key.in_(list(newly_unlocked))
+        )
+    }
+    for key, unlocked_at in newly_unlocked.items():
+        if key in existing:
+            existing[key].unlocked_at = unlocked_at
+    db.bulk_insert_mappings(Achievement, [
+        {**achievement_columns(by_key[key]), "user_id": user_id, "unlocked_at": unlocked_at}
+        for key, unlocked_at in newly_unlocked.items() if key not in existing
+    ])
+
+    ACHIEVEMENT_ENGINE.ensure_progress_rows(db, user_id)
+    progress = db.query(
+        AchievementProgress.id, AchievementProgress.key, AchievementProgress.current_value
+    ).filter(AchievementProgress.user_id == user_id).all()
+    counters = {a.key: a.counter for a in tracked}
+    db.bulk_update_mappings(AchievementProgress, [
+        {"id": row.id, "current_value": values[counters[row.key]], "updated_at": now}
+        for row in progress
+        if row.key in counters and values.get(counters[row.key], 0) > (row.current_value or 0)
+    ])
+
+    db.commit()
+    return list(newly_unlocked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unlock achievements from existing history")
+    parser.add_argument("--user-id", type=int, default=DEFAULT_USER_ID)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        started = timer.perf_counter()
+        unlocked = backfill_achievements(db, user_id=args.user_id)
+        elapsed = timer.perf_counter() - started
+        print(f"Unlocked {len(unlocked)} achievements in {elapsed:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,729 @@
+"""
+Goal Quest Achievement Engine - Event-driven achievement evaluation
+Each AchievementDef declares the events it listens to. Dispatching an event
+re-evaluates only those achievements, resolving each counter they need once,
+so unlock checks cost O(affected) instead of O(all) per action.
+
+Running counts (completions, goals, notes...) live in achievement_progress and
+are bumped with atomic UPDATEs in the triggering action's transaction; state
+gauges (level, XP, streak...) are written there as a running maximum so the
+rewards page can draw progress bars from a single table read.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, distinct, func, or_
+
+from database import (
+    Achievement, AchievementProgress, DailyRollup, Goal, Habit, Completion, HabitStreak, Motivation,
+    PhilosophyDocument, User, UserProfile, after_commit, get_user_stats, insert_or_ignore, DEFAULT_USER_ID
+)
+from achievements import (
+    AchievementCatalog, AchievementDef, ALL_ACHIEVEMENTS, CUMULATIVE_COUNTERS, MOTIVATION_TRADITIONS,
+    EVENT_HABIT_COMPLETED, EVENT_HABIT_CREATED, EVENT_GOAL_COMPLETED, EVENT_GOAL_CREATED,
+    EVENT_STEP_COMPLETED, EVENT_NOTE_CREATED, EVENT_NOTE_SUMMARIZED, EVENT_COACH_CONSULTED
+)
+from gameplay import calculate_level_from_xp, get_stat_for_category, should_show_habit_today
+from rollups import get_daily_xp
+
+
+STAT_NAMES = ["strength", "intelligence", "vitality", "agility", "sense", "willpower"]
+
+# Days of completions loaded for run counters: the longest run is 30 days,
+# five weekends back reach up to 35
+HISTORY_DAYS = 42
+
+# Completions before EARLY_HOUR or from LATE_HOUR on count as early / late
+EARLY_HOUR = 7
+LATE_HOUR = 22
+
+
+class EventContext:
+    """One dispatched event for one user: its payload plus per-event cached reads"""
+    
+    def __init__(self, db, event: str, payload: Dict[str, Any], user_id: int = DEFAULT_USER_ID):
+        self.db = db
+        self.event = event
+        self.payload = payload
+        self.user_id = user_id
+        self.today = payload.get("today") or date.today()
+        self._stats = None
+        self._habits: Optional[List[Habit]] = None
+        self._completed: Optional[Dict[date, set]] = None
+        self._values: Dict[str, int] = {}
+    
+    @property
+    def stats(self):
+        if self._stats is None:
+            self._stats = get_user_stats(self.db, self.user_id)
+        return self._stats
+    
+    @property
+    def habits(self) -> List[Habit]:
+        """The user's active habits"""
+        if self._habits is None:
+            self._habits = self.db.query(Habit).filter(
+                Habit.user_id == self.user_id,
+                Habit.active == True
+            ).all()
+        return self._habits
+    
+    @property
+    def completed(self) -> Dict[date, set]:
+        """Habit ids completed on each of the last HISTORY_DAYS days"""
+        if self._completed is None:
+            self._completed = {}
+            for habit_id, day in self.db.query(Completion.habit_id, Completion.date).filter(
+                Completion.user_id == self.user_id,
+                Completion.completed == True,
+                Completion.date > self.today - timedelta(days=HISTORY_DAYS),
+                Completion.date <= self.today
+            ):
+                self._completed.setdefault(day, set()).add(habit_id)
+        return self._completed
+    
+    def read(self, counter_name: str) -> int:
+        """Resolve a state counter, at most once per event"""
+        if counter_name not in self._values:
+            self._values[counter_name] = COUNTER_READERS[counter_name](self)
+        return self._values[counter_name]
+
+
+# ============ COUNTERS ============
+
+COUNTER_READERS: Dict[str, Callable[[EventContext], int]] = {}
+
+
+def counter(name: str):
+    """Register a reader for a named counter"""
+    def decorator(func_: Callable[[EventContext], int]):
+        COUNTER_READERS[name] = func_
+        return func_
+    return decorator
+
+
+@counter("streak")
+def _streak(ctx: EventContext) -> int:
+    return ctx.payload.get("streak", 0)
+
+
+@counter("habits_streak_7")
+def _habits_streak_7(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(HabitStreak.habit_id)).filter(
+        HabitStreak.user_id == ctx.user_id,
+        HabitStreak.current_streak >= 7,
+        HabitStreak.last_completed_date >= ctx.today - timedelta(days=1)
+    ).scalar() or 0
+
+
+@counter("level")
+def _level(ctx: EventContext) -> int:
+    return ctx.stats.level or 1
+
+
+@counter("total_xp")
+def _total_xp(ctx: EventContext) -> int:
+    return ctx.stats.total_xp or 0
+
+
+@counter("daily_xp")
+def _daily_xp(ctx: EventContext) -> int:
+    return get_daily_xp(ctx.db, ctx.today, ctx.user_id)
+
+
+@counter("lifetime_gold")
+def _lifetime_gold(ctx: EventContext) -> int:
+    return ctx.stats.lifetime_gold or 0
+
+
+@counter("min_stat")
+def _min_stat(ctx: EventContext) -> int:
+    return min(getattr(ctx.stats, stat) or 0 for stat in STAT_NAMES)
+
+
+@counter("stat_total")
+def _stat_total(ctx: EventContext) -> int:
+    return sum(getattr(ctx.stats, stat) or 0 for stat in STAT_NAMES)
+
+
+@counter("monarch")
+def _monarch(ctx: EventContext) -> int:
+    return min(ctx.stats.level or 1, _min_stat(ctx))
+
+
+@counter("categories_today")
+def _categories_today(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(distinct(Habit.category))).join(
+        Completion, Completion.habit_id == Habit.id
+    ).filter(
+        Completion.user_id == ctx.user_id,
+        Completion.date == ctx.today,
+        Completion.completed == True
+    ).scalar() or 0
+
+
+@counter("perfect_today")
+def _perfect_today(ctx: EventContext) -> int:
+    active, done = ctx.db.query(
+        func.count(distinct(Habit.id)), func.count(distinct(Completion.habit_id))
+    ).outerjoin(
+        Completion, (Completion.habit_id == Habit.id) & (Completion.date == ctx.today)
+    ).filter(Habit.user_id == ctx.user_id, Habit.active == True).one()
+    return 1 if active and done >= active else 0
+
+
+@counter("achievements_unlocked")
+def _achievements_unlocked(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(Achievement.id)).filter(
+        Achievement.user_id == ctx.user_id,
+        Achievement.unlocked_at != None
+    ).scalar() or 0
+
+
+def _register_stat_counter(stat: str):
+    counter(stat)(lambda ctx: getattr(ctx.stats, stat) or 0)
+
+
+for _stat in STAT_NAMES:
+    _register_stat_counter(_stat)
+
+
+@counter("enlightened")
+def _enlightened(ctx: EventContext) -> int:
+    legend = ctx.db.query(Achievement.id).filter(
+        Achievement.user_id == ctx.user_id,
+        Achievement.key == "legend",
+        Achievement.unlocked_at != None
+    ).first()
+    return _monarch(ctx) if legend else 0
+
+
+# ============ HABIT HISTORY COUNTERS ============
+
+def _created_on(habit: Habit) -> date:
+    return habit.created_at.date() if habit.created_at else date.min
+
+
+def _is_scheduled(habit: Habit, day: date) -> bool:
+    return should_show_habit_today(
+        habit.frequency or "daily", habit.frequency_days or [], habit.custom_interval or 1,
+        _created_on(habit).isoformat(), day.weekday(), on=day
+    )
+
+
+def _all_done(ctx: EventContext, day: date, habits: Iterable[Habit], scheduled_only: bool = False) -> bool:
+    """
+    Whether every habit that existed on `day` (and was scheduled that day, if
+    asked) was completed. False when none of the habits existed yet.
+    """
+    existing = [h for h in habits if _created_on(h) <= day]
+    due = {h.id for h in existing if not scheduled_only or _is_scheduled(h, day)}
+    return bool(existing) and due <= ctx.completed.get(day, set())
+
+
+def _run(days: Iterable[date], kept: Callable[[date], bool]) -> int:
+    """How many of `days`, most recent first, pass `kept` before the first that fails"""
+    run = 0
+    for day in days:
+        if not kept(day):
+            break
+        run += 1
+    return run
+
+
+def _days_back(ctx: EventContext) -> Iterable[date]:
+    return (ctx.today - timedelta(days=n) for n in range(HISTORY_DAYS))
+
+
+@counter("perfect_run")
+def _perfect_run(ctx: EventContext) -> int:
+    return _run(_days_back(ctx), lambda day: _all_done(ctx, day, ctx.habits))
+
+
+@counter("scheduled_run")
+def _scheduled_run(ctx: EventContext) -> int:
+    return _run(_days_back(ctx), lambda day: _all_done(ctx, day, ctx.habits, scheduled_only=True))
+
+
+@counter("weekday_run")
+def _weekday_run(ctx: EventContext) -> int:
+    weekdays = (day for day in _days_back(ctx) if day.weekday() < 5)
+    return _run(weekdays, lambda day: _all_done(ctx, day, ctx.habits, scheduled_only=True))
+
+
+@counter("priority_run")
+def _priority_run(ctx: EventContext) -> int:
+    priority = [h for h in ctx.habits if h.priority]
+    return _run(_days_back(ctx), lambda day: _all_done(ctx, day, priority))
+
+
+@counter("weekend_run")
+def _weekend_run(ctx: EventContext) -> int:
+    """Consecutive weekends up to the latest Sunday with completions on both days"""
+    sunday = ctx.today - timedelta(days=(ctx.today.weekday() + 1) % 7)
+    sundays = (sunday - timedelta(weeks=n) for n in range(HISTORY_DAYS // 7 - 1))
+    return _run(sundays, lambda day: bool(ctx.completed.get(day)) and bool(ctx.completed.get(day - timedelta(days=1))))
+
+
+@counter("completion_rate_30")
+def _completion_rate_30(ctx: EventContext) -> int:
+    """Percent of scheduled habit-days completed over the last 30 days, once there are 30 days of habits"""
+    start = ctx.today - timedelta(days=29)
+    if not ctx.habits or min(_created_on(h) for h in ctx.habits) > start:
+        return 0
+    due = done = 0
+    for day in (start + timedelta(days=n) for n in range(30)):
+        completed = ctx.completed.get(day, set())
+        for habit in ctx.habits:
+            if _created_on(habit) <= day and _is_scheduled(habit, day):
+                due += 1
+                done += habit.id in completed
+    return done * 100 // due if due else 0
+
+
+@counter("comeback_streak")
+def _comeback_streak(ctx: EventContext) -> int:
+    """The current streak, if the habit was completed before it started"""
+    habit, streak = ctx.payload.get("habit"), ctx.payload.get("streak", 0)
+    if habit is None or not streak:
+        return 0
+    earlier = ctx.db.query(Completion.id).filter(
+        Completion.habit_id == habit.id,
+        Completion.completed == True,
+        Completion.date < ctx.today - timedelta(days=streak)
+    ).first()
+    return streak if earlier else 0
+
+
+@counter("habit_age")
+def _habit_age(ctx: EventContext) -> int:
+    """Days the oldest active habit has existed"""
+    return max(((ctx.today - h.created_at.date()).days for h in ctx.habits if h.created_at), default=0)
+
+
+@counter("levels_this_week")
+def _levels_this_week(ctx: EventContext) -> int:
+    earned = ctx.db.query(func.sum(DailyRollup.xp_earned)).filter(
+        DailyRollup.user_id == ctx.user_id,
+        DailyRollup.date > ctx.today - timedelta(days=7),
+        DailyRollup.date <= ctx.today
+    ).scalar() or 0
+    level_before, _, _ = calculate_level_from_xp(max((ctx.stats.total_xp or 0) - earned, 0))
+    return (ctx.stats.level or 1) - level_before
+
+
+# ============ COLLECTION COUNTERS ============
+
+def _count_habits(ctx: EventContext, *conditions) -> int:
+    return ctx.db.query(func.count(Habit.id)).filter(Habit.user_id == ctx.user_id, *conditions).scalar() or 0
+
+
+@counter("stats_trained")
+def _stats_trained(ctx: EventContext) -> int:
+    return len({get_stat_for_category(h.category or "personal") for h in ctx.habits})
+
+
+@counter("scheduled_habits")
+def _scheduled_habits(ctx: EventContext) -> int:
+    return _count_habits(ctx, Habit.frequency != "daily")
+
+
+@counter("colored_habits")
+def _colored_habits(ctx: EventContext) -> int:
+    return _count_habits(ctx, Habit.color != None, Habit.color != "bg-primary")  # Column default
+
+
+@counter("described_habits")
+def _described_habits(ctx: EventContext) -> int:
+    return _count_habits(ctx, Habit.description != None, Habit.description != "")
+
+
+@counter("goal_horizon")
+def _goal_horizon(ctx: EventContext) -> int:
+    """Days from a new goal's creation to its deadline"""
+    goal = ctx.payload.get("goal")
+    if goal is None or goal.deadline is None:
+        return 0
+    created = goal.created_at.date() if goal.created_at else ctx.today
+    return (goal.deadline - created).days
+
+
+@counter("goal_steps")
+def _goal_steps(ctx: EventContext) -> int:
+    goal = ctx.payload.get("goal")
+    return len(goal.steps or []) if goal is not None else 0
+
+
+@counter("goal_categories")
+def _goal_categories(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(distinct(Goal.category))).filter(
+        Goal.user_id == ctx.user_id,
+        Goal.completed == True
+    ).scalar() or 0
+
+
+@counter("goals_this_week")
+def _goals_this_week(ctx: EventContext) -> int:
+    return ctx.db.query(func.sum(DailyRollup.goals_completed)).filter(
+        DailyRollup.user_id == ctx.user_id,
+        DailyRollup.date > ctx.today - timedelta(days=7),
+        DailyRollup.date <= ctx.today
+    ).scalar() or 0
+
+
+# ============ APP USE COUNTERS ============
+
+@counter("app_opened")
+def _app_opened(ctx: EventContext) -> int:
+    return 1
+
+
+@counter("account_age")
+def _account_age(ctx: EventContext) -> int:
+    joined = ctx.db.query(User.created_at).filter(User.id == ctx.user_id).scalar()
+    return (ctx.today - joined.date()).days if joined else 0
+
+
+@counter("analytics_viewed")
+def _analytics_viewed(ctx: EventContext) -> int:
+    return 1 if "Analytics" in ctx.payload.get("pages", ()) else 0
+
+
+@counter("pages_visited")
+def _pages_visited(ctx: EventContext) -> int:
+    return len(set(ctx.payload.get("pages", ())))
+
+
+@counter("profile_completed")
+def _profile_completed(ctx: EventContext) -> int:
+    completed = ctx.db.query(UserProfile.onboarding_completed).filter(UserProfile.user_id == ctx.user_id).scalar()
+    return 1 if completed else 0
+
+
+@counter("avatar_chosen")
+def _avatar_chosen(ctx: EventContext) -> int:
+    avatar = ctx.db.query(UserProfile.avatar_style).filter(UserProfile.user_id == ctx.user_id).scalar()
+    return 1 if avatar else 0
+
+
+@counter("documents_uploaded")
+def _documents_uploaded(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(PhilosophyDocument.id)).filter(
+        PhilosophyDocument.user_id == ctx.user_id
+    ).scalar() or 0
+
+
+@counter("motivations_read")
+def _motivations_read(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(Motivation.id)).filter(Motivation.user_id == ctx.user_id).scalar() or 0
+
+
+@counter("traditions_read")
+def _traditions_read(ctx: EventContext) -> int:
+    return ctx.db.query(func.count(distinct(Motivation.tradition))).filter(
+        Motivation.user_id == ctx.user_id,
+        Motivation.tradition.in_(MOTIVATION_TRADITIONS)
+    ).scalar() or 0
+
+
+def _register_tradition_counter(tradition: str):
+    counter(f"motivations_{tradition}")(lambda ctx: ctx.db.query(func.count(Motivation.id)).filter(
+        Motivation.user_id == ctx.user_id,
+        Motivation.tradition == tradition
+    ).scalar() or 0)
+
+
+for _tradition in MOTIVATION_TRADITIONS:
+    _register_tradition_counter(_tradition)
+
+
+# ============ INCREMENTS ============
+# event -> function returning {cumulative counter: amount}
+
+EVENT_INCREMENTS: Dict[str, Callable[[EventContext], Dict[str, int]]] = {}
+
+# Counters bumped at most once per calendar day
+DAILY_COUNTERS = {"perfect_days", "early_days", "late_days"}
+
+
+def increments(event: str):
+    """Register the cumulative counters an event advances"""
+    def decorator(func_: Callable[[EventContext], Dict[str, int]]):
+        EVENT_INCREMENTS[event] = func_
+        return func_
+    return decorator
+
+
+@increments(EVENT_HABIT_COMPLETED)
+def _habit_completed_increments(ctx: EventContext) -> Dict[str, int]:
+    habit = ctx.payload.get("habit")
+    result = {"completions": 1}
+    if habit is not None:
+        result[f"completions_{habit.category}"] = 1
+        if habit.difficulty == 3:
+            result["hard_completions"] = 1
+    if ctx.read("perfect_today"):
+        result["perfect_days"] = 1
+    now = datetime.now()
+    if ctx.today == now.date():
+        if now.hour < EARLY_HOUR:
+            result["early_days"] = 1
+        elif now.hour >= LATE_HOUR:
+            result["late_days"] = 1
+    return result
+
+
+@increments(EVENT_GOAL_COMPLETED)
+def _goal_completed_increments(ctx: EventContext) -> Dict[str, int]:
+    goal = ctx.payload.get("goal")
+    result = {"goals_completed": 1}
+    if goal is not None:
+        result[f"goals_completed_{goal.category}"] = 1
+        if goal.difficulty == 3:
+            result["hard_goals_completed"] = 1
+        if goal.priority:
+            result["priority_goals_completed"] = 1
+        if goal.deadline is not None and ctx.today <= goal.deadline:
+            result["goals_on_time"] = 1
+            if ctx.today <= goal.deadline - timedelta(days=7):
+                result["goals_week_early"] = 1
+        if goal.created_at is not None:
+            age = (ctx.today - goal.created_at.date()).days
+            if age < 30:
+                result["goals_within_month"] = 1
+            if age >= 182:
+                result["long_term_goals"] = 1
+    if ctx.payload.get("from_progress") == 0:
+        result["full_progress_goals"] = 1
+    return result
+
+
+@increments(EVENT_HABIT_CREATED)
+def _habit_created_increments(ctx: EventContext) -> Dict[str, int]:
+    result = {"habits_created": 1}
+    if ctx.payload.get("suggested"):
+        result["suggested_habits"] = 1
+    return result
+
+
+@increments(EVENT_GOAL_CREATED)
+def _goal_created_increments(ctx: EventContext) -> Dict[str, int]:
+    return {"goals_created": 1}
+
+
+@increments(EVENT_STEP_COMPLETED)
+def _step_completed_increments(ctx: EventContext) -> Dict[str, int]:
+    return {"steps_completed": 1}
+
+
+@increments(EVENT_NOTE_CREATED)
+def _note_created_increments(ctx: EventContext) -> Dict[str, int]:
+    return {"notes_created": 1}
+
+
+@increments(EVENT_NOTE_SUMMARIZED)
+def _note_summarized_increments(ctx: EventContext) -> Dict[str, int]:
+    return {"note_summaries": 1}
+
+
+@increments(EVENT_COACH_CONSULTED)
+def _coach_consulted_increments(ctx: EventContext) -> Dict[str, int]:
+    result = {"coach_consultations": 1}
+    if ctx.payload.get("library"):
+        result["library_consultations"] = 1
+    return result
+
+
+# ============ ENGINE ============
+
+class AchievementEngine:
+    """Routes gameplay events to the achievements that listen to them"""
+    
+    def __init__(self, definitions: Iterable[AchievementDef] = ALL_ACHIEVEMENTS):
+        # Only achievements whose counter can be resolved are evaluated
+        self.catalog = AchievementCatalog(
+            a for a in definitions
+            if a.counter in COUNTER_READERS or a.counter in CUMULATIVE_COUNTERS
+        )
+        self.listeners = self.catalog.by_event
+        self.keys_by_counter = self.catalog.keys_by_counter
+        self.targets: Dict[str, int] = {a.key: a.target for a in self.catalog.definitions}
+        self._seeded_users = set()
+    
+    def dispatch(self, db, event: str, user_id: int = DEFAULT_USER_ID, **payload) -> List[AchievementDef]:
+        """
+        Advance counters for an event, then evaluate the achievements listening
+        to it and unlock those whose counter reached its target.
+        Does not commit and does not pay rewards. Returns the newly unlocked definitions.
+        """
+        ctx = EventContext(db, event, payload, user_id)
+        
+        incrementer = EVENT_INCREMENTS.get(event)
+        if incrementer is not None:
+            self.ensure_progress_rows(db, user_id)
+            for counter_name, amount in incrementer(ctx).items():
+                increment_progress(
+                    db, self.keys_by_counter.get(counter_name, []), amount, user_id,
+                    once_per_day=counter_name in DAILY_COUNTERS, today=ctx.today
+                )
+        
+        candidates = self.listeners.get(event, [])
+        if not candidates:
+            return []
+        
+        unlocked = get_unlocked_keys(db, [a.key for a in candidates], user_id)
+        candidates = [a for a in candidates if a.key not in unlocked]
+        if not candidates:
+            return []
+        
+        self.ensure_progress_rows(db, user_id)
+        progress = get_progress(db, [a.key for a in candidates], user_id)
+        
+        raised: Dict[str, int] = {}
+        newly_unlocked = []
+        for achievement in candidates:
+            current = progress.get(achievement.key, (0, achievement.target))[0]
+            if achievement.counter in CUMULATIVE_COUNTERS:
+                value = current
+            else:
+                value = ctx.read(achievement.counter)
+                if value > current:
+                    raised[achievement.key] = value
+            if value >= achievement.target:
+                unlock_achievement(db, achievement, user_id=user_id)
+                newly_unlocked.append(achievement)
+        
+        raise_progress(db, raised, user_id)
+        if newly_unlocked:
+            db.flush()
+        return newly_unlocked
+    
+    def ensure_progress_rows(self, db, user_id: int = DEFAULT_USER_ID):
+        """
+        Create missing progress rows and fix stale targets. The user is only
+        remembered as seeded once that commits; a rollback forgets it again.
+        """
+        if user_id in self._seeded_users:
+            return
+        seeding = db.info.setdefault("seeding_achievement_progress", set())
+        if user_id in seeding:
+            return  # Already seeded earlier in this transaction
+        existing = dict(db.query(AchievementProgress.key, AchievementProgress.target).filter(
+            AchievementProgress.user_id == user_id
+        ).all())
+        missing = [
+            {"user_id": user_id, "key": key, "current_value": 0, "target": target}
+            for key, target in self.targets.items() if key not in existing
+        ]
+        if missing:
+            # Another process seeding the same user may insert some first
+            db.execute(insert_or_ignore(db, AchievementProgress, ["user_id", "key"]), missing)
+        stale = {key: target for key, target in self.targets.items() if key in existing and existing[key] != target}
+        if stale:
+            db.query(AchievementProgress).filter(
+                AchievementProgress.user_id == user_id,
+                AchievementProgress.key.in_(list(stale))
+            ).update({AchievementProgress.target: case(stale, value=AchievementProgress.key)},
+                     synchronize_session=False)
+        seeding.add(user_id)
+
+        def seeded():
+            seeding.discard(user_id)
+            self._seeded_users.add(user_id)
+        after_commit(db, seeded, on_rollback=lambda: seeding.discard(user_id))
+
+
+# ============ PROGRESS STORAGE ============
+
+def increment_progress(db, keys: List[str], amount: int, user_id: int = DEFAULT_USER_ID,
+                       once_per_day: bool = False, today: Optional[date] = None):
+    """UPDATE ... SET current_value = current_value + amount for the given keys"""
+    if not keys or not amount:
+        return
+    query = db.query(AchievementProgress).filter(
+        AchievementProgress.user_id == user_id,
+        AchievementProgress.key.in_(keys)
+    )
+    if once_per_day:
+        start_of_day = datetime.combine(today or date.today(), time.min)
+        query = query.filter(or_(
+            AchievementProgress.updated_at == None,
+            AchievementProgress.updated_at < start_of_day
+        ))
+    query.update({
+        AchievementProgress.current_value: AchievementProgress.current_value + amount,
+        AchievementProgress.updated_at: datetime.now(),
+    }, synchronize_session=False)
+
+
+def raise_progress(db, values: Dict[str, int], user_id: int = DEFAULT_USER_ID):
+    """Set gauge progress for several keys in one UPDATE"""
+    if not values:
+        return
+    db.query(AchievementProgress).filter(
+        AchievementProgress.user_id == user_id,
+        AchievementProgress.key.in_(list(values))
+    ).update({
+        AchievementProgress.current_value: case(values, value=AchievementProgress.key),
+        AchievementProgress.updated_at: datetime.now(),
+    }, synchronize_session=False)
+
+
+def get_progress(db, keys: Optional[Iterable[str]] = None,
+                 user_id: int = DEFAULT_USER_ID) -> Dict[str, Tuple[int, int]]:
+    """Achievement key -> (current_value, target)"""
+    query = db.query(
+        AchievementProgress.key, AchievementProgress.current_value, AchievementProgress.target
+    ).filter(AchievementProgress.user_id == user_id)
+    if keys is not None:
+        query = query.filter(AchievementProgress.key.in_(list(keys)))
+    return {row.key: (row.current_value or 0, row.target) for row in query.all()}
+
+
+def get_unlocked_keys(db, keys: Optional[Iterable[str]] = None, user_id: int = DEFAULT_USER_ID) -> set:
+    """A user's unlocked achievement keys, optionally restricted to `keys`"""
+    query = db.query(Achievement.key).filter(
+        Achievement.user_id == user_id,
+        Achievement.unlocked_at != None
+    )
+    if keys is not None:
+        query = query.filter(Achievement.key.in_(list(keys)))
+    return {row.key for row in query.all()}
+
+
+def unlock_achievement(db, achievement: AchievementDef, unlocked_at: Optional[datetime] = None,
+                       user_id: int = DEFAULT_USER_ID) -> Achievement:
+    """Insert or mark the user's Achievement row as unlocked (no commit)"""
+    row = db.query(Achievement).filter(
+        Achievement.user_id == user_id,
+        Achievement.key == achievement.key
+    ).first()
+    if row is None:
+        row = Achievement(user_id=user_id, **achievement_columns(achievement))
+        db.add(row)
+    row.unlocked_at = unlocked_at or datetime.now()
+    return row
+
+
+def achievement_columns(achievement: AchievementDef) -> Dict[str, Any]:
+    """Column values for an Achievement row built from its definition"""
+    return {
+        "key": achievement.key,
+        "title": achievement.title,
+        "description": achievement.description,
+        "icon": achievement.icon,
+        "category": achievement.category,
+        "tier": achievement.tier,
+        "xp_reward": achievement.xp_reward,
+        "gold_reward": achievement.gold_reward,
+        "stat_bonus": (
+            {"stat": achievement.stat_bonus.stat, "amount": achievement.stat_bonus.amount}
+            if achievement.stat_bonus else None
+        ),
+        "special_power": achievement.special_power,
+    }
+
+
+# Shared engine for the app
+ACHIEVEMENT_ENGINE = AchievementEngine()
@@ -3,18 +3,37 @@ Goal Quest Achievements System - All 200 achievements
 Exact replication of the Replit achievements.ts
 """
 
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 
 
-@dataclass
+# ============ EVENTS ============
+
+EVENT_HABIT_COMPLETED = "habit_completed"
+EVENT_HABIT_CREATED = "habit_created"
+EVENT_LEVEL_UP = "level_up"
+EVENT_GOAL_COMPLETED = "goal_completed"
+EVENT_GOAL_CREATED = "goal_created"
+EVENT_STEP_COMPLETED = "step_completed"
+EVENT_PURCHASE = "purchase"
+EVENT_NOTE_CREATED = "note_created"
+EVENT_ACHIEVEMENT_UNLOCKED = "achievement_unlocked"
+EVENT_PAGE_VIEWED = "page_viewed"
+EVENT_PROFILE_UPDATED = "profile_updated"
+EVENT_MOTIVATION_READ = "motivation_read"
+EVENT_DOCUMENT_UPLOADED = "document_uploaded"
+EVENT_COACH_CONSULTED = "coach_consulted"
+EVENT_NOTE_SUMMARIZED = "note_summarized"
+
+
+@dataclass(frozen=True, slots=True)
 class StatBonus:
     stat: str
     amount: int
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AchievementDef:
     key: str
     title: str
@@ -26,6 +45,9 @@ class AchievementDef:
     gold_reward: int
     stat_bonus: Optional[StatBonus] = None
     special_power: Optional[str] = None
+    counter: Optional[str] = None  # Counter compared against target
+    target: Optional[int] = None
+    events: Tuple[str, ...] = ()  # Events that re-evaluate this achievement
 
 
 # ALL 200 ACHIEVEMENTS
@@ -47,12 +69,12 @@ ALL_ACHIEVEMENTS: List[AchievementDef] = [
     AchievementDef("streak_multi_3", "Multi-Tasker", "Maintain 3 habits with 7+ day streaks", "Layers", "streaks", "silver", 500, 50),
     AchievementDef("streak_multi_5", "Habit Master", "Maintain 5 habits with 7+ day streaks", "Layers", "streaks", "gold", 1000, 100),
     AchievementDef("streak_multi_10", "Discipline Incarnate", "Maintain 10 habits with 7+ day streaks", "Layers", "streaks", "legendary", 2500, 250, StatBonus("agility", 10)),
-    AchievementDef("weekend_warrior", "Weekend Warrior", "Complete habits every weekend for a month", "Calendar", "streaks", "silver", 600, 60),
+    AchievementDef("weekend_warrior", "Weekend Warrior", "Complete habits on both weekend days 4 weekends in a row", "Calendar", "streaks", "silver", 600, 60),
     AchievementDef("early_bird_7", "Early Bird", "Complete a habit before 7AM for 7 days", "Sunrise", "streaks", "silver", 400, 40, StatBonus("vitality", 3)),
     AchievementDef("night_owl_7", "Night Owl", "Complete a habit after 10PM for 7 days", "Moon", "streaks", "silver", 400, 40, StatBonus("sense", 3)),
     AchievementDef("perfect_week", "Perfect Week", "Complete all habits for 7 consecutive days", "CheckCircle", "streaks", "gold", 1200, 120),
     AchievementDef("perfect_month", "Perfect Month", "Complete all habits for 30 consecutive days", "CheckCircle", "streaks", "legendary", 5000, 500, StatBonus("willpower", 20), "Unlock exclusive avatar frame"),
-    AchievementDef("consistency_king", "Consistency King", "90% completion rate for 30 days", "TrendingUp", "streaks", "gold", 1500, 150),
+    AchievementDef("consistency_king", "Consistency King", "Complete 90% of scheduled habits over 30 days", "TrendingUp", "streaks", "gold", 1500, 150),
     AchievementDef("no_breaks", "No Breaks", "Don't skip any scheduled habits for 14 days", "Shield", "streaks", "silver", 700, 70),
     AchievementDef("daily_grind_100", "Daily Grind", "Complete 100 total habit check-ins", "Activity", "streaks", "silver", 500, 50),
     AchievementDef("daily_grind_500", "Relentless", "Complete 500 total habit check-ins", "Activity", "streaks", "gold", 1500, 150),
@@ -117,9 +139,9 @@ ALL_ACHIEVEMENTS: List[AchievementDef] = [
     AchievementDef("habit_veteran", "Habit Veteran", "Keep the same habit active for 90 days", "Clock", "habits", "gold", 1500, 150),
     AchievementDef("habit_ancient", "Ancient Wisdom", "Keep the same habit active for 365 days", "Clock", "habits", "legendary", 5000, 500, None, "Ancient habit badge"),
     AchievementDef("quick_complete", "Speed Runner", "Complete 5 habits within 1 hour", "Timer", "habits", "silver", 400, 40),
-    AchievementDef("balanced_life", "Balanced Life", "Have habits in all 6 categories", "Scale", "habits", "gold", 1000, 100),
-    AchievementDef("weekday_warrior", "Weekday Warrior", "Complete all weekday habits for 4 weeks", "Calendar", "habits", "gold", 1200, 120),
-    AchievementDef("custom_schedule", "Schedule Master", "Create 5 habits with custom schedules", "CalendarDays", "habits", "silver", 500, 50),
+    AchievementDef("balanced_life", "Balanced Life", "Have active habits training all 6 stats", "Scale", "habits", "gold", 1000, 100),
+    AchievementDef("weekday_warrior", "Weekday Warrior", "Complete every scheduled habit for 20 weekdays in a row", "Calendar", "habits", "gold", 1200, 120),
+    AchievementDef("custom_schedule", "Schedule Master", "Create 5 habits with a schedule other than daily", "CalendarDays", "habits", "silver", 500, 50),
     AchievementDef("reminder_guru", "Reminder Guru", "Set up reminders for 10 habits", "Bell", "habits", "silver", 400, 40),
     AchievementDef("color_coded", "Color Coordinated", "Assign colors to 10 habits", "Palette", "habits", "bronze", 200, 20),
     AchievementDef("description_writer", "Detail Oriented", "Add descriptions to 10 habits", "FileText", "habits", "bronze", 200, 20),
@@ -159,7 +181,7 @@ ALL_ACHIEVEMENTS: List[AchievementDef] = [
     AchievementDef("goal_spree", "Goal Spree", "Complete 3 goals in one week", "Flame", "goals", "gold", 1200, 120),
     AchievementDef("long_term_1", "Long-Term Thinker", "Complete a goal set 6+ months ago", "Hourglass", "goals", "gold", 1500, 150),
     AchievementDef("progressive_master", "Progressive Master", "Complete 10 progressive follow-up goals", "ArrowUpRight", "goals", "legendary", 5000, 500, None, "Automatic goal difficulty scaling"),
-    AchievementDef("habit_from_goal", "Habit Creator", "Create a habit from a goal suggestion", "Repeat", "goals", "silver", 400, 40),
+    AchievementDef("habit_from_goal", "Habit Creator", "Add a habit the AI Coach suggested", "Repeat", "goals", "silver", 400, 40),
     AchievementDef("fitness_goal", "Fitness Achiever", "Complete 5 fitness goals", "Dumbbell", "goals", "silver", 700, 70, StatBonus("strength", 5)),
     AchievementDef("learning_goal", "Knowledge Achiever", "Complete 5 learning goals", "GraduationCap", "goals", "silver", 700, 70, StatBonus("intelligence", 5)),
     AchievementDef("personal_goal", "Self-Improvement", "Complete 5 personal goals", "User", "goals", "silver", 700, 70, StatBonus("willpower", 5)),
@@ -168,7 +190,7 @@ ALL_ACHIEVEMENTS: List[AchievementDef] = [
     AchievementDef("finance_goal", "Wealth Builder", "Complete 5 finance goals", "Coins", "goals", "silver", 700, 70, StatBonus("sense", 5)),
     
     # ============ SPECIAL (131-160) ============
-    AchievementDef("first_login", "Welcome", "Log in for the first time", "LogIn", "special", "bronze", 50, 5),
+    AchievementDef("first_login", "Welcome", "Open Goal Quest for the first time", "LogIn", "special", "bronze", 50, 5),
     AchievementDef("profile_complete", "Identity Established", "Complete your profile", "User", "special", "bronze", 100, 10),
     AchievementDef("avatar_chosen", "Avatar Selected", "Choose your character avatar", "UserCircle", "special", "bronze", 50, 5),
     AchievementDef("first_note", "Scribe", "Create your first note", "PenTool", "special", "bronze", 100, 10),
@@ -193,11 +215,11 @@ ALL_ACHIEVEMENTS: List[AchievementDef] = [
     AchievementDef("gold_10000", "Dragon's Hoard", "Accumulate 10,000 gold", "Coins", "special", "legendary", 3000, 0, None, "Golden profile border"),
     AchievementDef("analytics_view", "Data Driven", "View your analytics page", "BarChart", "special", "bronze", 50, 5),
     AchievementDef("dark_mode", "Shadow Walker", "Enable dark mode", "Moon", "special", "bronze", 25, 0),
-    AchievementDef("ai_coach_chat", "Coach Consultation", "Have a conversation with AI Coach", "MessageSquare", "special", "bronze", 150, 15),
-    AchievementDef("ai_coach_10", "Regular Coaching", "Have 10 AI Coach conversations", "MessageSquare", "special", "silver", 500, 50),
-    AchievementDef("philosophy_ai", "Wisdom Integration", "Use philosophy docs for AI suggestions", "Brain", "special", "gold", 800, 80),
-    AchievementDef("explorer", "Explorer", "Visit all pages of the app", "Compass", "special", "bronze", 100, 10),
-    AchievementDef("weekend_check", "Weekend Check-In", "Check in on both Saturday and Sunday", "Calendar", "special", "bronze", 150, 15),
+    AchievementDef("ai_coach_chat", "Coach Consultation", "Get suggestions from the AI Coach", "MessageSquare", "special", "bronze", 150, 15),
+    AchievementDef("ai_coach_10", "Regular Coaching", "Get AI Coach suggestions 10 times", "MessageSquare", "special", "silver", 500, 50),
+    AchievementDef("philosophy_ai", "Wisdom Integration", "Get AI Coach suggestions alongside passages from your library", "Brain", "special", "gold", 800, 80),
+    AchievementDef("explorer", "Explorer", "Visit every page of the app in one session", "Compass", "special", "bronze", 100, 10),
+    AchievementDef("weekend_check", "Weekend Check-In", "Complete habits on both Saturday and Sunday", "Calendar", "special", "bronze", 150, 15),
     
     # ============ STATS (161-190) ============
     AchievementDef("strength_10", "Strong", "Reach 10 Strength", "Sword", "stats", "bronze", 200, 20),
@@ -236,44 +258,321 @@ ALL_ACHIEVEMENTS: List[AchievementDef] = [
     AchievementDef("achievement_master", "Achievement Master", "Unlock 100 achievements", "Award", "legendary", "legendary", 10000, 1000, None, "Master collector frame"),
     AchievementDef("completionist", "Completionist", "Unlock 150 achievements", "Medal", "legendary", "legendary", 20000, 2000, None, "Completionist title"),
     AchievementDef("legend", "Living Legend", "Unlock all 200 achievements", "Crown", "legendary", "legendary", 50000, 5000, StatBonus("willpower", 50), "Legendary status - Ultimate power unlocked"),
-    AchievementDef("year_one", "Year One", "Use the app for a full year", "Calendar", "legendary", "legendary", 10000, 1000, None, "Anniversary badge"),
+    AchievementDef("year_one", "Year One", "Open the app a full year after joining", "Calendar", "legendary", "legendary", 10000, 1000, None, "Anniversary badge"),
     AchievementDef("shadow_monarch", "True Shadow Monarch", "Reach Level 100 with all stats at 100", "Crown", "legendary", "legendary", 25000, 2500, None, "Shadow Monarch powers unlocked"),
     AchievementDef("perfect_year", "Perfect Year", "365 perfect days", "Sparkles", "legendary", "legendary", 50000, 5000, None, "Golden year aura"),
     AchievementDef("million_xp", "Million XP Club", "Earn 1,000,000 total XP", "Star", "legendary", "legendary", 25000, 2500, None, "Million XP particle effects"),
     AchievementDef("habit_legend", "Habit Legend", "10,000 habit completions", "Flame", "legendary", "legendary", 25000, 2500, None, "Legendary habit animation"),
-    AchievementDef("enlightened", "Enlightened One", "Max level, all achievements, perfect balance", "Sun", "legendary", "legendary", 100000, 10000, StatBonus("sense", 100), "Enlightenment - transcend limits"),
+    AchievementDef("enlightened", "Enlightened One", "Become a Living Legend, then reach level 100 with every stat at 100", "Sun", "legendary", "legendary", 100000, 10000, StatBonus("sense", 100), "Enlightenment - transcend limits"),
 ]
 
 
+# ============ ACHIEVEMENT RULES ============
+# key -> (counter, target). Counters are resolved by achievement_engine.
+# Every achievement has a rule except those in UNREACHABLE.
+
+_STAT_NAMES = ["strength", "intelligence", "vitality", "agility", "sense", "willpower"]
+
+# Motivation traditions with an achievement of their own
+MOTIVATION_TRADITIONS = ("esoteric", "biblical", "quranic", "philosophy", "metaphysical")
+
+# Pages in the app's sidebar (app.render_app)
+APP_PAGE_COUNT = 10
+
+ACHIEVEMENT_RULES: Dict[str, Tuple[str, int]] = {
+    **{f"streak_{n}": ("streak", n) for n in (3, 7, 14, 21, 30, 45, 60, 90, 180, 365)},
+    "streak_multi_3": ("habits_streak_7", 3),
+    "streak_multi_5": ("habits_streak_7", 5),
+    "streak_multi_10": ("habits_streak_7", 10),
+    **{f"level_{n}": ("level", n) for n in (5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 90, 100)},
+    "rank_novice": ("level", 11),  # gameplay.RANKS minimum levels
+    "rank_skilled": ("level", 26),
+    "rank_elite": ("level", 41),
+    "rank_srank": ("level", 81),
+    "xp_hunter_1k": ("total_xp", 1000),
+    "xp_hunter_10k": ("total_xp", 10000),
+    "xp_hunter_50k": ("total_xp", 50000),
+    "xp_hunter_100k": ("total_xp", 100000),
+    "xp_hunter_500k": ("total_xp", 500000),
+    "million_xp": ("total_xp", 1000000),
+    "daily_xp_500": ("daily_xp", 500),
+    "daily_xp_1000": ("daily_xp", 1000),
+    "perfect_day": ("perfect_today", 1),
+    "diversity_3": ("categories_today", 3),
+    "diversity_5": ("categories_today", 5),
+    **{f"gold_{n}": ("lifetime_gold", n) for n in (100, 500, 1000, 5000, 10000)},
+    **{f"{stat}_{n}": (stat, n) for stat in _STAT_NAMES for n in (10, 25, 50, 100)},
+    **{f"balanced_stats_{n}": ("min_stat", n) for n in (10, 25, 50, 100)},
+    "stat_total_100": ("stat_total", 100),
+    "stat_total_500": ("stat_total", 500),
+    "shadow_monarch": ("monarch", 100),
+    "ultimate_hunter": ("achievements_unlocked", 50),
+    "achievement_master": ("achievements_unlocked", 100),
+    "completionist": ("achievements_unlocked", 150),
+    **{f"comeback_{n}": ("comeback_streak", n) for n in (3, 7, 30)},
+    "weekend_check": ("weekend_run", 1),
+    "weekend_warrior": ("weekend_run", 4),
+    "perfect_week": ("perfect_run", 7),
+    "perfect_month": ("perfect_run", 30),
+    "consistency_king": ("completion_rate_30", 90),
+    "no_breaks": ("scheduled_run", 14),
+    "weekday_warrior": ("weekday_run", 20),
+    "priority_master": ("priority_run", 7),
+    "fast_leveler": ("levels_this_week", 5),
+    "habit_veteran": ("habit_age", 90),
+    "habit_ancient": ("habit_age", 365),
+    "balanced_life": ("stats_trained", 6),
+    "custom_schedule": ("scheduled_habits", 5),
+    "color_coded": ("colored_habits", 10),
+    "description_writer": ("described_habits", 10),
+    "year_planner": ("goal_horizon", 365),
+    "goal_steps_5": ("goal_steps", 5),
+    "goal_steps_10": ("goal_steps", 10),
+    "multi_category_goals": ("goal_categories", 5),
+    "goal_spree": ("goals_this_week", 3),
+    "first_login": ("app_opened", 1),
+    "year_one": ("account_age", 365),
+    "analytics_view": ("analytics_viewed", 1),
+    "explorer": ("pages_visited", APP_PAGE_COUNT),
+    "profile_complete": ("profile_completed", 1),
+    "avatar_chosen": ("avatar_chosen", 1),
+    "library_upload": ("documents_uploaded", 1),
+    "library_10": ("documents_uploaded", 10),
+    "library_25": ("documents_uploaded", 25),
+    "motivation_read": ("motivations_read", 1),
+    "motivation_week": ("motivations_read", 7),
+    **{f"tradition_{t}": (f"motivations_{t}", 10) for t in MOTIVATION_TRADITIONS},
+    "all_traditions": ("traditions_read", len(MOTIVATION_TRADITIONS)),
+    # Cumulative counters, incremented in achievement_progress
+    "first_complete": ("completions", 1),
+    **{f"complete_{n}": ("completions", n) for n in (10, 50, 100, 250, 500, 1000, 5000)},
+    "daily_grind_100": ("completions", 100),
+    "daily_grind_500": ("completions", 500),
+    "habit_legend": ("completions", 10000),
+    **{f"hard_habit_{n}": ("hard_completions", n) for n in (1, 10, 50, 100)},
+    **{f"category_{c}": (f"completions_{c}", 50) for c in ("fitness", "health", "learning", "mindfulness", "productivity")},
+    "perfect_day_5": ("perfect_days", 5),
+    "perfect_day_30": ("perfect_days", 30),
+    "perfect_year": ("perfect_days", 365),
+    "first_habit": ("habits_created", 1),
+    **{f"habits_{n}": ("habits_created", n) for n in (5, 10, 15, 20, 30)},
+    "first_goal": ("goals_created", 1),
+    **{f"goals_{n}": ("goals_created", n) for n in (5, 10, 25)},
+    **{f"goal_complete_{n}": ("goals_completed", n) for n in (1, 5, 10, 25, 50)},
+    **{f"hard_goal_{n}": ("hard_goals_completed", n) for n in (1, 5, 10)},
+    "priority_goals": ("priority_goals_completed", 5),
+    "fitness_goal": ("goals_completed_fitness", 5),
+    "learning_goal": ("goals_completed_education", 5),
+    "personal_goal": ("goals_completed_personal", 5),
+    "work_goal": ("goals_completed_career", 5),
+    "health_goal": ("goals_completed_health", 5),
+    "finance_goal": ("goals_completed_finance", 5),
+    **{f"step_complete_{n}": ("steps_completed", n) for n in (10, 50, 100)},
+    "first_note": ("notes_created", 1),
+    "notes_10": ("notes_created", 10),
+    "notes_50": ("notes_created", 50),
+    "early_bird_7": ("early_days", 7),
+    "night_owl_7": ("late_days", 7),
+    **{f"on_time_{n}": ("goals_on_time", n) for n in (1, 5, 10)},
+    "early_bird_goal": ("goals_week_early", 1),
+    "month_achiever": ("goals_within_month", 1),
+    "long_term_1": ("long_term_goals", 1),
+    "full_progress": ("full_progress_goals", 1),
+    "habit_from_goal": ("suggested_habits", 1),
+    "ai_summary": ("note_summaries", 1),
+    "ai_coach_chat": ("coach_consultations", 1),
+    "ai_coach_10": ("coach_consultations", 10),
+    "philosophy_ai": ("library_consultations", 1),
+}
+
+# Achievements the app cannot observe, with the reason
+UNREACHABLE: Dict[str, str] = {
+    "quick_complete": "Completions record the day, not the time of day",
+    "reminder_guru": "The app has no reminder setting for habits",
+    "active_manager": "The app cannot deactivate or reactivate habits",
+    "goal_chain_3": "The app cannot create follow-up goals",
+    "goal_chain_5": "The app cannot create follow-up goals",
+    "progressive_master": "The app cannot create follow-up goals",
+    "ai_goal_1": "Goals do not record whether the AI Coach proposed them",
+    "ai_goal_5": "Goals do not record whether the AI Coach proposed them",
+    "dark_mode": "The app has a single dark theme and no toggle",
+}
+
+# Every other achievement that can be unlocked
+ACHIEVEMENT_RULES["legend"] = ("achievements_unlocked", len(ACHIEVEMENT_RULES))
+# Needs legend itself, so it is not one of the achievements legend counts
+ACHIEVEMENT_RULES["enlightened"] = ("enlightened", 100)
+
+# Counters accumulated from events rather than read from current state
+CUMULATIVE_COUNTERS = {
+    "completions", "hard_completions", "perfect_days",
+    "completions_fitness", "completions_health", "completions_learning",
+    "completions_mindfulness", "completions_productivity",
+    "habits_created", "goals_created", "goals_completed", "hard_goals_completed",
+    "priority_goals_completed", "goals_completed_fitness", "goals_completed_education",
+    "goals_completed_personal", "goals_completed_career", "goals_completed_health",
+    "goals_completed_finance", "steps_completed", "notes_created",
+    "early_days", "late_days", "goals_on_time", "goals_week_early", "goals_within_month",
+    "long_term_goals", "full_progress_goals", "suggested_habits", "note_summaries",
+    "coach_consultations", "library_consultations",
+}
+
+# Events after which a counter may have changed
+COUNTER_EVENTS: Dict[str, Tuple[str, ...]] = {
+    "streak": (EVENT_HABIT_COMPLETED,),
+    "habits_streak_7": (EVENT_HABIT_COMPLETED,),
+    "level": (EVENT_LEVEL_UP,),
+    "total_xp": (EVENT_HABIT_COMPLETED, EVENT_GOAL_COMPLETED, EVENT_ACHIEVEMENT_UNLOCKED),
+    "daily_xp": (EVENT_HABIT_COMPLETED, EVENT_GOAL_COMPLETED),
+    "perfect_today": (EVENT_HABIT_COMPLETED,),
+    "categories_today": (EVENT_HABIT_COMPLETED,),
+    "lifetime_gold": (EVENT_HABIT_COMPLETED, EVENT_GOAL_COMPLETED),
+    **{stat: (EVENT_HABIT_COMPLETED, EVENT_ACHIEVEMENT_UNLOCKED) for stat in _STAT_NAMES},
+    "min_stat": (EVENT_HABIT_COMPLETED, EVENT_ACHIEVEMENT_UNLOCKED),
+    "stat_total": (EVENT_HABIT_COMPLETED, EVENT_ACHIEVEMENT_UNLOCKED),
+    "monarch": (EVENT_LEVEL_UP, EVENT_HABIT_COMPLETED),
+    "achievements_unlocked": (EVENT_ACHIEVEMENT_UNLOCKED,),
+    **{name: (EVENT_HABIT_COMPLETED,) for name in (
+        "completions", "hard_completions", "perfect_days", "completions_fitness", "completions_health",
+        "completions_learning", "completions_mindfulness", "completions_productivity",
+    )},
+    "habits_created": (EVENT_HABIT_CREATED,),
+    "goals_created": (EVENT_GOAL_CREATED,),
+    **{name: (EVENT_GOAL_COMPLETED,) for name in (
+        "goals_completed", "hard_goals_completed", "priority_goals_completed",
+        "goals_completed_fitness", "goals_completed_education", "goals_completed_personal",
+        "goals_completed_career", "goals_completed_health", "goals_completed_finance",
+    )},
+    "steps_completed": (EVENT_STEP_COMPLETED,),
+    "notes_created": (EVENT_NOTE_CREATED,),
+    **{name: (EVENT_HABIT_COMPLETED,) for name in (
+        "comeback_streak", "weekend_run", "perfect_run", "completion_rate_30", "scheduled_run",
+        "weekday_run", "priority_run", "habit_age", "early_days", "late_days",
+    )},
+    "levels_this_week": (EVENT_LEVEL_UP,),
+    **{name: (EVENT_HABIT_CREATED,) for name in (
+        "stats_trained", "scheduled_habits", "colored_habits", "described_habits", "suggested_habits",
+    )},
+    **{name: (EVENT_GOAL_CREATED,) for name in ("goal_horizon", "goal_steps")},
+    **{name: (EVENT_GOAL_COMPLETED,) for name in (
+        "goal_categories", "goals_this_week", "goals_on_time", "goals_week_early",
+        "goals_within_month", "long_term_goals", "full_progress_goals",
+    )},
+    **{name: (EVENT_PAGE_VIEWED,) for name in (
+        "app_opened", "account_age", "analytics_viewed", "pages_visited",
+    )},
+    "profile_completed": (EVENT_PROFILE_UPDATED,),
+    "avatar_chosen": (EVENT_PROFILE_UPDATED,),
+    "documents_uploaded": (EVENT_DOCUMENT_UPLOADED,),
+    **{name: (EVENT_MOTIVATION_READ,) for name in (
+        "motivations_read", "traditions_read", *(f"motivations_{t}" for t in MOTIVATION_TRADITIONS),
+    )},
+    "note_summaries": (EVENT_NOTE_SUMMARIZED,),
+    "coach_consultations": (EVENT_COACH_CONSULTED,),
+    "library_consultations": (EVENT_COACH_CONSULTED,),
+    "enlightened": (EVENT_LEVEL_UP, EVENT_HABIT_COMPLETED, EVENT_ACHIEVEMENT_UNLOCKED),
+}
+
+def _with_rule(achievement: AchievementDef) -> AchievementDef:
+    if achievement.key not in ACHIEVEMENT_RULES:
+        return achievement
+    counter, target = ACHIEVEMENT_RULES[achievement.key]
+    return replace(achievement, counter=counter, target=target, events=COUNTER_EVENTS[counter])
+
+
+ALL_ACHIEVEMENTS = [_with_rule(a) for a in ALL_ACHIEVEMENTS]
+ALL_ACHIEVEMENTS = [
+    replace(a, description=f"Unlock all {a.target} other achievements the app can award") if a.key == "legend" else a
+    for a in ALL_ACHIEVEMENTS
+]
+
+
+# ============ CATALOG ============
+
+class AchievementCatalog:
+    """
+    Achievement definitions indexed once: a bucket per (category, tier), with
+    "all" as a wildcard on either side, and reverse indexes from trigger event
+    and counter to the achievements they drive. Buckets keep definition order.
+    """
+
+    def __init__(self, definitions: Iterable[AchievementDef]):
+        self.definitions: Tuple[AchievementDef, ...] = tuple(definitions)
+        self.by_key: Dict[str, AchievementDef] = {a.key: a for a in self.definitions}
+
+        buckets: Dict[Tuple[str, str], List[AchievementDef]] = {}
+        by_event: Dict[str, List[AchievementDef]] = {}
+        by_counter: Dict[str, List[AchievementDef]] = {}
+        for achievement in self.definitions:
+            for key in (
+                ("all", "all"), (achievement.category, "all"),
+                ("all", achievement.tier), (achievement.category, achievement.tier),
+            ):
+                buckets.setdefault(key, []).append(achievement)
+            for event in achievement.events:
+                by_event.setdefault(event, []).append(achievement)
+            if achievement.counter is not None:
+                by_counter.setdefault(achievement.counter, []).append(achievement)
+
+        self._buckets = {key: tuple(items) for key, items in buckets.items()}
+        self.by_event: Dict[str, Tuple[AchievementDef, ...]] = {k: tuple(v) for k, v in by_event.items()}
+        self.by_counter: Dict[str, Tuple[AchievementDef, ...]] = {k: tuple(v) for k, v in by_counter.items()}
+        self.keys_by_event: Dict[str, Tuple[str, ...]] = {
+            event: tuple(a.key for a in items) for event, items in self.by_event.items()
+        }
+        self.keys_by_counter: Dict[str, Tuple[str, ...]] = {
+            counter: tuple(a.key for a in items) for counter, items in self.by_counter.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    def get(self, key: str) -> Optional[AchievementDef]:
+        return self.by_key.get(key)
+
+    def filter(self, category: str = "all", tier: str = "all") -> Tuple[AchievementDef, ...]:
+        """Achievements in a category and tier ("all" matches any)"""
+        return self._buckets.get((category or "all", tier or "all"), ())
+
+    def count(self, category: str = "all", tier: str = "all") -> int:
+        return len(self.filter(category, tier))
+
+    def triggered_by(self, event: str) -> Tuple[AchievementDef, ...]:
+        """Achievements re-evaluated after an event"""
+        return self.by_event.get(event, ())
+
+
+ACHIEVEMENT_CATALOG = AchievementCatalog(ALL_ACHIEVEMENTS)
+
 # Achievement lookup by key
-ACHIEVEMENTS_BY_KEY: Dict[str, AchievementDef] = {a.key: a for a in ALL_ACHIEVEMENTS}
+ACHIEVEMENTS_BY_KEY: Dict[str, AchievementDef] = ACHIEVEMENT_CATALOG.by_key
 
 
 def get_achievement_by_key(key: str) -> Optional[AchievementDef]:
     """Get achievement definition by key"""
-    return ACHIEVEMENTS_BY_KEY.get(key)
+    return ACHIEVEMENT_CATALOG.get(key)
 
 
 def get_achievements_by_category(category: str) -> List[AchievementDef]:
     """Get all achievements in a category"""
-    return [a for a in ALL_ACHIEVEMENTS if a.category == category]
+    return list(ACHIEVEMENT_CATALOG.filter(category=category))
 
 
 def get_achievements_by_tier(tier: str) -> List[AchievementDef]:
     """Get all achievements of a tier"""
-    return [a for a in ALL_ACHIEVEMENTS if a.tier == tier]
+    return list(ACHIEVEMENT_CATALOG.filter(tier=tier))
 
 
 # Achievement categories
 ACHIEVEMENT_CATEGORIES = [
-    {"id": "all", "name": "All", "count": len(ALL_ACHIEVEMENTS)},
-    {"id": "streaks", "name": "Streaks", "count": len(get_achievements_by_category("streaks"))},
-    {"id": "levels", "name": "Levels", "count": len(get_achievements_by_category("levels"))},
-    {"id": "habits", "name": "Habits", "count": len(get_achievements_by_category("habits"))},
-    {"id": "goals", "name": "Goals", "count": len(get_achievements_by_category("goals"))},
-    {"id": "special", "name": "Special", "count": len(get_achievements_by_category("special"))},
-    {"id": "stats", "name": "Stats", "count": len(get_achievements_by_category("stats"))},
-    {"id": "legendary", "name": "Legendary", "count": len(get_achievements_by_category("legendary"))},
+    {"id": "all", "name": "All", "count": len(ACHIEVEMENT_CATALOG)},
+    {"id": "streaks", "name": "Streaks", "count": ACHIEVEMENT_CATALOG.count("streaks")},
+    {"id": "levels", "name": "Levels", "count": ACHIEVEMENT_CATALOG.count("levels")},
+    {"id": "habits", "name": "Habits", "count": ACHIEVEMENT_CATALOG.count("habits")},
+    {"id": "goals", "name": "Goals", "count": ACHIEVEMENT_CATALOG.count("goals")},
+    {"id": "special", "name": "Special", "count": ACHIEVEMENT_CATALOG.count("special")},
+    {"id": "stats", "name": "Stats", "count": ACHIEVEMENT_CATALOG.count("stats")},
+    {"id": "legendary", "name": "Legendary", "count": ACHIEVEMENT_CATALOG.count("legendary")},
 ]
 
 # Achievement tiers
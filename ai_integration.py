@@ -3,23 +3,24 @@ Goal Quest AI Integration - Habit and Goal Generation
 Handles AI-powered features for personalized recommendations
 """
 
+import logging
 import os
 import random
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from abc import ABC, abstractmethod
+from importlib.util import find_spec
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime
 
-# Try to import AI libraries (optional)
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from text_index import InvertedIndex
 
-try:
-    import anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
+logger = logging.getLogger(__name__)
+
+# AI libraries are optional and heavy to import - check for them here,
+# import them on first call
+OPENAI_AVAILABLE = find_spec("openai") is not None
+ANTHROPIC_AVAILABLE = find_spec("anthropic") is not None
 
 
 # ============ WISDOM QUOTES DATABASE ============
@@ -416,93 +417,347 @@ def generate_goal_plan(context: str) -> Dict:
     }
 
 
+SUMMARY_MAX_CHARS = 8000  # Of the content sent to a provider
+
+
 def generate_ai_summary(content: str) -> str:
-    """Generate an AI summary of note content"""
-    # Simple extractive summary (in production, use AI)
+    """
+    Generate an AI summary of note content. The text is only sent to a
+    provider when LLM_SUMMARIES is turned on; otherwise it never leaves the app.
+    """
     sentences = content.split('. ')
     if len(sentences) <= 3:
         return content
     
+    summary = call_llm(
+        f"Summarize this in two or three sentences:\n\n{content[:SUMMARY_MAX_CHARS]}",
+        "You write concise, faithful summaries."
+    ) if LLM_SUMMARIES else None
+    if summary:
+        return summary.strip()
+    
+    # Simple extractive summary when no provider is available
     # Return first and last sentences as summary
     summary_sentences = [sentences[0], sentences[-1]] if sentences[-1] else [sentences[0]]
     return '. '.join(summary_sentences) + '.'
 
 
-def analyze_notes(notes: List[Dict], action: str) -> str:
-    """Analyze multiple notes based on action type"""
+def analyze_notes(notes: List[Dict], action: str, index: Optional[InvertedIndex] = None) -> str:
+    """
+    Analyze multiple notes based on action type.
+    Themes, connections and insights are scored with TF-IDF. Pass the user's
+    knowledge index (knowledge_index.get_knowledge_index) to reuse its
+    postings for notes that carry an "id"; otherwise the notes are indexed here.
+    """
     if not notes:
         return "No notes to analyze."
     
-    contents = [n.get("content", "") for n in notes]
-    combined = " ".join(contents)
-    
     if action == "summarize":
+        combined = " ".join(n.get("content", "") for n in notes)
         return f"Summary of {len(notes)} notes: {generate_ai_summary(combined)}"
-    elif action == "themes":
-        words = combined.lower().split()
-        word_freq = {}
-        for word in words:
-            if len(word) > 4:
-                word_freq[word] = word_freq.get(word, 0) + 1
-        top_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:5]
-        themes = [word for word, _ in top_words]
+    
+    if index is not None and all(n.get("id") is not None for n in notes):
+        keys = [("note", n["id"]) for n in notes]
+    else:
+        index = InvertedIndex()
+        keys = [("note", position) for position in range(len(notes))]
+        for key, note in zip(keys, notes):
+            index.add_text(key, f"{note.get('title', '')}\n{note.get('content', '')}")
+    titles = {key: note.get("title") or "Untitled" for key, note in zip(keys, notes)}
+    
+    if action == "themes":
+        themes = [term for term, _ in index.top_terms(keys, 5)]
+        if not themes:
+            return "No clear themes yet - these notes are too short to compare."
         return f"Key themes: {', '.join(themes)}"
     elif action == "connections":
-        return f"Found {len(notes)} related notes. Consider grouping by topic or date."
+        pairs = {}
+        for key in keys:
+            for other, score in index.similar(key, 1, candidates=keys):
+                pair = tuple(sorted((key, other), key=repr))
+                pairs[pair] = max(score, pairs.get(pair, 0.0))
+        ranked = sorted(pairs.items(), key=lambda item: item[1], reverse=True)[:5]
+        if not ranked:
+            return f"No strong connections between these {len(notes)} notes yet."
+        lines = [
+            f"\"{titles[a]}\" ↔ \"{titles[b]}\" (shared: {', '.join(index.shared_terms(a, b, 3))})"
+            for (a, b), _ in ranked
+        ]
+        return "Connected notes:\n" + "\n".join(lines)
     elif action == "insights":
-        return f"Analysis of {len(notes)} notes reveals patterns in your thinking. Regular reflection deepens these insights."
+        themes = [term for term, _ in index.top_terms(keys, 3)]
+        if not themes:
+            return f"Analysis of {len(notes)} notes: write a little more and patterns will emerge."
+        insight = f"Your notes return most often to {themes[0]}"
+        together = [term for term, _ in index.cooccurring(themes[0], 2, keys=keys)]
+        if together:
+            insight += f", usually alongside {' and '.join(together)}"
+        insight += "."
+        # The note whose strongest term appears nowhere else in the selection
+        selected = set(keys)
+        distinctive = []
+        for key in keys:
+            unique = [
+                (index.weight(term, count), term) for term, count in index.documents.get(key, {}).items()
+                if selected.isdisjoint(index.postings[term].keys() - {key})
+            ]
+            if unique:
+                distinctive.append((max(unique), key))
+        if len(keys) > 1 and distinctive:
+            (_, term), key = max(distinctive)
+            insight += f" \"{titles[key]}\" stands apart, the only one about {term}."
+        return insight
     
     return "Analysis complete."
 
 
 # ============ AI API INTEGRATION (Optional) ============
+# Each provider keeps one client (and so one HTTP connection pool) per process.
+# Calls have connect/read timeouts and bounded retries with jittered backoff,
+# all within a total deadline per call,
+# and a circuit breaker stops calling a failing or slow provider for a while so
+# callers fall back to the local templates at once. Settings come from the
+# environment:
+#   LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_CALL_DEADLINE, LLM_SLOW_CALL (s),
+#   LLM_MAX_RETRIES, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN (s),
+#   LLM_MAX_CONNECTIONS, OPENAI_BASE_URL, ANTHROPIC_BASE_URL (e.g. a local stub server)
+# Note and document text is only sent for summaries with LLM_SUMMARIES=1.
 
-def call_openai(prompt: str, system_prompt: str = None) -> Optional[str]:
-    """Call OpenAI API if available"""
-    if not OPENAI_AVAILABLE:
-        return None
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+LLM_CONNECT_TIMEOUT = _env_float("LLM_CONNECT_TIMEOUT", 3.0)
+LLM_READ_TIMEOUT = _env_float("LLM_READ_TIMEOUT", 20.0)
+LLM_CALL_DEADLINE = _env_float("LLM_CALL_DEADLINE", 30.0)  # All attempts and backoff of one call
+LLM_SLOW_CALL = _env_float("LLM_SLOW_CALL", 10.0)  # Slower successful calls count against the breaker
+LLM_MAX_RETRIES = int(_env_float("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 4.0
+LLM_BREAKER_FAILURES = int(_env_float("LLM_BREAKER_FAILURES", 3))
+LLM_BREAKER_COOLDOWN = _env_float("LLM_BREAKER_COOLDOWN", 60.0)
+LLM_MAX_CONNECTIONS = int(_env_float("LLM_MAX_CONNECTIONS", 10))
+LLM_SUMMARIES = os.environ.get("LLM_SUMMARIES", "").lower() in ("1", "true", "yes")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed calls. Once `cooldown` seconds
+    have passed a single trial call is let through: success closes the
+    breaker, failure opens it again.
+    """
     
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (0-based)"""
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMProvider(ABC):
+    """A chat model API with a long-lived client, retries and a circuit breaker"""
+    
+    name = ""
+    api_key_env = ""
+    base_url_env = ""
+    model = ""
+    
+    def __init__(self, breaker: Optional[CircuitBreaker] = None):
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+        self._lock = threading.Lock()
+    
+    @property
+    def available(self) -> bool:
+        """API key set (providers also require their SDK)"""
+        return bool(os.environ.get(self.api_key_env))
+    
+    @property
+    def client(self):
+        """The process-wide client, created on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client(
+                        api_key=os.environ.get(self.api_key_env),
+                        base_url=os.environ.get(self.base_url_env) or None,
+                    )
+        return self._client
+    
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+    
+    @staticmethod
+    def _http_client():
+        """Shared connection pool with connect and read timeouts"""
+        import httpx
+        return httpx.Client(
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        )
+    
+    @staticmethod
+    def _request_timeout(remaining: float):
+        """The client's timeouts, cut short to what is left of the call's deadline"""
+        import httpx
+        return httpx.Timeout(min(LLM_READ_TIMEOUT, remaining), connect=min(LLM_CONNECT_TIMEOUT, remaining))
+    
+    @abstractmethod
+    def _create_client(self, api_key: str, base_url: Optional[str]):
+        """The SDK client, created once per process"""
+    
+    @abstractmethod
+    def _send(self, prompt: str, system_prompt: Optional[str], timeout: float) -> str:
+        """One request; `timeout` is the seconds left before the call's deadline"""
+    
+    def _retryable(self, error: Exception) -> bool:
+        """Timeouts, dropped connections, rate limits and server errors are worth retrying"""
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status in (408, 409, 429) or status >= 500
+        return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+            "APIConnectionError", "APITimeoutError"
+        )
+    
+    def complete(self, prompt: str, system_prompt: Optional[str] = None) -> Optional[str]:
+        """
+        The model's reply, or None if unavailable, failing or short-circuited.
+        Retries stop once the next one could not start before LLM_CALL_DEADLINE.
+        """
+        if not self.available or not self.breaker.allow():
+            return None
+        deadline = time.monotonic() + LLM_CALL_DEADLINE
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            started = time.monotonic()
+            try:
+                reply = self._send(prompt, system_prompt, deadline - started)
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                if attempt < LLM_MAX_RETRIES and self._retryable(e) and time.monotonic() + delay < deadline:
+                    time.sleep(delay)
+                    continue
+                self.breaker.record_failure()
+                logger.warning("%s API error after %d attempt(s): %s", self.name, attempt + 1, e)
+                return None
+            if time.monotonic() - started > LLM_SLOW_CALL:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return reply
         return None
+
+
+class OpenAIProvider(LLMProvider):
+    name = "OpenAI"
+    api_key_env = "OPENAI_API_KEY"
+    base_url_env = "OPENAI_BASE_URL"
+    model = "gpt-3.5-turbo"
     
-    try:
-        client = openai.OpenAI(api_key=api_key)
+    @property
+    def available(self) -> bool:
+        return OPENAI_AVAILABLE and super().available
+    
+    def _create_client(self, api_key: str, base_url: Optional[str]):
+        import openai
+        # Retries are ours (with jitter and the breaker), not the SDK's
+        return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=self._http_client())
+    
+    def _send(self, prompt: str, system_prompt: Optional[str], timeout: float) -> str:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = self.client.chat.completions.create(
+            model=self.model,
             messages=messages,
             max_tokens=1000,
-            temperature=0.7
+            temperature=0.7,
+            timeout=self._request_timeout(timeout)
         )
         return response.choices[0].message.content
-    except Exception as e:
-        print(f"OpenAI API error: {e}")
-        return None
 
 
-def call_anthropic(prompt: str, system_prompt: str = None) -> Optional[str]:
-    """Call Anthropic API if available"""
-    if not ANTHROPIC_AVAILABLE:
-        return None
+class AnthropicProvider(LLMProvider):
+    name = "Anthropic"
+    api_key_env = "ANTHROPIC_API_KEY"
+    base_url_env = "ANTHROPIC_BASE_URL"
+    model = "claude-3-haiku-20240307"
     
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        return None
+    @property
+    def available(self) -> bool:
+        return ANTHROPIC_AVAILABLE and super().available
     
-    try:
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
+    def _create_client(self, api_key: str, base_url: Optional[str]):
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key, base_url=base_url, max_retries=0, http_client=self._http_client())
+    
+    def _send(self, prompt: str, system_prompt: Optional[str], timeout: float) -> str:
+        response = self.client.messages.create(
+            model=self.model,
             max_tokens=1000,
             system=system_prompt or "You are a helpful assistant.",
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": prompt}],
+            timeout=self._request_timeout(timeout)
         )
         return response.content[0].text
-    except Exception as e:
-        print(f"Anthropic API error: {e}")
-        return None
+
+
+PROVIDERS: Dict[str, LLMProvider] = {
+    "openai": OpenAIProvider(),
+    "anthropic": AnthropicProvider(),
+}
+
+
+def call_openai(prompt: str, system_prompt: str = None) -> Optional[str]:
+    """Call OpenAI API if available"""
+    return PROVIDERS["openai"].complete(prompt, system_prompt)
+
+
+def call_anthropic(prompt: str, system_prompt: str = None) -> Optional[str]:
+    """Call Anthropic API if available"""
+    return PROVIDERS["anthropic"].complete(prompt, system_prompt)
+
+
+def call_llm(prompt: str, system_prompt: str = None) -> Optional[str]:
+    """The first configured provider's reply; None means use the local fallback"""
+    for provider in PROVIDERS.values():
+        reply = provider.complete(prompt, system_prompt)
+        if reply:
+            return reply
+    return None
@@ -0,0 +1,151 @@
+"""
+Goal Quest Analytics - Grouped SQL aggregations for the analytics page
+Every function issues a fixed number of GROUP BY queries regardless of the
+window length and returns a pandas DataFrame ready for plotting.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+from sqlalchemy import case, func
+
+from database import Habit, Completion, HabitStreak, DailyRollup, DEFAULT_USER_ID
+
+
+# Selectable windows in days
+ANALYTICS_WINDOWS = [7, 14, 30, 90, 365]
+DEFAULT_TREND_WINDOW = 14
+
+
+def window_start(days: int, today: Optional[date] = None) -> date:
+    """First day of a window of `days` days ending today (inclusive)"""
+    today = today or date.today()
+    return today - timedelta(days=days - 1)
+
+
+def daily_completion_trend(db, days: int = DEFAULT_TREND_WINDOW, today: Optional[date] = None,
+                           user_id: int = DEFAULT_USER_ID) -> pd.DataFrame:
+    """
+    Completions per day over the window, one row per day (zero-filled)
+    Columns: date, completions
+    """
+    today = today or date.today()
+    start = window_start(days, today)
+    
+    rows = db.query(
+        Completion.date, func.count(Completion.id)
+    ).filter(
+        Completion.user_id == user_id,
+        Completion.completed == True,
+        Completion.date >= start,
+        Completion.date <= today
+    ).group_by(Completion.date).all()
+    
+    counts = pd.Series({day: count for day, count in rows}, dtype="int64")
+    index = pd.date_range(start, today, freq="D").date
+    counts = counts.reindex(index, fill_value=0)
+    return pd.DataFrame({"date": index, "completions": counts.to_numpy()})
+
+
+def habit_completion_rates(db, days: int = 30, today: Optional[date] = None,
+                           user_id: int = DEFAULT_USER_ID) -> pd.DataFrame:
+    """
+    Per active habit completion count, rate and live streak over the window
+    Columns: habit_id, habit, category, completions, completion_rate, streak, longest_streak
+    """
+    today = today or date.today()
+    start = window_start(days, today)
+    
+    window = db.query(
+        Completion.habit_id.label("habit_id"),
+        func.count(Completion.id).label("completions"),
+    ).filter(
+        Completion.user_id == user_id,
+        Completion.completed == True,
+        Completion.date >= start,
+        Completion.date <= today
+    ).group_by(Completion.habit_id).subquery()
+    
+    # A streak is live only while the last completion was today or yesterday
+    live_streak = case(
+        (HabitStreak.last_completed_date >= today - timedelta(days=1), HabitStreak.current_streak),
+        else_=0
+    )
+    
+    rows = db.query(
+        Habit.id, Habit.name, Habit.category,
+        window.c.completions, live_streak, HabitStreak.longest_streak
+    ).outerjoin(
+        window, window.c.habit_id == Habit.id
+    ).outerjoin(
+        HabitStreak, HabitStreak.habit_id == Habit.id
+    ).filter(Habit.user_id == user_id, Habit.active == True).order_by(Habit.id).all()
+    
+    df = pd.DataFrame(rows, columns=[
+        "habit_id", "habit", "category", "completions", "streak", "longest_streak"
+    ])
+    for column in ("completions", "streak", "longest_streak"):
+        df[column] = df[column].fillna(0).astype("int64")
+    df["completion_rate"] = df["completions"] / days * 100
+    return df[["habit_id", "habit", "category", "completions", "completion_rate", "streak", "longest_streak"]]
+
+
+def category_totals(db, days: int = 30, today: Optional[date] = None,
+                    user_id: int = DEFAULT_USER_ID) -> pd.DataFrame:
+    """
+    Completions per habit category over the window
+    Columns: category, completions
+    """
+    today = today or date.today()
+    start = window_start(days, today)
+    
+    rows = db.query(
+        Habit.category, func.count(Completion.id)
+    ).join(
+        Completion, Completion.habit_id == Habit.id
+    ).filter(
+        Completion.user_id == user_id,
+        Completion.completed == True,
+        Completion.date >= start,
+        Completion.date <= today
+    ).group_by(Habit.category).order_by(func.count(Completion.id).desc()).all()
+    
+    return pd.DataFrame(rows, columns=["category", "completions"])
+
+
+def completion_totals(db, days: int = 7, today: Optional[date] = None,
+                      user_id: int = DEFAULT_USER_ID) -> Dict[str, int]:
+    """All-time and in-window completion counts in one query"""
+    today = today or date.today()
+    start = window_start(days, today)
+    
+    total, in_window = db.query(
+        func.count(Completion.id),
+        func.coalesce(func.sum(case((Completion.date >= start, 1), else_=0)), 0),
+    ).filter(Completion.user_id == user_id, Completion.completed == True).one()
+    return {"total": int(total or 0), "window": int(in_window or 0)}
+
+
+def daily_rewards(db, days: int = 30, today: Optional[date] = None,
+                  user_id: int = DEFAULT_USER_ID) -> pd.DataFrame:
+    """
+    XP, gold and completions per day from the daily rollups (zero-filled)
+    Columns: date, completions, xp_earned, gold_earned
+    """
+    today = today or date.today()
+    start = window_start(days, today)
+    columns = ["completions", "xp_earned", "gold_earned"]
+    
+    rows = db.query(
+        DailyRollup.date, DailyRollup.completions, DailyRollup.xp_earned, DailyRollup.gold_earned
+    ).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.date >= start,
+        DailyRollup.date <= today
+    ).all()
+    
+    index = pd.date_range(start, today, freq="D").date
+    df = pd.DataFrame(rows, columns=["date"] + columns).set_index("date")
+    df = df.reindex(index).fillna(0).astype("int64")
+    return df.rename_axis("date").reset_index()
@@ -4,48 +4,56 @@ Exact replication of the Replit Goal Quest 2 app with all 11 pages
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from streamlit.runtime.scriptrunner import RerunException, StopException
+from contextlib import contextmanager
+from functools import lru_cache
+import html
 from datetime import datetime, date, timedelta
 import json
 import os
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 import random
 
 # Import our custom modules
 from database import (
-    SessionLocal, init_db, 
+    init_db, session_scope, read_session,
     Habit, Goal, Completion, UserStats, UserProfile, 
     Note, Achievement, Motivation, InventoryItem, ActiveEffect,
-    PhilosophyDocument, ChatSession, ChatMessage,
-    get_user_stats, get_user_profile
+    PhilosophyDocument, DocumentIngest, ChatSession, ChatMessage,
+    get_user_stats, get_user_profile, DEFAULT_USER_ID
 )
 from gameplay import (
     calculate_level_from_xp, calculate_xp_for_level, get_rank_for_level,
-    get_habit_xp, get_goal_xp, calculate_gold_reward, calculate_streak_bonus,
+    get_habit_xp, get_goal_xp,
     STAT_METADATA, DIFFICULTY_NAMES, DIFFICULTY_COLORS, CATEGORY_COLORS,
     PHILOSOPHY_TRADITIONS, AVATAR_STYLES, FOCUS_AREAS, CHALLENGE_APPROACHES, TIMEZONES,
-    DAY_NAMES, should_show_habit_today, get_stat_for_category
+    DAY_NAMES, should_show_habit_today
 )
-from achievements import ALL_ACHIEVEMENTS, ACHIEVEMENTS_BY_KEY, ACHIEVEMENT_CATEGORIES, ACHIEVEMENT_TIERS
-from shop_items import ALL_SHOP_ITEMS, SHOP_ITEMS_BY_ID, SHOP_CATEGORIES, RARITY_COLORS
+import progression
+from progression import calculate_streak
+from habit_queries import HabitSummary, get_habit_summaries
+from achievements import (
+    ALL_ACHIEVEMENTS, ACHIEVEMENT_CATALOG, ACHIEVEMENTS_BY_KEY, ACHIEVEMENT_CATEGORIES, ACHIEVEMENT_TIERS,
+    EVENT_HABIT_CREATED, EVENT_GOAL_CREATED, EVENT_STEP_COMPLETED, EVENT_NOTE_CREATED,
+    EVENT_PAGE_VIEWED, EVENT_PROFILE_UPDATED, EVENT_MOTIVATION_READ, EVENT_DOCUMENT_UPLOADED,
+    EVENT_COACH_CONSULTED, EVENT_NOTE_SUMMARIZED
+)
+from achievement_engine import get_progress
+from effects import get_reward_pipeline, start_effect_sweeper
+from document_ingest import (
+    delete_document, enqueue_document, file_type_for, queue_document, start_document_ingestor, store_upload
+)
+from inventory import get_inventory, purchase_item, stack_limit, use_item
+from knowledge_index import KNOWLEDGE_INDEX, get_knowledge_index
+from note_search import NOTES_PAGE_SIZE, NoteHit, delete_note, get_user_tags, search_notes
+from vector_index import VECTOR_INDEX, SOURCE_PASSAGE, retrieve
+from shop_items import SHOP_CATALOG, SHOP_ITEMS_BY_ID, SHOP_CATEGORIES, RARITY_COLORS
 from ai_integration import (
     get_wisdom_quote, generate_habit_suggestions as ai_generate_habits,
     generate_goal_plan as ai_generate_goal, generate_ai_summary, analyze_notes
 )
 
-# Page configuration
-st.set_page_config(
-    page_title="Goal Quest",
-    page_icon="⚔️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Initialize database
-init_db()
-
 # Custom CSS for Solo Leveling theme
 def load_custom_css():
     st.markdown("""
@@ -150,14 +158,28 @@ def load_custom_css():
         transform: translateY(-2px);
         box-shadow: 0 4px 12px rgba(251, 191, 36, 0.4);
     }
+    
+    /* Achievement grid */
+    .ach-grid { display: grid; grid-template-columns: repeat(4, minmax(0, 1fr)); gap: 1rem; }
+    .ach { background: rgba(30, 30, 50, 0.8); border: 2px solid var(--tier); border-radius: 12px;
+           padding: 1rem; text-align: center; }
+    .ach.locked { opacity: 0.5; }
+    .ach-icon { font-size: 2rem; margin-bottom: 0.5rem; }
+    .ach-title { font-weight: bold; color: var(--tier); }
+    .ach-desc { font-size: 0.8rem; color: #9ca3af; margin: 0.5rem 0; }
+    .ach-reward { font-size: 0.8rem; color: #fbbf24; }
+    .ach-tier { font-size: 0.7rem; color: var(--tier); margin-top: 0.5rem; text-transform: uppercase; }
+    .ach-bar { height: 6px; background: #1f2937; border-radius: 3px; margin-top: 0.5rem; overflow: hidden; }
+    .ach-bar > div { height: 100%; background: linear-gradient(90deg, #fbbf24, #f59e0b); }
+    .ach-count { font-size: 0.7rem; color: #9ca3af; }
+    .t-bronze { --tier: #d97706; } .t-silver { --tier: #9ca3af; } .t-gold { --tier: #fbbf24; }
+    .t-platinum { --tier: #22d3ee; } .t-legendary { --tier: #a855f7; }
     </style>
     """, unsafe_allow_html=True)
 
 
 # Initialize session state
 def init_session_state():
-    if 'db' not in st.session_state:
-        st.session_state.db = SessionLocal()
     if 'current_page' not in st.session_state:
         st.session_state.current_page = "Dashboard"
     if 'show_celebration' not in st.session_state:
@@ -166,17 +188,39 @@ def init_session_state():
 
 # ============ DATABASE HELPERS ============
 
+# Each script run gets its own session, opened in main() and closed when the
+# run ends, so idle tabs hold no connection and identity maps never outlive a rerun
+_request = threading.local()
+
+# Pages that only read; they use the lighter read session
+READ_ONLY_PAGES = {"Analytics", "Rewards"}
+
+# Streamlit control flow raised mid-run; work done before it is kept
+SCRIPT_CONTROL_FLOW = (RerunException, StopException)
+
+
 def get_db():
-    if 'db' not in st.session_state:
-        st.session_state.db = SessionLocal()
-    return st.session_state.db
+    db = getattr(_request, "db", None)
+    if db is None:
+        raise RuntimeError("get_db() called outside a script run")
+    return db
+
 
+@contextmanager
+def request_session(read_only: bool = False):
+    """Open the session for one script run and expose it through get_db()"""
+    scope = read_session() if read_only else session_scope(commit_on=SCRIPT_CONTROL_FLOW)
+    with scope as db:
+        _request.db = db
+        try:
+            yield db
+        finally:
+            _request.db = None
 
-def refresh_db():
-    if 'db' in st.session_state:
-        st.session_state.db.close()
-    st.session_state.db = SessionLocal()
-    return st.session_state.db
+
+def get_user_id() -> int:
+    """Id of the user this browser session acts for"""
+    return st.session_state.setdefault('user_id', DEFAULT_USER_ID)
 
 
 # ============ HELPER FUNCTIONS ============
@@ -185,49 +229,38 @@ def get_today_str() -> str:
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def calculate_streak(db, habit_id: int) -> int:
-    """Calculate current streak for a habit"""
-    completions = db.query(Completion).filter(
-        Completion.habit_id == habit_id,
-        Completion.completed == True
-    ).order_by(Completion.date.desc()).all()
-    
-    if not completions:
-        return 0
-    
-    streak = 0
-    current_date = date.today()
-    
-    for completion in completions:
-        comp_date = datetime.strptime(completion.date, "%Y-%m-%d").date()
-        if comp_date == current_date or comp_date == current_date - timedelta(days=1):
-            streak += 1
-            current_date = comp_date - timedelta(days=1)
-        else:
-            break
-    
-    return streak
-
-
 def get_daily_wisdom(db, tradition: str = "esoteric") -> Dict[str, str]:
     """Get or generate daily wisdom quote"""
     today = get_today_str()
     
-    motivation = db.query(Motivation).filter(Motivation.date == today).first()
+    motivation = db.query(Motivation).filter(
+        Motivation.user_id == get_user_id(),
+        Motivation.date == today
+    ).first()
     
     if not motivation:
         # Use the AI integration module for wisdom quotes
         wisdom = get_wisdom_quote(tradition)
         
+        # Pair it with a passage from the user's library about their priority habits
+        habit_context = "Focus on your priority habits today."
+        focus = " ".join(name for (name,) in db.query(Habit.name).filter(
+            Habit.user_id == get_user_id(), Habit.priority.is_(True)
+        ))
+        passages = retrieve(db, f"{focus} {wisdom['quote']}", get_user_id(), k=1, sources=(SOURCE_PASSAGE,))
+        if passages:
+            habit_context = f"From {passages[0].title}: {passages[0].text[:300]}"
+        
         motivation = Motivation(
+            user_id=get_user_id(),
             date=today,
             quote=wisdom["quote"],
             philosophy=wisdom["philosophy"],
             tradition=tradition,
-            habit_context="Focus on your priority habits today."
+            habit_context=habit_context
         )
         db.add(motivation)
-        db.commit()
+        emit_event(db, EVENT_MOTIVATION_READ, motivation=motivation)
     
     return {
         "quote": motivation.quote,
@@ -238,65 +271,35 @@ def get_daily_wisdom(db, tradition: str = "esoteric") -> Dict[str, str]:
 
 
 def award_xp(db, amount: int, source: str = "habit"):
-    """Award XP to user and handle level ups"""
-    stats = get_user_stats(db)
-    
-    # Apply any active XP multipliers
-    active_effects = db.query(ActiveEffect).filter(
-        ActiveEffect.effect_type == "xp_multiplier",
-        ActiveEffect.expires_at > datetime.now()
-    ).all()
-    
-    multiplier = 1.0
-    for effect in active_effects:
-        multiplier *= effect.value
-    
-    final_xp = int(amount * multiplier)
-    
-    stats.current_xp += final_xp
-    stats.total_xp += final_xp
-    
-    # Check for level up
-    level, current_in_level, needed = calculate_level_from_xp(stats.total_xp)
-    if level > stats.level:
-        stats.level = level
-        stats.current_xp = current_in_level
-        stats.last_level_up = datetime.now()
+    """Award XP to user and celebrate level ups"""
+    result = progression.award_xp(db, amount, source, user_id=get_user_id())
+    if result.leveled_up:
         st.session_state.show_celebration = True
         st.balloons()
-    
-    db.commit()
-    return final_xp
+    announce_achievements(result.unlocked)
+    return result.amount
 
 
 def award_gold(db, amount: int):
     """Award gold to user"""
-    stats = get_user_stats(db)
-    
-    # Apply any active gold multipliers
-    active_effects = db.query(ActiveEffect).filter(
-        ActiveEffect.effect_type == "gold_multiplier",
-        ActiveEffect.expires_at > datetime.now()
-    ).all()
-    
-    multiplier = 1.0
-    for effect in active_effects:
-        multiplier *= effect.value
-    
-    final_gold = int(amount * multiplier)
-    
-    stats.current_gold += final_gold
-    stats.lifetime_gold += final_gold
-    db.commit()
-    return final_gold
+    return progression.award_gold(db, amount, user_id=get_user_id())
 
 
 def update_stat(db, stat_name: str, amount: int = 1):
     """Update a specific stat"""
-    stats = get_user_stats(db)
-    current = getattr(stats, stat_name, 0)  # FIXED: Default to 0, not 10
-    setattr(stats, stat_name, current + amount)
-    db.commit()
+    progression.update_stat(db, stat_name, amount, user_id=get_user_id())
+
+
+def emit_event(db, event: str, **payload) -> List:
+    """Dispatch a gameplay event, commit it with the pending changes that raised it and toast any unlocks"""
+    unlocked = progression.emit_event(db, event, user_id=get_user_id(), **payload)
+    announce_achievements(unlocked)
+    return unlocked
+
+
+def announce_achievements(unlocked: List):
+    for achievement in unlocked:
+        st.toast(f"🏆 Achievement unlocked: {achievement.title}")
 
 
 # ============ AVATAR SYSTEM ============
@@ -355,8 +358,8 @@ def render_avatar_card(profile, stats):
     """, unsafe_allow_html=True)
 
 
-def render_stats_panel(stats):
-    """Renders the 6 stat bars using Streamlit native components"""
+def render_stats_panel(stats, boosts: Optional[Dict[str, int]] = None):
+    """Renders the 6 stat bars using Streamlit native components, with any temporary boosts"""
     stat_config = [
         ("Strength", "strength", "💪"),
         ("Intelligence", "intelligence", "🧠"),
@@ -369,7 +372,8 @@ def render_stats_panel(stats):
     st.markdown("### 📊 Combat Stats")
     
     for label, key, icon in stat_config:
-        value = getattr(stats, key, 0) or 0
+        boost = (boosts or {}).get(key, 0)
+        value = (getattr(stats, key, 0) or 0) + boost
         
         # Use Streamlit columns for layout
         col1, col2 = st.columns([4, 1])
@@ -377,7 +381,7 @@ def render_stats_panel(stats):
             st.caption(f"{icon} {label}")
             st.progress(min(value / 100, 1.0))
         with col2:
-            st.markdown(f"**{value}**")
+            st.markdown(f"**{value}** (+{boost})" if boost else f"**{value}**")
 
 
 # ============ PAGE COMPONENTS ============
@@ -424,9 +428,10 @@ def render_stat_card(stat_name: str, value: int, icon: str):
     """, unsafe_allow_html=True)
 
 
-def render_habit_card(habit: Habit, db, completed_today: bool):
+def render_habit_card(summary: HabitSummary, db):
     """Render a habit card with completion button"""
-    streak = calculate_streak(db, habit.id)
+    habit = summary.habit
+    streak = summary.streak
     difficulty_name = DIFFICULTY_NAMES.get(habit.difficulty, "Easy")
     xp_reward = get_habit_xp(habit.difficulty)
     
@@ -449,7 +454,7 @@ def render_habit_card(habit: Habit, db, completed_today: bool):
             """, unsafe_allow_html=True)
         
         with col3:
-            if completed_today:
+            if summary.completed_today:
                 st.markdown("✅")
             else:
                 if st.button("Complete", key=f"habit_{habit.id}"):
@@ -459,35 +464,30 @@ def render_habit_card(habit: Habit, db, completed_today: bool):
 
 def complete_habit(db, habit: Habit):
     """Complete a habit for today"""
-    today = get_today_str()
-    
-    # Check if already completed
-    existing = db.query(Completion).filter(
-        Completion.habit_id == habit.id,
-        Completion.date == today
-    ).first()
-    
-    if not existing:
-        completion = Completion(habit_id=habit.id, date=today, completed=True)
-        db.add(completion)
-        
-        # Award XP
-        xp = get_habit_xp(habit.difficulty)
-        streak = calculate_streak(db, habit.id) + 1
-        streak_bonus = calculate_streak_bonus(streak)
-        final_xp = int(xp * streak_bonus)
-        award_xp(db, final_xp, "habit")
-        
-        # Award gold
-        gold = calculate_gold_reward(habit.difficulty, is_habit=True)
-        award_gold(db, gold)
-        
-        # Update stat
-        stat = get_stat_for_category(habit.category)
-        update_stat(db, stat, 1)
-        
-        db.commit()
-        st.success(f"🎉 +{final_xp} XP • +{gold} Gold!")
+    result = progression.complete_habit(db, habit)
+    if not result.created:
+        return
+    if result.leveled_up:
+        st.session_state.show_celebration = True
+        st.balloons()
+    announce_achievements(result.unlocked)
+    if result.critical:
+        st.toast("💥 Critical strike!")
+    if result.doubled:
+        st.toast("⚔️ Double tap - counted twice!")
+    st.success(f"🎉 +{result.xp} XP • +{result.gold} Gold!")
+
+
+def complete_goal(db, goal: Goal):
+    """Complete a goal and celebrate"""
+    result = progression.complete_goal(db, goal)
+    if not result.created:
+        return
+    if result.leveled_up:
+        st.session_state.show_celebration = True
+        st.balloons()
+    announce_achievements(result.unlocked)
+    st.success(f"🏆 Goal complete! +{result.xp} XP • +{result.gold} Gold!")
 
 
 # ============ MAIN PAGES ============
@@ -495,8 +495,8 @@ def complete_habit(db, habit: Habit):
 def page_dashboard():
     """Dashboard page - Hero section with avatar, XP, daily wisdom, priority quests"""
     db = get_db()
-    stats = get_user_stats(db)
-    profile = get_user_profile(db)
+    stats = get_user_stats(db, get_user_id())
+    profile = get_user_profile(db, get_user_id())
     
     # Hero Section
     st.markdown(f"""
@@ -519,12 +519,13 @@ def page_dashboard():
         render_avatar_card(profile, stats)
     
     with col_stats:
-        render_stats_panel(stats)
+        render_stats_panel(stats, get_reward_pipeline(db, get_user_id()).stat_boosts())
     
     st.markdown("---")
     
     # Two column layout for wisdom and quests
     col1, col2 = st.columns([2, 1])
+    summaries = get_habit_summaries(db, user_id=get_user_id())
     
     with col1:
         # Daily Wisdom
@@ -535,32 +536,26 @@ def page_dashboard():
         <div style='background: linear-gradient(135deg, rgba(251, 191, 36, 0.1), transparent);
              border: 1px solid rgba(251, 191, 36, 0.3); border-radius: 16px; padding: 1.5rem;'>
             <p style='font-size: 1.2rem; font-style: italic; color: #fbbf24; margin-bottom: 1rem;'>
-                "{wisdom['quote']}"
+                "{html.escape(wisdom['quote'])}"
             </p>
-            <p style='color: #9ca3af; font-size: 0.9rem;'>{wisdom['philosophy']}</p>
+            <p style='color: #9ca3af; font-size: 0.9rem;'>{html.escape(wisdom['philosophy'])}</p>
             <p style='color: #6b7280; font-size: 0.8rem; margin-top: 0.5rem;'>
-                — {wisdom['tradition'].title()} Tradition
+                — {html.escape(wisdom['tradition'].title())} Tradition
             </p>
         </div>
         """, unsafe_allow_html=True)
+        if wisdom["habit_context"]:
+            st.caption(f"📚 {wisdom['habit_context']}")
         
         st.markdown("---")
         
         # Priority Quests
         st.markdown("### ⭐ Priority Quests")
-        priority_habits = db.query(Habit).filter(
-            Habit.active == True,
-            Habit.priority == True
-        ).limit(4).all()
+        priority_habits = [s for s in summaries if s.habit.priority][:4]
         
         if priority_habits:
-            today = get_today_str()
-            for habit in priority_habits:
-                completion = db.query(Completion).filter(
-                    Completion.habit_id == habit.id,
-                    Completion.date == today
-                ).first()
-                render_habit_card(habit, db, completion is not None)
+            for summary in priority_habits:
+                render_habit_card(summary, db)
         else:
             st.info("No priority habits set. Mark habits as priority in the Habits page!")
     
@@ -569,13 +564,8 @@ def page_dashboard():
         st.markdown("### 📊 Quick Stats")
         
         # Current streak
-        today = get_today_str()
-        completions_today = db.query(Completion).filter(
-            Completion.date == today,
-            Completion.completed == True
-        ).count()
-        
-        total_habits = db.query(Habit).filter(Habit.active == True).count()
+        completions_today = sum(1 for s in summaries if s.completed_today)
+        total_habits = len(summaries)
         
         st.metric("Completed Today", f"{completions_today}/{total_habits}")
         st.metric("Current Gold", f"💰 {stats.current_gold:,}")
@@ -598,19 +588,12 @@ def page_habits():
     tab1, tab2 = st.tabs(["Active Habits", "Create New"])
     
     with tab1:
-        habits = db.query(Habit).filter(Habit.active == True).all()
+        summaries = get_habit_summaries(db, user_id=get_user_id())
         
-        if habits:
-            today = get_today_str()
-            
-            for habit in habits:
-                completion = db.query(Completion).filter(
-                    Completion.habit_id == habit.id,
-                    Completion.date == today
-                ).first()
-                
+        if summaries:
+            for summary in summaries:
                 with st.container():
-                    render_habit_card(habit, db, completion is not None)
+                    render_habit_card(summary, db)
                     st.markdown("---")
         else:
             st.info("No habits yet! Create your first habit to begin your journey.")
@@ -649,6 +632,7 @@ def page_habits():
             
             if submitted and name:
                 new_habit = Habit(
+                    user_id=get_user_id(),
                     name=name,
                     description=description,
                     category=category,
@@ -659,7 +643,7 @@ def page_habits():
                     color=color
                 )
                 db.add(new_habit)
-                db.commit()
+                emit_event(db, EVENT_HABIT_CREATED, habit=new_habit)
                 st.success("🎉 Habit created successfully!")
                 st.rerun()
 
@@ -674,7 +658,7 @@ def page_goals():
     tab1, tab2, tab3 = st.tabs(["Active Goals", "Completed", "Create New"])
     
     with tab1:
-        goals = db.query(Goal).filter(Goal.completed == False).all()
+        goals = db.query(Goal).filter(Goal.user_id == get_user_id(), Goal.completed == False).all()
         
         if goals:
             for goal in goals:
@@ -693,11 +677,28 @@ def page_goals():
                             steps = goal.steps if isinstance(goal.steps, list) else json.loads(goal.steps or "[]")
                             for i, step in enumerate(steps):
                                 completed = step.get('completed', False)
-                                st.checkbox(
+                                checked = st.checkbox(
                                     step.get('title', f'Step {i+1}'),
                                     value=completed,
                                     key=f"step_{goal.id}_{i}"
                                 )
+                                if checked != completed:
+                                    # A step counts towards achievements the first time it is checked;
+                                    # completed_at stays when it is unchecked so re-checking is not counted
+                                    first_completion = checked and not step.get('completed_at')
+                                    updated = {**step, 'completed': checked}
+                                    if first_completion:
+                                        updated['completed_at'] = datetime.now().isoformat()
+                                    # Reassign so the JSON column is marked dirty
+                                    goal.steps = [
+                                        updated if j == i else other
+                                        for j, other in enumerate(steps)
+                                    ]
+                                    if first_completion:
+                                        emit_event(db, EVENT_STEP_COMPLETED, goal=goal, step=step)
+                                    else:
+                                        db.commit()
+                                    st.rerun()
                     
                     with col2:
                         xp = get_goal_xp(goal.difficulty)
@@ -715,18 +716,18 @@ def page_goals():
                         # Update progress
                         new_progress = st.slider("Progress", 0, 100, goal.progress, key=f"prog_{goal.id}")
                         if new_progress != goal.progress:
-                            goal.progress = new_progress
                             if new_progress == 100:
-                                goal.completed = True
-                                award_xp(db, xp, "goal")
-                                award_gold(db, calculate_gold_reward(goal.difficulty, is_habit=False))
-                            db.commit()
+                                # complete_goal sets the progress, after reading where it started
+                                complete_goal(db, goal)
+                            else:
+                                goal.progress = new_progress
+                                db.commit()
                             st.rerun()
         else:
             st.info("No active goals. Create a goal to start achieving!")
     
     with tab2:
-        completed_goals = db.query(Goal).filter(Goal.completed == True).all()
+        completed_goals = db.query(Goal).filter(Goal.user_id == get_user_id(), Goal.completed == True).all()
         
         if completed_goals:
             for goal in completed_goals:
@@ -761,6 +762,7 @@ def page_goals():
             
             if submitted and title:
                 new_goal = Goal(
+                    user_id=get_user_id(),
                     title=title,
                     description=description,
                     category=category,
@@ -770,42 +772,54 @@ def page_goals():
                     priority=priority
                 )
                 db.add(new_goal)
-                db.commit()
+                emit_event(db, EVENT_GOAL_CREATED, goal=new_goal)
                 st.success("🎯 Goal created successfully!")
                 st.rerun()
 
 
 def page_analytics():
     """Analytics page - Charts and progress tracking"""
+    # Charting stack is only loaded when the page is opened
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from analytics import (
+        ANALYTICS_WINDOWS, DEFAULT_TREND_WINDOW,
+        daily_completion_trend, habit_completion_rates, category_totals, completion_totals,
+        daily_rewards
+    )
+    
     db = get_db()
-    stats = get_user_stats(db)
+    stats = get_user_stats(db, get_user_id())
     
     st.markdown("## 📊 Analytics")
     st.markdown("Track your progress and identify areas for improvement")
     
+    window_days = st.selectbox(
+        "Time Window",
+        ANALYTICS_WINDOWS,
+        index=ANALYTICS_WINDOWS.index(DEFAULT_TREND_WINDOW),
+        format_func=lambda d: f"Last {d} days"
+    )
+    
+    habit_rates = habit_completion_rates(db, days=window_days, user_id=get_user_id())
+    totals = completion_totals(db, days=7, user_id=get_user_id())
+    
     # Top metrics row
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         # Calculate weekly progress
-        week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-        weekly_completions = db.query(Completion).filter(
-            Completion.date >= week_ago,
-            Completion.completed == True
-        ).count()
-        total_possible = db.query(Habit).filter(Habit.active == True).count() * 7
-        weekly_pct = (weekly_completions / total_possible * 100) if total_possible > 0 else 0
+        total_possible = len(habit_rates) * 7
+        weekly_pct = (totals["window"] / total_possible * 100) if total_possible > 0 else 0
         st.metric("Weekly Progress", f"{weekly_pct:.0f}%")
     
     with col2:
         # Find best streak
-        habits = db.query(Habit).filter(Habit.active == True).all()
-        best_streak = max([calculate_streak(db, h.id) for h in habits], default=0)
+        best_streak = int(habit_rates["streak"].max()) if not habit_rates.empty else 0
         st.metric("Best Streak", f"🔥 {best_streak} days")
     
     with col3:
-        total_completions = db.query(Completion).filter(Completion.completed == True).count()
-        st.metric("Total Completions", f"✅ {total_completions}")
+        st.metric("Total Completions", f"✅ {totals['total']}")
     
     with col4:
         st.metric("Total XP", f"✨ {stats.total_xp:,}")
@@ -816,22 +830,13 @@ def page_analytics():
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("### 📈 Completion Trend (Last 14 Days)")
-        
-        # Get completion data for last 14 days
-        dates = [(datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(13, -1, -1)]
-        completion_counts = []
+        st.markdown(f"### 📈 Completion Trend (Last {window_days} Days)")
         
-        for d in dates:
-            count = db.query(Completion).filter(
-                Completion.date == d,
-                Completion.completed == True
-            ).count()
-            completion_counts.append(count)
+        trend = daily_completion_trend(db, days=window_days, user_id=get_user_id())
         
         fig = px.line(
-            x=dates, y=completion_counts,
-            labels={"x": "Date", "y": "Completions"},
+            trend, x="date", y="completions",
+            labels={"date": "Date", "completions": "Completions"},
             markers=True
         )
         fig.update_traces(line_color="#fbbf24", marker_color="#f59e0b")
@@ -877,28 +882,13 @@ def page_analytics():
     
     # Habit Performance
     st.markdown("### 📋 Habit Performance")
-    habits = db.query(Habit).filter(Habit.active == True).all()
-    
-    if habits:
-        habit_data = []
-        for habit in habits:
-            # Calculate completion rate for last 30 days
-            month_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-            completions = db.query(Completion).filter(
-                Completion.habit_id == habit.id,
-                Completion.date >= month_ago,
-                Completion.completed == True
-            ).count()
-            
-            rate = (completions / 30) * 100
-            habit_data.append({
-                "Habit": habit.name,
-                "Completion Rate": rate,
-                "Category": habit.category.title(),
-                "Streak": calculate_streak(db, habit.id)
-            })
-        
-        df = pd.DataFrame(habit_data)
+    if not habit_rates.empty:
+        df = habit_rates.rename(columns={
+            "habit": "Habit",
+            "completion_rate": "Completion Rate",
+            "streak": "Streak"
+        })
+        df["Category"] = df["category"].str.title()
         
         fig = px.bar(
             df, x="Habit", y="Completion Rate",
@@ -911,6 +901,74 @@ def page_analytics():
             font_color="#ffffff"
         )
         st.plotly_chart(fig, use_container_width=True)
+        
+        # Daily XP and gold from the materialized rollups
+        st.markdown(f"### ✨ XP & Gold Earned (Last {window_days} Days)")
+        rewards = daily_rewards(db, days=window_days, user_id=get_user_id())
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=rewards["date"], y=rewards["xp_earned"], name="XP", marker_color="#fbbf24"))
+        fig.add_trace(go.Bar(x=rewards["date"], y=rewards["gold_earned"], name="Gold", marker_color="#f59e0b"))
+        fig.update_layout(
+            barmode="group",
+            plot_bgcolor="rgba(0,0,0,0)",
+            paper_bgcolor="rgba(0,0,0,0)",
+            font_color="#ffffff"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Category breakdown
+        st.markdown("### 🗂️ Completions by Category")
+        by_category = category_totals(db, days=window_days, user_id=get_user_id())
+        if not by_category.empty:
+            by_category["category"] = by_category["category"].str.title()
+            fig = px.bar(
+                by_category, x="category", y="completions",
+                labels={"category": "Category", "completions": "Completions"}
+            )
+            fig.update_traces(marker_color="#fbbf24")
+            fig.update_layout(
+                plot_bgcolor="rgba(0,0,0,0)",
+                paper_bgcolor="rgba(0,0,0,0)",
+                font_color="#ffffff"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+
+ACHIEVEMENTS_PAGE_SIZE = 24
+
+
+@lru_cache(maxsize=None)
+def achievement_card_html(key: str, unlocked: bool) -> Tuple[str, str]:
+    """Static card markup for an achievement, split where the progress bar goes"""
+    achievement = ACHIEVEMENTS_BY_KEY[key]
+    gold = f" • +{achievement.gold_reward} 💰" if achievement.gold_reward > 0 else ""
+    head = (
+        f"<div class='ach t-{achievement.tier}{'' if unlocked else ' locked'}'>"
+        f"<div class='ach-icon'>{'🏆' if unlocked else '🔒'}</div>"
+        f"<div class='ach-title'>{html.escape(achievement.title)}</div>"
+        f"<div class='ach-desc'>{html.escape(achievement.description)}</div>"
+        f"<div class='ach-reward'>+{achievement.xp_reward} XP{gold}</div>"
+        f"<div class='ach-tier'>{achievement.tier}</div>"
+    )
+    return head, "</div>"
+
+
+def render_achievement_grid(achievements, unlocked_keys, progress) -> str:
+    """All cards as one compact HTML block"""
+    cards = []
+    for achievement in achievements:
+        is_unlocked = achievement.key in unlocked_keys
+        bar = ""
+        if not is_unlocked and achievement.key in progress:
+            current, target = progress[achievement.key]
+            pct = min(current / target, 1.0) * 100 if target else 0
+            bar = (
+                f"<div class='ach-bar'><div style='width:{pct:.0f}%'></div></div>"
+                f"<div class='ach-count'>{current:,}/{target:,}</div>"
+            )
+        head, tail = achievement_card_html(achievement.key, is_unlocked)
+        cards.append(head + bar + tail)
+    return f"<div class='ach-grid'>{''.join(cards)}</div>"
 
 
 def page_rewards():
@@ -921,8 +979,12 @@ def page_rewards():
     st.markdown("Track your accomplishments and unlock rewards")
     
     # Get unlocked achievements
-    unlocked = db.query(Achievement).filter(Achievement.unlocked_at != None).all()
+    unlocked = db.query(Achievement).filter(
+        Achievement.user_id == get_user_id(),
+        Achievement.unlocked_at != None
+    ).all()
     unlocked_keys = {a.key for a in unlocked}
+    progress = get_progress(db, user_id=get_user_id())
     
     # Stats
     col1, col2, col3 = st.columns(3)
@@ -951,55 +1013,28 @@ def page_rewards():
     )
     
     # Filter achievements
-    filtered = ALL_ACHIEVEMENTS
-    if category_filter != "all":
-        filtered = [a for a in filtered if a.category == category_filter]
-    if tier_filter != "all":
-        filtered = [a for a in filtered if a.tier == tier_filter]
-    
-    # Display achievements
-    cols = st.columns(4)
-    for i, achievement in enumerate(filtered):
-        is_unlocked = achievement.key in unlocked_keys
-        
-        with cols[i % 4]:
-            tier_colors = {
-                "bronze": "#d97706",
-                "silver": "#9ca3af",
-                "gold": "#fbbf24",
-                "platinum": "#22d3ee",
-                "legendary": "#a855f7"
-            }
-            tier_color = tier_colors.get(achievement.tier, "#fbbf24")
-            
-            opacity = "1" if is_unlocked else "0.5"
-            
-            st.markdown(f"""
-            <div style='background: rgba(30, 30, 50, 0.8); border: 2px solid {tier_color}; 
-                 border-radius: 12px; padding: 1rem; margin: 0.5rem 0; opacity: {opacity};
-                 text-align: center;'>
-                <div style='font-size: 2rem; margin-bottom: 0.5rem;'>
-                    {"🏆" if is_unlocked else "🔒"}
-                </div>
-                <div style='font-weight: bold; color: {tier_color};'>{achievement.title}</div>
-                <div style='font-size: 0.8rem; color: #9ca3af; margin: 0.5rem 0;'>
-                    {achievement.description}
-                </div>
-                <div style='font-size: 0.8rem;'>
-                    <span style='color: #fbbf24;'>+{achievement.xp_reward} XP</span>
-                    {f" • +{achievement.gold_reward} 💰" if achievement.gold_reward > 0 else ""}
-                </div>
-                <div style='font-size: 0.7rem; color: {tier_color}; margin-top: 0.5rem;'>
-                    {achievement.tier.upper()}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    filtered = ACHIEVEMENT_CATALOG.filter(category_filter, tier_filter)
+    
+    # Render one page at a time; "Show more" extends the page
+    filter_key = (category_filter, tier_filter)
+    if st.session_state.get("rewards_filter") != filter_key:
+        st.session_state.rewards_filter = filter_key
+        st.session_state.rewards_visible = ACHIEVEMENTS_PAGE_SIZE
+    visible = filtered[:st.session_state.rewards_visible]
+    
+    st.markdown(render_achievement_grid(visible, unlocked_keys, progress), unsafe_allow_html=True)
+    
+    if len(filtered) > len(visible):
+        st.caption(f"Showing {len(visible)} of {len(filtered)}")
+        if st.button("Show more", key="rewards_more"):
+            st.session_state.rewards_visible += ACHIEVEMENTS_PAGE_SIZE
+            st.rerun()
 
 
 def page_shop():
     """Shop page - Buy items with gold"""
     db = get_db()
-    stats = get_user_stats(db)
+    stats = get_user_stats(db, get_user_id())
     
     st.markdown("## 🛒 Hunter's Shop")
     st.markdown("Enhance your journey with powerful items")
@@ -1023,7 +1058,9 @@ def page_shop():
     )
     
     # Get items for category
-    items = [item for item in ALL_SHOP_ITEMS if item.category == category]
+    items = SHOP_CATALOG.query(category=category)
+    inventory = get_inventory(db, get_user_id())
+    level, _, _ = calculate_level_from_xp(stats.total_xp)
     
     # Display items
     cols = st.columns(3)
@@ -1031,8 +1068,6 @@ def page_shop():
         with cols[i % 3]:
             rarity_color = RARITY_COLORS.get(item.rarity, {}).get("bg", "#6b7280")
             can_afford = stats.current_gold >= item.price.gold
-            
-            level, _, _ = calculate_level_from_xp(stats.total_xp)
             meets_level = item.level_required is None or level >= item.level_required
             
             opacity = "1" if can_afford and meets_level else "0.6"
@@ -1056,17 +1091,58 @@ def page_shop():
             </div>
             """, unsafe_allow_html=True)
             
-            if can_afford and meets_level:
+            owned = inventory.get(item.id, 0)
+            room = stack_limit(item) - owned
+            if owned:
+                st.caption(f"Owned: {owned}")
+                if item.category == "consumable" and item.effect is not None and item.effect.type in USABLE_EFFECTS:
+                    render_use_item(db, item)
+            if can_afford and meets_level and room > 0:
+                quantity = 1
+                if item.stackable and room > 1:
+                    quantity = st.number_input(
+                        "Quantity", min_value=1, max_value=room, value=1, key=f"qty_{item.id}"
+                    )
                 if st.button(f"Buy {item.name}", key=f"buy_{item.id}"):
-                    stats.current_gold -= item.price.gold
-                    
-                    # Add to inventory
-                    inv_item = InventoryItem(item_id=item.id, quantity=1)
-                    db.add(inv_item)
-                    db.commit()
-                    
-                    st.success(f"Purchased {item.name}!")
-                    st.rerun()
+                    result = purchase_item(db, item, quantity, user_id=get_user_id())
+                    if not result.ok:
+                        st.error(result.reason)
+                    else:
+                        announce_achievements(result.unlocked)
+                        st.success(f"Purchased {item.name}!")
+                        st.rerun()
+
+
+# Consumables the shop can use; instant_complete_step has no step picker yet
+USABLE_EFFECTS = (
+    "xp_multiplier", "gold_multiplier", "all_multiplier", "streak_protection",
+    "stat_boost_temp", "stat_boost_perm", "instant_complete_habit",
+)
+
+
+def render_use_item(db, item):
+    """Use button for an owned consumable, with a stat or habit picker where it needs one"""
+    options = {}
+    if item.effect.type == "stat_boost_perm" and item.effect.choosable:
+        options["stat"] = st.selectbox(
+            "Stat", list(STAT_METADATA), format_func=lambda s: STAT_METADATA[s].label, key=f"stat_{item.id}"
+        )
+    elif item.effect.type == "instant_complete_habit":
+        open_habits = [s.habit for s in get_habit_summaries(db, user_id=get_user_id()) if not s.completed_today]
+        if not open_habits:
+            st.caption("Every habit is done today")
+            return
+        options["habit"] = st.selectbox(
+            "Habit", open_habits, format_func=lambda h: h.name, key=f"habit_{item.id}"
+        )
+    if st.button(f"Use {item.name}", key=f"use_{item.id}"):
+        result = use_item(db, item, user_id=get_user_id(), **options)
+        if not result.ok:
+            st.error(result.reason)
+        else:
+            announce_achievements(result.unlocked)
+            st.success(f"Used {item.name}!")
+            st.rerun()
 
 
 def page_notes():
@@ -1080,39 +1156,66 @@ def page_notes():
     
     with tab1:
         # Filter
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3 = st.columns([3, 1, 1])
         with col1:
             search = st.text_input("🔍 Search notes", placeholder="Search by title or content...")
         with col2:
             category_filter = st.selectbox("Category", [
                 "all", "personal", "work", "health", "goals", "ideas", "learning"
             ])
+        with col3:
+            tag_filter = st.multiselect("Tags", get_user_tags(db, get_user_id()))
         
-        # Get notes
-        query = db.query(Note)
-        if category_filter != "all":
-            query = query.filter(Note.category == category_filter)
-        
-        notes = query.order_by(Note.pinned.desc(), Note.created_at.desc()).all()
-        
-        if search:
-            notes = [n for n in notes if search.lower() in n.title.lower() or search.lower() in (n.content or "").lower()]
+        # Search server-side, one page at a time
+        filter_key = (search, category_filter, tuple(tag_filter))
+        if st.session_state.get("notes_filter") != filter_key:
+            st.session_state.notes_filter = filter_key
+            st.session_state.notes_visible = NOTES_PAGE_SIZE
+        page = search_notes(
+            db, search, user_id=get_user_id(),
+            category=None if category_filter == "all" else category_filter,
+            tags=tag_filter, limit=st.session_state.notes_visible
+        )
+        notes = page.hits
         
         if notes:
-            # Pinned notes
-            pinned = [n for n in notes if n.pinned]
-            if pinned:
-                st.markdown("### 📌 Pinned")
-                for note in pinned:
+            if search:
+                # Ranked by relevance
+                for note in notes:
                     render_note_card(note, db)
-            
-            # Other notes
-            other = [n for n in notes if not n.pinned]
-            if other:
+            else:
+                # Pinned notes
+                pinned = [n for n in notes if n.pinned]
                 if pinned:
-                    st.markdown("### Other Notes")
-                for note in other:
-                    render_note_card(note, db)
+                    st.markdown("### 📌 Pinned")
+                    for note in pinned:
+                        render_note_card(note, db)
+                
+                # Other notes
+                other = [n for n in notes if not n.pinned]
+                if other:
+                    if pinned:
+                        st.markdown("### Other Notes")
+                    for note in other:
+                        render_note_card(note, db)
+            
+            if page.has_more and st.button("Show more", key="notes_more"):
+                st.session_state.notes_visible += NOTES_PAGE_SIZE
+                st.rerun()
+
+            with st.expander("🔎 Analyze these notes"):
+                action = st.selectbox("Analysis", ["themes", "connections", "insights", "summarize"],
+                                      key="notes_analysis")
+                if st.button("Analyze", key="notes_analyze"):
+                    rows = db.query(Note.id, Note.title, Note.content).filter(
+                        Note.id.in_([n.id for n in notes])
+                    ).all()
+                    analyzed = [{"id": row.id, "title": row.title, "content": row.content or ""} for row in rows]
+                    st.info(analyze_notes(analyzed, action, get_knowledge_index(db, get_user_id())))
+                    if action == "summarize":
+                        emit_event(db, EVENT_NOTE_SUMMARIZED)
+        elif search or tag_filter:
+            st.info("No notes match your search.")
         else:
             st.info("No notes yet. Create your first note!")
     
@@ -1143,6 +1246,7 @@ def page_notes():
                 tags = [t.strip() for t in tags_input.split(",") if t.strip()] if tags_input else []
                 
                 new_note = Note(
+                    user_id=get_user_id(),
                     title=title,
                     content=content,
                     category=category,
@@ -1151,12 +1255,15 @@ def page_notes():
                     tags=tags
                 )
                 db.add(new_note)
-                db.commit()
+                db.flush()
+                KNOWLEDGE_INDEX.index_note(db, new_note)
+                emit_event(db, EVENT_NOTE_CREATED, note=new_note)
+                VECTOR_INDEX.index_note(new_note)
                 st.success("📝 Note saved!")
                 st.rerun()
 
 
-def render_note_card(note: Note, db):
+def render_note_card(note: NoteHit, db):
     """Render a note card"""
     color_classes = {
         "default": "rgba(30, 30, 50, 0.8)",
@@ -1176,7 +1283,7 @@ def render_note_card(note: Note, db):
                       font-size: 0.8rem;'>{note.category}</span>
             </div>
             <p style='color: #9ca3af; margin: 0.5rem 0; font-size: 0.9rem;'>
-                {(note.content or "")[:150]}{"..." if len(note.content or "") > 150 else ""}
+                {note.preview[:150]}{"..." if note.content_length > 150 else ""}
             </p>
             <div style='font-size: 0.8rem; color: #6b7280;'>
                 {note.created_at.strftime("%Y-%m-%d %H:%M") if note.created_at else ""}
@@ -1187,8 +1294,7 @@ def render_note_card(note: Note, db):
         col1, col2, col3 = st.columns([1, 1, 1])
         with col2:
             if st.button("🗑️ Delete", key=f"del_note_{note.id}"):
-                db.delete(note)
-                db.commit()
+                delete_note(db, note.id, get_user_id())
                 st.rerun()
 
 
@@ -1234,13 +1340,14 @@ def page_ai_coach():
                         with col2:
                             if st.button("Add Habit", key=f"add_habit_{i}"):
                                 new_habit = Habit(
+                                    user_id=get_user_id(),
                                     name=habit['title'],
                                     description=habit['description'],
                                     category="learning",
                                     difficulty=habit['difficulty']
                                 )
                                 db.add(new_habit)
-                                db.commit()
+                                emit_event(db, EVENT_HABIT_CREATED, habit=new_habit, suggested=True)
                                 st.success(f"Added: {habit['title']}")
                         st.markdown("---")
             else:
@@ -1256,6 +1363,7 @@ def page_ai_coach():
                 
                 if st.button("Add This Goal", use_container_width=True):
                     new_goal = Goal(
+                        user_id=get_user_id(),
                         title=goal['title'],
                         description=goal['description'],
                         difficulty=2,
@@ -1263,8 +1371,17 @@ def page_ai_coach():
                         steps=goal['steps']
                     )
                     db.add(new_goal)
-                    db.commit()
+                    emit_event(db, EVENT_GOAL_CREATED, goal=new_goal)
                     st.success("Goal added to your quest log!")
+            
+            passages = retrieve(db, context, get_user_id(), k=3)
+            if passages:
+                st.markdown("### 📚 From Your Library")
+                for passage in passages:
+                    where = f"p. {passage.page}" if passage.source == SOURCE_PASSAGE else "note"
+                    st.markdown(f"**{passage.title}** · {where}")
+                    st.caption(passage.text[:400] + ("..." if len(passage.text) > 400 else ""))
+            emit_event(db, EVENT_COACH_CONSULTED, library=bool(passages))
 
 
 def generate_habit_suggestions(context: str) -> List[Dict]:
@@ -1285,7 +1402,7 @@ def page_philosophy():
     st.markdown("Your personal collection of wisdom and guiding principles")
     
     # Stats
-    docs = db.query(PhilosophyDocument).all()
+    docs = db.query(PhilosophyDocument).filter(PhilosophyDocument.user_id == get_user_id()).all()
     active_count = len([d for d in docs if d.use_for_ai])
     processed_count = len([d for d in docs if d.is_processed])
     
@@ -1314,23 +1431,36 @@ def page_philosophy():
             ])
             
             if st.button("Upload Document"):
-                # In production, this would handle file storage and processing
+                try:
+                    file_type = file_type_for(uploaded_file.name)
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
                 new_doc = PhilosophyDocument(
+                    user_id=get_user_id(),
                     title=doc_title,
                     file_name=uploaded_file.name,
-                    file_type=uploaded_file.type.split("/")[-1] if uploaded_file.type else "txt",
+                    file_type=file_type,
                     file_size=uploaded_file.size,
+                    object_path=store_upload(uploaded_file, uploaded_file.name, get_user_id()),
                     category=doc_category,
                     is_processed=False,
                     use_for_ai=True
                 )
                 db.add(new_doc)
-                db.commit()
+                db.flush()
+                queue_document(db, new_doc)
+                emit_event(db, EVENT_DOCUMENT_UPLOADED, document=new_doc)
+                enqueue_document(new_doc.id)
                 st.success("Document uploaded! It will be processed shortly.")
                 st.rerun()
     
     # Document list
     if docs:
+        ingests = {
+            ingest.document_id: ingest
+            for ingest in db.query(DocumentIngest).filter(DocumentIngest.user_id == get_user_id())
+        }
         for doc in docs:
             with st.container():
                 col1, col2, col3 = st.columns([4, 1, 1])
@@ -1339,6 +1469,15 @@ def page_philosophy():
                     icon = "📄" if doc.file_type == "pdf" else "📝"
                     st.markdown(f"{icon} **{doc.title}**")
                     st.caption(f"{doc.category.title()} • {doc.file_size // 1024}KB • {doc.file_type.upper()}")
+                    ingest = ingests.get(doc.id)
+                    if not doc.is_processed and ingest is not None:
+                        if ingest.status == "failed":
+                            st.caption(f"⚠️ Processing failed: {ingest.error}")
+                        elif ingest.page_count:
+                            st.progress(min(ingest.pages_done / ingest.page_count, 1.0),
+                                        text=f"Processing {ingest.pages_done}/{ingest.page_count} pages")
+                        else:
+                            st.caption("⏳ Waiting to be processed")
                     
                     if doc.key_themes:
                         themes = doc.key_themes if isinstance(doc.key_themes, list) else []
@@ -1353,8 +1492,7 @@ def page_philosophy():
                 
                 with col3:
                     if st.button("🗑️", key=f"del_doc_{doc.id}"):
-                        db.delete(doc)
-                        db.commit()
+                        delete_document(db, doc)
                         st.rerun()
                 
                 st.markdown("---")
@@ -1365,8 +1503,8 @@ def page_philosophy():
 def page_settings():
     """Settings page - User preferences"""
     db = get_db()
-    profile = get_user_profile(db)
-    stats = get_user_stats(db)
+    profile = get_user_profile(db, get_user_id())
+    stats = get_user_stats(db, get_user_id())
     
     st.markdown("## ⚙️ Settings")
     st.markdown("Customize your experience")
@@ -1422,7 +1560,7 @@ def page_settings():
             profile.weekly_report_enabled = weekly_report
             profile.timezone = timezone
             profile.philosophy_tradition = tradition
-            db.commit()
+            emit_event(db, EVENT_PROFILE_UPDATED)
             st.success("Settings saved!")
     
     # Reset Stats Section
@@ -1466,7 +1604,7 @@ def page_settings():
 def page_onboarding():
     """Onboarding page - New user setup"""
     db = get_db()
-    profile = get_user_profile(db)
+    profile = get_user_profile(db, get_user_id())
     
     if profile.onboarding_completed:
         st.session_state.current_page = "Dashboard"
@@ -1515,7 +1653,7 @@ def page_onboarding():
             profile.philosophy_tradition = tradition
             profile.focus_areas = focus_areas
             profile.onboarding_completed = True
-            db.commit()
+            emit_event(db, EVENT_PROFILE_UPDATED)
             st.success("Welcome aboard! Let's begin your journey!")
             st.session_state.current_page = "Dashboard"
             st.rerun()
@@ -1525,11 +1663,41 @@ def page_onboarding():
 
 def main():
     """Main application entry point"""
+    st.set_page_config(
+        page_title="Goal Quest",
+        page_icon="⚔️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    init_db()
+    start_effect_sweeper()
+    start_document_ingestor()
     load_custom_css()
     init_session_state()
     
+    record_page_view(st.session_state.current_page)
+    with request_session(read_only=st.session_state.current_page in READ_ONLY_PAGES):
+        render_app()
+
+
+def record_page_view(page: str):
+    """Raise EVENT_PAGE_VIEWED the first time this browser session opens a page"""
+    visited = st.session_state.setdefault("visited_pages", set())
+    if page in visited:
+        return
+    visited.add(page)
+    # Its own unit of work: the page's session may be read-only
+    with session_scope() as db:
+        unlocked = progression.emit_event(
+            db, EVENT_PAGE_VIEWED, user_id=get_user_id(), page=page, pages=frozenset(visited)
+        )
+    announce_achievements(unlocked)
+
+
+def render_app():
+    """Sidebar navigation and the current page"""
     db = get_db()
-    profile = get_user_profile(db)
+    profile = get_user_profile(db, get_user_id())
     
     # Check if onboarding needed
     if not profile.onboarding_completed:
@@ -1569,7 +1737,7 @@ def main():
         st.markdown("---")
         
         # Quick stats in sidebar
-        stats = get_user_stats(db)
+        stats = get_user_stats(db, get_user_id())
         level, _, _ = calculate_level_from_xp(stats.total_xp)
         rank = get_rank_for_level(level)
         
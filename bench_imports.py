@@ -0,0 +1,83 @@
+"""
+Goal Quest Import Benchmark - Cold-start cost of the app's modules
+Imports each module in a fresh interpreter several times and reports the
+median wall time, and whether importing alone touched the database (created
+the SQLite file). Pass --compare to run the same measurement against another
+checkout, e.g. one made with `git worktree add /tmp/goal-quest-old <rev>`.
+
+Usage:
+    python bench_imports.py [--runs 5] [--compare PATH] [module ...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+
+DEFAULT_MODULES = ["database", "progression", "achievement_engine", "analytics", "ai_integration", "app"]
+
+_PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+
+def measure(module: str, source_dir: str, runs: int) -> Dict[str, Optional[float]]:
+    """Median import time (s) of a module from source_dir and whether a DB file appeared"""
+    timings: List[float] = []
+    touched_db = False
+    error = None
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", PYTHONDONTWRITEBYTECODE="1")
+            proc = subprocess.run(
+                [sys.executable, "-c", _PROBE.format(module=module)],
+                cwd=source_dir, env=env, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                error = (proc.stderr.strip().splitlines() or ["import failed"])[-1]
+                break
+            timings.append(float(proc.stdout.strip().splitlines()[-1]))
+            touched_db = touched_db or os.path.exists(db_path)
+    return {
+        "median": statistics.median(timings) if timings else None,
+        "touched_db": touched_db,
+        "error": error,
+    }
+
+
+def _format(result: Dict[str, Optional[float]]) -> str:
+    if result["error"]:
+        return f"{'n/a':>10}  ({result['error']})"
+    db_note = "  writes DB on import" if result["touched_db"] else ""
+    return f"{result['median'] * 1000:>8.1f}ms{db_note}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of Goal Quest modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare", metavar="PATH", help="Another checkout to measure side by side")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    header = f"{'module':<20} {'this tree':>10}"
+    if args.compare:
+        header += f"   {'compare':>10}"
+    print(header)
+    for module in args.modules:
+        line = f"{module:<20} {_format(measure(module, here, args.runs))}"
+        if args.compare:
+            line += f"   {_format(measure(module, args.compare, args.runs))}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,16 @@ Exact replication of the Replit schema.ts
 """
 
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, date
-from typing import Optional, List, Dict, Any
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, Float, DateTime, Date, JSON, ForeignKey, Enum as SQLEnum
+from typing import Callable, Optional, List, Dict, Any, Iterator, Tuple
+from sqlalchemy import create_engine, event, exc, Column, Integer, String, Text, Boolean, Float, DateTime, Date, JSON, ForeignKey, Index, inspect, text, Enum as SQLEnum
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
 import enum
 
 # Database URL - supports PostgreSQL for production, SQLite for local development
@@ -18,8 +23,174 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./goal_quest.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
+# User that owns rows created without an explicit user_id (and all pre-multi-user data)
+DEFAULT_USER_ID = 1
+
+
+
+# ============ ENGINE ============
+# Pool and driver settings come from the environment:
+#   DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (s), DB_POOL_RECYCLE (s),
+#   DB_STATEMENT_TIMEOUT_MS (0 = none), DB_SQLITE_BUSY_TIMEOUT (s), DB_SQLITE_MMAP_SIZE (bytes)
+# On Postgres the statement timeout is the server's statement_timeout; on
+# SQLite a progress handler interrupts statements that run longer. The SQLite
+# busy timeout is separate: how long to wait for another connection's lock.
+
+# SQLite virtual machine instructions between statement timeout checks
+SQLITE_PROGRESS_STEPS = 1000
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+class PoolMetrics:
+    """Checkout counters and wait times for one pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+    
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def make_engine(url: Optional[str] = None) -> Engine:
+    """Create an engine with pooling, timeouts and per-driver tuning from the environment"""
+    url = make_url(url or DATABASE_URL)
+    statement_timeout = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+    kwargs: Dict[str, Any] = {"pool_pre_ping": True}
+    connect_args: Dict[str, Any] = {}
+    
+    in_memory = url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+    if not in_memory:
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=_env_int("DB_POOL_SIZE", 5),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+            pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+            pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+        )
+    
+    if url.get_backend_name() == "sqlite":
+        # Streamlit reruns scripts on worker threads
+        connect_args["check_same_thread"] = False
+        connect_args["timeout"] = _env_int("DB_SQLITE_BUSY_TIMEOUT", 5)
+    elif url.get_backend_name() == "postgresql" and statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    
+    new_engine = create_engine(url, connect_args=connect_args, **kwargs)
+    if url.get_backend_name() == "sqlite":
+        _configure_sqlite(
+            new_engine, mmap_size=_env_int("DB_SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+            statement_timeout_ms=statement_timeout
+        )
+    return new_engine
+
+
+def _configure_sqlite(sqlite_engine: Engine, mmap_size: int, statement_timeout_ms: int = 0):
+    """
+    WAL journal, relaxed fsync and memory-mapped reads on every new connection.
+    pysqlite does not BEGIN before a SAVEPOINT, so releasing a savepoint
+    (begin_nested) would commit everything before it; BEGIN is emitted first.
+    Other transactions keep the driver's lazy BEGIN, so plain reads do not pin
+    a WAL snapshot that would make a later write in the session fail.
+    With a statement timeout, a statement still executing after it is
+    interrupted (OperationalError: interrupted); fetching its rows is not timed.
+    """
+    limit = statement_timeout_ms / 1000
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.close()
+        if limit:
+            clock = connection_record.info
+
+            def over_limit() -> int:
+                started = clock.get("statement_started")
+                return int(started is not None and time.perf_counter() - started > limit)
+            dbapi_connection.set_progress_handler(over_limit, SQLITE_PROGRESS_STEPS)
+
+    if limit:
+        @event.listens_for(sqlite_engine, "before_cursor_execute")
+        def _start_statement_clock(connection, cursor, statement, parameters, context, executemany):
+            connection.connection.info["statement_started"] = time.perf_counter()
+
+        @event.listens_for(sqlite_engine, "after_cursor_execute")
+        def _stop_statement_clock(connection, cursor, statement, parameters, context, executemany):
+            connection.connection.info.pop("statement_started", None)
+
+        @event.listens_for(sqlite_engine, "handle_error")
+        def _stop_clock_on_error(context):
+            connection = context.connection
+            if connection is not None and not connection.invalidated:
+                connection.connection.info.pop("statement_started", None)
+
+    @event.listens_for(sqlite_engine, "savepoint")
+    def _begin_before_savepoint(connection, name):
+        dbapi_connection = connection.connection.dbapi_connection
+        if not dbapi_connection.in_transaction:
+            dbapi_connection.execute("BEGIN")
+
+
+def get_pool_metrics(bind: Optional[Engine] = None) -> Dict[str, Any]:
+    """Current pool usage plus checkout counters and wait times"""
+    pool = (bind if bind is not None else engine).pool
+    result: Dict[str, Any] = {"pool": pool.status()}
+    if isinstance(pool, QueuePool):
+        result.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        result.update(
+            checkouts=metrics.checkouts,
+            timeouts=metrics.timeouts,
+            wait_time_total=metrics.wait_time_total,
+            wait_time_max=metrics.wait_time_max,
+            wait_time_avg=metrics.wait_time_total / metrics.checkouts if metrics.checkouts else 0.0,
+        )
+    return result
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read path: loaded objects stay usable after the session closes
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
@@ -115,12 +286,32 @@ class GoalCategory(str, enum.Enum):
 
 
 # ============ MODELS ============
+# Every user-owned table carries user_id and its indexes lead on it, so
+# per-user queries stay index-bounded however many users share the database.
+
+def user_id_column():
+    """Owner column shared by all user-owned tables"""
+    return Column(Integer, ForeignKey("users.id"), nullable=False, default=DEFAULT_USER_ID)
+
+
+class User(Base):
+    """Users table - one row per account"""
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    username = Column(String(100), unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 
 class Habit(Base):
     """Habit tracking table - stores all user habits with scheduling"""
     __tablename__ = "habits"
+    __table_args__ = (
+        Index("ix_habits_user_active", "user_id", "active"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     name = Column(String(255), nullable=False)
     description = Column(Text, default="")
     category = Column(String(50), default="personal")
@@ -139,13 +330,18 @@ class Habit(Base):
     
     # Relationships
     completions = relationship("Completion", back_populates="habit", cascade="all, delete-orphan")
+    streak = relationship("HabitStreak", back_populates="habit", uselist=False, cascade="all, delete-orphan")
 
 
 class Goal(Base):
     """Goal tracking table - stores user goals with progress and steps"""
     __tablename__ = "goals"
+    __table_args__ = (
+        Index("ix_goals_user_completed", "user_id", "completed"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     title = Column(String(255), nullable=False)
     description = Column(Text, default="")
     category = Column(String(50), default="personal")
@@ -165,21 +361,50 @@ class Goal(Base):
 class Completion(Base):
     """Completion tracking - records habit completions by date"""
     __tablename__ = "completions"
+    __table_args__ = (
+        # One completion per habit per day; serves every (habit_id, date) lookup
+        Index("ix_completions_habit_date", "habit_id", "date", unique=True),
+        # Date-range scans across a user's habits (daily counts, trends)
+        Index("ix_completions_user_date", "user_id", "date"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
-    date = Column(String(10), nullable=False)  # YYYY-MM-DD format
+    date = Column(Date, nullable=False)
     completed = Column(Boolean, default=True)
     
     # Relationships
     habit = relationship("Habit", back_populates="completions")
 
 
+class HabitStreak(Base):
+    """Habit streaks - persisted per-habit streak state, updated on completion"""
+    __tablename__ = "habit_streaks"
+    __table_args__ = (
+        Index("ix_habit_streaks_user_last", "user_id", "last_completed_date"),
+    )
+    
+    habit_id = Column(Integer, ForeignKey("habits.id"), primary_key=True)
+    user_id = user_id_column()
+    current_streak = Column(Integer, default=0)  # Run ending at last_completed_date
+    longest_streak = Column(Integer, default=0)
+    last_completed_date = Column(Date, default=None)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    habit = relationship("Habit", back_populates="streak")
+
+
 class UserStats(Base):
     """User statistics - XP, level, gold, and 6 stats"""
     __tablename__ = "user_stats"
+    __table_args__ = (
+        Index("ix_user_stats_user", "user_id", unique=True),
+    )
     
-    id = Column(Integer, primary_key=True, default=1)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     level = Column(Integer, default=1)
     current_xp = Column(Integer, default=0)
     total_xp = Column(Integer, default=0)
@@ -198,11 +423,40 @@ class UserStats(Base):
     lifetime_gold = Column(Integer, default=0)
 
 
+class DailyRollup(Base):
+    """Daily rollups - per-user, per-day completions, XP, gold and stat gains"""
+    __tablename__ = "daily_rollups"
+    __table_args__ = (
+        Index("ix_daily_rollups_user_date", "user_id", "date", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
+    date = Column(Date, nullable=False)
+    completions = Column(Integer, default=0)
+    goals_completed = Column(Integer, default=0)
+    xp_earned = Column(Integer, default=0)
+    achievement_xp = Column(Integer, default=0)  # Achievement rewards, included in xp_earned
+    gold_earned = Column(Integer, default=0)
+    
+    # Stat points gained that day
+    strength_gain = Column(Integer, default=0)
+    intelligence_gain = Column(Integer, default=0)
+    vitality_gain = Column(Integer, default=0)
+    agility_gain = Column(Integer, default=0)
+    sense_gain = Column(Integer, default=0)
+    willpower_gain = Column(Integer, default=0)
+
+
 class UserProfile(Base):
     """User profile - personalization settings"""
     __tablename__ = "user_profile"
+    __table_args__ = (
+        Index("ix_user_profile_user", "user_id", unique=True),
+    )
     
-    id = Column(Integer, primary_key=True, default=1)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     display_name = Column(String(100), default="Hunter")
     gender = Column(String(20), default="neutral")  # male/female/neutral
     avatar_style = Column(String(20), default="warrior")  # warrior/mage/rogue/sage
@@ -221,8 +475,12 @@ class UserProfile(Base):
 class Note(Base):
     """Notes table - user notes with categories and AI summaries"""
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("ix_notes_user_updated", "user_id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     title = Column(String(255), nullable=False)
     content = Column(Text, default="")
     category = Column(String(50), default="personal")
@@ -237,9 +495,13 @@ class Note(Base):
 class Achievement(Base):
     """Achievements table - tracks unlocked achievements"""
     __tablename__ = "achievements"
+    __table_args__ = (
+        Index("ix_achievements_user_key", "user_id", "key", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    key = Column(String(100), unique=True, nullable=False)  # Unique achievement key
+    user_id = user_id_column()
+    key = Column(String(100), nullable=False)  # Achievement key, unique per user
     title = Column(String(255), nullable=False)
     description = Column(Text, default="")
     icon = Column(String(50), default="Star")
@@ -252,12 +514,31 @@ class Achievement(Base):
     unlocked_at = Column(DateTime, default=None)
 
 
+class AchievementProgress(Base):
+    """Achievement progress - running counter per achievement for progress bars"""
+    __tablename__ = "achievement_progress"
+    __table_args__ = (
+        Index("ix_achievement_progress_user_key", "user_id", "key", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
+    key = Column(String(100), nullable=False)  # Achievement key
+    current_value = Column(Integer, default=0)
+    target = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=None)
+
+
 class Motivation(Base):
     """Daily motivations - wisdom quotes by date"""
     __tablename__ = "motivations"
+    __table_args__ = (
+        Index("ix_motivations_user_date", "user_id", "date", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(String(10), unique=True, nullable=False)  # YYYY-MM-DD
+    user_id = user_id_column()
+    date = Column(String(10), nullable=False)  # YYYY-MM-DD, unique per user
     quote = Column(Text, nullable=False)
     philosophy = Column(Text, default="")  # Explanation
     tradition = Column(String(50), default="esoteric")
@@ -268,18 +549,27 @@ class Motivation(Base):
 class InventoryItem(Base):
     """Inventory table - owned shop items"""
     __tablename__ = "inventory"
+    __table_args__ = (
+        Index("ix_inventory_user_item", "user_id", "item_id", unique=True),  # One row per item
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     item_id = Column(String(50), nullable=False)  # Shop item ID
-    quantity = Column(Integer, default=1)
+    quantity = Column(Integer, default=1)  # Stack size, within the item's max_stack
     purchased_at = Column(DateTime, default=datetime.utcnow)
 
 
 class ActiveEffect(Base):
     """Active effects - temporary buffs from consumables"""
     __tablename__ = "active_effects"
+    __table_args__ = (
+        Index("ix_active_effects_user_expires", "user_id", "expires_at"),
+        Index("ix_active_effects_expires", "expires_at"),  # Sweeper
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     effect_type = Column(String(50), nullable=False)  # xp_multiplier, gold_multiplier, etc.
     value = Column(Float, default=1.0)  # Multiplier value
     expires_at = Column(DateTime, nullable=False)
@@ -290,8 +580,12 @@ class ActiveEffect(Base):
 class PhilosophyDocument(Base):
     """Philosophy documents - uploaded wisdom documents"""
     __tablename__ = "philosophy_documents"
+    __table_args__ = (
+        Index("ix_philosophy_documents_user_ai", "user_id", "use_for_ai"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     title = Column(String(255), nullable=False)
     file_name = Column(String(255), nullable=False)
     file_type = Column(String(20), nullable=False)  # pdf, jpg, png, etc.
@@ -306,11 +600,61 @@ class PhilosophyDocument(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class DocumentPassage(Base):
+    """A passage of a processed philosophy document - the full text, in order"""
+    __tablename__ = "document_passages"
+    __table_args__ = (
+        Index("ix_document_passages_document_position", "document_id", "position", unique=True),
+        Index("ix_document_passages_user", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
+    document_id = Column(Integer, ForeignKey("philosophy_documents.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # 0-based order within the document
+    page = Column(Integer, default=1)  # Page the passage starts on
+    text = Column(Text, nullable=False)
+
+
+class DocumentIngest(Base):
+    """Processing progress of an uploaded philosophy document"""
+    __tablename__ = "document_ingests"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
+    document_id = Column(Integer, ForeignKey("philosophy_documents.id"), nullable=False, unique=True)
+    status = Column(String(20), default="queued")  # queued, processing, done, failed
+    pages_done = Column(Integer, default=0)
+    page_count = Column(Integer, default=0)  # Estimated for text files
+    passage_count = Column(Integer, default=0)
+    error = Column(Text, default="")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TermVector(Base):
+    """Term counts of an indexed note or document - the persisted form of knowledge_index"""
+    __tablename__ = "term_vectors"
+    __table_args__ = (
+        Index("ix_term_vectors_user_source_doc", "user_id", "source", "doc_id", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
+    source = Column(String(20), nullable=False)  # note, document
+    doc_id = Column(Integer, nullable=False)
+    terms = Column(JSON, default=dict)  # term -> count
+    indexed_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ChatSession(Base):
     """Chat sessions - AI coach conversations"""
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     title = Column(String(255), default="New Chat")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -322,8 +666,12 @@ class ChatSession(Base):
 class ChatMessage(Base):
     """Chat messages - individual messages in AI coach conversations"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_user_session", "user_id", "session_id"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = user_id_column()
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
     role = Column(String(20), nullable=False)  # user/assistant
     content = Column(Text, nullable=False)
@@ -337,6 +685,7 @@ class ChatMessage(Base):
 
 def get_db():
     """Get database session"""
+    init_db()
     db = SessionLocal()
     try:
         yield db
@@ -344,47 +693,414 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Initialize database and create all tables"""
+@contextmanager
+def session_scope(commit_on: Tuple[type, ...] = ()) -> Iterator:
+    """
+    Unit of work: one session, committed once when the block exits and closed
+    so its connection returns to the pool. Exceptions roll back, except the
+    control-flow types in commit_on (e.g. Streamlit's rerun), which commit first.
+    """
+    init_db()
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except commit_on:
+        db.commit()
+        raise
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@contextmanager
+def read_session() -> Iterator:
+    """Session for read-only work: never commits, releases its connection on exit"""
+    init_db()
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        # close() ends the transaction and detaches objects without expiring them
+        db.close()
+
+
+# ============ TRANSACTION HOOKS ============
+# Per-process caches must only learn about rows once they are committed. Each
+# session gets one pair of listeners that drains a list of pending actions
+# kept in session.info, however many changes register actions.
+
+_PENDING_ACTIONS = "pending_after_commit"
+
+
+def after_commit(db, action: Callable[[], None], on_rollback: Optional[Callable[[], None]] = None):
+    """
+    Run `action` once the session's current transaction commits, or
+    `on_rollback` if it rolls back or the session closes first. Savepoint
+    commits and rollbacks are ignored.
+    """
+    pending = db.info.get(_PENDING_ACTIONS)
+    if pending is None:
+        pending = db.info[_PENDING_ACTIONS] = []
+        event.listen(db, "after_commit", _run_after_commit)
+        event.listen(db, "after_transaction_end", _run_after_rollback)
+    pending.append((action, on_rollback))
+
+
+def _take_pending(session) -> List[Tuple[Callable[[], None], Optional[Callable[[], None]]]]:
+    pending = session.info.get(_PENDING_ACTIONS) or []
+    taken = list(pending)
+    pending.clear()
+    return taken
+
+
+def _run_after_commit(session):
+    if session.in_nested_transaction():
+        return  # A savepoint was released, not the transaction
+    for action, _ in _take_pending(session):
+        action()
+
+
+def _run_after_rollback(session, transaction):
+    # After a commit nothing is left; anything still pending was rolled back
+    if transaction.parent is not None:
+        return
+    for _, on_rollback in _take_pending(session):
+        if on_rollback is not None:
+            on_rollback()
+
+
+def insert_or_ignore(db, model, index_elements: List[str]):
+    """
+    INSERT that skips rows clashing with a unique index (ON CONFLICT DO
+    NOTHING on PostgreSQL and SQLite), so concurrent seeders cannot collide
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+        return insert(model)
+    return insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def init_db(force: bool = False):
+    """
+    Create tables, run migrations and seed the default user - once per process.
+    Nothing runs at import; session helpers call this lazily and later calls
+    return immediately unless force=True.
+    """
+    global _initialized
+    if _initialized and not force:
+        return
+    with _init_lock:
+        if _initialized and not force:
+            return
+        _create_schema()
+        _initialized = True
+
+
+def _create_schema():
     Base.metadata.create_all(bind=engine)
     
     # Initialize default records
     db = SessionLocal()
     try:
-        # Create default user stats if not exists
-        if not db.query(UserStats).first():
-            db.add(UserStats(id=1))
+        # Create the default user first - migrated rows reference it
+        if not db.query(User).filter(User.id == DEFAULT_USER_ID).first():
+            db.add(User(id=DEFAULT_USER_ID, username="hunter"))
             db.commit()
+            if engine.dialect.name == "postgresql":
+                # Explicit id: move the sequence past it
+                db.execute(text("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users))"))
+                db.commit()
         
-        # Create default user profile if not exists
-        if not db.query(UserProfile).first():
-            db.add(UserProfile(id=1))
-            db.commit()
+        migrate_completions_table(engine)
+        migrate_inventory_table(engine)
+        migrate_user_columns(engine)
+        migrate_note_search(engine)
+        migrate_rollup_columns(engine)
+        
+        get_user_stats(db, DEFAULT_USER_ID)
+        get_user_profile(db, DEFAULT_USER_ID)
     finally:
         db.close()
 
 
-def get_user_stats(db) -> UserStats:
-    """Get or create user stats"""
-    stats = db.query(UserStats).first()
+# ============ MIGRATIONS ============
+
+COMPLETION_MIGRATION_BATCH = 5000  # Rows rewritten per INSERT batch
+
+
+def migrate_inventory_table(bind=None) -> bool:
+    """
+    Collapse a legacy inventory (one row per purchase) into one row per
+    (user, item) with summed quantities, so the unique index can be created.
+    Returns True if rows were merged or the old index replaced.
+    """
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    if not inspector.has_table(InventoryItem.__tablename__):
+        return False
+    indexes = {index["name"]: index for index in inspector.get_indexes(InventoryItem.__tablename__)}
+    if indexes.get("ix_inventory_user_item", {}).get("unique"):
+        return False
+    
+    # Legacy single-user tables have no user_id yet
+    has_user = "user_id" in {col["name"] for col in inspector.get_columns(InventoryItem.__tablename__)}
+    key = "user_id, item_id" if has_user else "item_id"
+    match = " AND ".join(f"i.{col} = inventory.{col}" for col in key.split(", "))
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"UPDATE inventory SET quantity = (SELECT SUM(COALESCE(i.quantity, 1)) FROM inventory i WHERE {match}) "
+            f"WHERE id IN (SELECT MIN(id) FROM inventory GROUP BY {key})"
+        ))
+        conn.execute(text(f"DELETE FROM inventory WHERE id NOT IN (SELECT MIN(id) FROM inventory GROUP BY {key})"))
+        if "ix_inventory_user_item" in indexes:
+            conn.execute(text("DROP INDEX ix_inventory_user_item"))
+    # migrate_user_columns() creates the unique index once user_id exists
+    if has_user:
+        for index in InventoryItem.__table__.indexes:
+            index.create(bind, checkfirst=True)
+    return True
+
+
+def migrate_completions_table(bind=None) -> bool:
+    """
+    Upgrade a legacy completions table (String(10) dates, no indexes).
+    Rows are rewritten with real DATE values in bulk, duplicate (habit_id, date)
+    rows are collapsed onto the oldest one, and the indexes are created.
+    Returns True if the column was migrated.
+    """
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    if not inspector.has_table(Completion.__tablename__):
+        return False
+    
+    columns = {col["name"]: col for col in inspector.get_columns(Completion.__tablename__)}
+    migrated = False
+    if not isinstance(columns["date"]["type"], Date):
+        if bind.dialect.name == "postgresql":
+            _convert_completions_postgres(bind)
+        else:
+            _rebuild_completions_table(bind)
+        migrated = True
+    
+    # create_all() skips existing tables, so make sure the indexes exist
+    for index in Completion.__table__.indexes:
+        index.create(bind, checkfirst=True)
+    return migrated
+
+
+def _convert_completions_postgres(bind):
+    """Convert the date column in place with ALTER ... USING"""
+    with bind.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM completions a USING completions b "
+            "WHERE a.habit_id = b.habit_id AND a.date = b.date AND a.id > b.id"
+        ))
+        conn.execute(text(
+            "ALTER TABLE completions ALTER COLUMN date TYPE DATE USING substr(date, 1, 10)::date"
+        ))
+
+
+def _rebuild_completions_table(bind, batch_size: int = COMPLETION_MIGRATION_BATCH):
+    """Copy rows into a freshly created table (SQLite cannot alter column types)"""
+    table = Completion.__table__
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE completions RENAME TO completions_legacy"))
+        table.create(conn)
+        
+        rows = conn.execute(text(
+            "SELECT id, habit_id, date, completed FROM completions_legacy ORDER BY id"
+        )).fetchall()
+        seen = set()
+        batch = []
+        for row in rows:
+            try:
+                day = datetime.strptime(str(row.date)[:10], "%Y-%m-%d").date()
+            except ValueError:
+                continue  # Unparseable legacy value - nothing to migrate
+            if (row.habit_id, day) in seen:
+                continue
+            seen.add((row.habit_id, day))
+            batch.append({"id": row.id, "habit_id": row.habit_id, "date": day, "completed": row.completed})
+            if len(batch) >= batch_size:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+        
+        conn.execute(text("DROP TABLE completions_legacy"))
+
+
+def migrate_user_columns(bind=None) -> List[str]:
+    """
+    Add user_id to tables created before multi-user support. Existing rows are
+    assigned to DEFAULT_USER_ID, single-column unique keys that are now unique
+    per user are rebuilt, and the per-user indexes are created.
+    Returns the names of the tables that were altered.
+    """
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    altered = []
+    for table in Base.metadata.sorted_tables:
+        if "user_id" not in table.c or not inspector.has_table(table.name):
+            continue
+        columns = {col["name"] for col in inspector.get_columns(table.name)}
+        if "user_id" in columns:
+            continue
+        
+        # Unique single columns (achievements.key, motivations.date) become unique per user
+        legacy_unique = [
+            constraint["name"] for constraint in inspector.get_unique_constraints(table.name)
+            if len(constraint["column_names"]) == 1
+        ]
+        if legacy_unique and bind.dialect.name == "sqlite":
+            _rebuild_with_user_column(bind, table, columns)
+        else:
+            _add_user_column(bind, table, legacy_unique)
+        altered.append(table.name)
+    
+    for table in Base.metadata.sorted_tables:
+        if "user_id" in table.c:
+            for index in table.indexes:
+                index.create(bind, checkfirst=True)
+    return altered
+
+
+def _add_user_column(bind, table, legacy_unique: List[str]):
+    """ALTER TABLE ... ADD COLUMN user_id and drop the named legacy unique constraints"""
+    references = "" if bind.dialect.name == "sqlite" else " REFERENCES users(id)"
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE {table.name} ADD COLUMN user_id INTEGER NOT NULL "
+            f"DEFAULT {DEFAULT_USER_ID}{references}"
+        ))
+        for name in legacy_unique:
+            conn.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT "{name}"'))
+
+
+def _rebuild_with_user_column(bind, table, legacy_columns):
+    """Copy rows into a freshly created table (SQLite cannot drop inline unique constraints)"""
+    shared = ", ".join(col.name for col in table.columns if col.name in legacy_columns)
+    with bind.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_legacy"))
+        table.create(conn)
+        conn.execute(text(
+            f"INSERT INTO {table.name} ({shared}, user_id) "
+            f"SELECT {shared}, {DEFAULT_USER_ID} FROM {table.name}_legacy"
+        ))
+        conn.execute(text(f"DROP TABLE {table.name}_legacy"))
+
+
+# Notes full-text search: SQLite FTS5 external-content table kept in sync by
+# triggers, or a generated tsvector column with a GIN index on Postgres
+_NOTES_FTS_SQLITE = [
+    "CREATE VIRTUAL TABLE notes_fts USING fts5("
+    "title, content, content='notes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN "
+    "INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN "
+    "INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content ON notes BEGIN "
+    "INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')",
+]
+
+_NOTES_FTS_POSTGRES = [
+    "ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_notes_search ON notes USING GIN (search_vector)",
+]
+
+
+def migrate_note_search(bind=None) -> bool:
+    """
+    Create the notes full-text index if missing (and index existing notes).
+    Returns False when the database has no full-text support, in which case
+    note_search falls back to LIKE.
+    """
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    if bind.dialect.name == "postgresql":
+        if "search_vector" in {col["name"] for col in inspector.get_columns(Note.__tablename__)}:
+            return True
+        statements = _NOTES_FTS_POSTGRES
+    elif bind.dialect.name == "sqlite":
+        if inspector.has_table("notes_fts"):
+            return True
+        statements = _NOTES_FTS_SQLITE
+    else:
+        return False
+    try:
+        with bind.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+    except exc.OperationalError:
+        # SQLite built without FTS5
+        return False
+    return True
+
+
+def migrate_rollup_columns(bind=None) -> List[str]:
+    """
+    Add counter columns introduced after daily_rollups was created, defaulting
+    to 0. Returns the names of the columns added.
+    """
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    table = DailyRollup.__table__
+    if not inspector.has_table(table.name):
+        return []
+    existing = {col["name"] for col in inspector.get_columns(table.name)}
+    added = [column.name for column in table.columns if column.name not in existing]
+    with bind.begin() as conn:
+        for name in added:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} INTEGER DEFAULT 0"))
+    return added
+
+
+def get_user_stats(db, user_id: int = DEFAULT_USER_ID) -> UserStats:
+    """Get or create a user's stats"""
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
     if not stats:
-        stats = UserStats(id=1)
+        stats = UserStats(user_id=user_id)
         db.add(stats)
         db.commit()
         db.refresh(stats)
     return stats
 
 
-def get_user_profile(db) -> UserProfile:
-    """Get or create user profile"""
-    profile = db.query(UserProfile).first()
+def get_user_profile(db, user_id: int = DEFAULT_USER_ID) -> UserProfile:
+    """Get or create a user's profile"""
+    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
     if not profile:
-        profile = UserProfile(id=1)
+        profile = UserProfile(user_id=user_id)
         db.add(profile)
         db.commit()
         db.refresh(profile)
     return profile
 
 
-# Initialize on import
-init_db()
+def create_user(db, username: str, display_name: Optional[str] = None) -> User:
+    """Create a user with default stats and profile"""
+    user = User(username=username)
+    db.add(user)
+    db.flush()
+    db.add(UserStats(user_id=user.id))
+    db.add(UserProfile(user_id=user.id, display_name=display_name or "Hunter"))
+    db.commit()
+    return user
+
@@ -0,0 +1,382 @@
+"""
+Goal Quest Document Ingestion - Text extraction for the philosophy library
+Uploads are streamed to disk, then a background worker extracts their text one
+page at a time (PDF via pypdf, TXT/MD in fixed-size reads), splits it into
+passages and stores and embeds (vector_index) them in batches, so a
+multi-hundred-page book is processed with bounded memory and never on the UI
+thread. Progress is recorded in
+DocumentIngest as pages are read; when a document is done its excerpt, summary
+and themes are filled in, it is added to the knowledge index and marked
+is_processed.
+
+Run pending documents without the app with: python document_ingest.py process
+"""
+
+import argparse
+import logging
+import math
+import os
+import queue
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from importlib.util import find_spec
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_
+
+from database import (
+    DocumentIngest, DocumentPassage, PhilosophyDocument,
+    SessionLocal, init_db, session_scope
+)
+from ai_integration import generate_ai_summary
+from knowledge_index import KNOWLEDGE_INDEX, SOURCE_DOCUMENT
+from text_index import tokenize
+from vector_index import VECTOR_INDEX
+
+logger = logging.getLogger(__name__)
+
+# pypdf is optional - PDFs fail with a clear error without it
+PDF_AVAILABLE = find_spec("pypdf") is not None
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "./uploads")
+SUPPORTED_TYPES = ("pdf", "txt", "md")
+
+COPY_CHUNK_BYTES = 1024 * 1024
+TEXT_PAGE_CHARS = 64 * 1024  # A "page" of a text file
+PASSAGE_CHARS = 1200  # Target passage length; breaks fall on paragraph or sentence ends
+PASSAGE_BATCH = 200  # Passages inserted (and progress committed) per batch
+EXCERPT_CHARS = 20_000  # extracted_text keeps the opening; passages keep everything
+THEME_COUNT = 5
+
+STATUS_QUEUED = "queued"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+_BREAKS = ("\n\n", ". ", "? ", "! ", "\n", " ")
+
+
+# ============ STORAGE ============
+
+def file_type_for(file_name: str) -> str:
+    """pdf, txt or md from a file name; ValueError for anything else"""
+    extension = os.path.splitext(file_name or "")[1].lower().lstrip(".")
+    extension = {"markdown": "md", "text": "txt"}.get(extension, extension)
+    if extension not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported document type: {file_name}")
+    return extension
+
+
+def store_upload(stream, file_name: str, user_id: int) -> str:
+    """Copy an uploaded file to UPLOAD_DIR in chunks. Returns the stored path."""
+    directory = os.path.join(UPLOAD_DIR, str(user_id))
+    os.makedirs(directory, exist_ok=True)
+    safe_name = _UNSAFE_NAME.sub("_", os.path.basename(file_name or "document"))[-100:]
+    path = os.path.join(directory, f"{uuid.uuid4().hex}_{safe_name}")
+    if hasattr(stream, "seek"):
+        stream.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out, COPY_CHUNK_BYTES)
+    return path
+
+
+# ============ EXTRACTION ============
+
+def open_pages(path: str, file_type: str) -> Tuple[int, Iterator[str]]:
+    """
+    (page count, page texts) for a stored document. Pages are read lazily;
+    for text files the count is an estimate from the file size.
+    """
+    if file_type == "pdf":
+        if not PDF_AVAILABLE:
+            raise RuntimeError("PDF support needs the pypdf package")
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+
+        def pdf_pages():
+            for page in reader.pages:
+                yield (page.extract_text() or "") + "\n\n"
+        return len(reader.pages), pdf_pages()
+
+    def text_pages():
+        with open(path, encoding="utf-8", errors="replace") as f:
+            while True:
+                chunk = f.read(TEXT_PAGE_CHARS)
+                if not chunk:
+                    return
+                yield chunk
+    return max(1, math.ceil(os.path.getsize(path) / TEXT_PAGE_CHARS)), text_pages()
+
+
+def _cut(buffer: str, size: int) -> int:
+    """Where to end the next passage: the last natural break past half its length"""
+    window = buffer[:size * 3 // 2]
+    for separator in _BREAKS:
+        at = window.rfind(separator, size // 2)
+        if at != -1:
+            return at + len(separator)
+    return size
+
+
+def split_passages(pages: Iterable[str], size: int = PASSAGE_CHARS) -> Iterator[Tuple[int, str]]:
+    """
+    (page number, passage) pairs from page texts, whitespace collapsed.
+    Only the current page and one partial passage are held at a time.
+    """
+    buffer = ""
+    start_page = 1
+    for page_number, page in enumerate(pages, 1):
+        if not buffer.strip():
+            start_page = page_number
+        buffer += page
+        while len(buffer) >= size * 3 // 2:
+            cut = _cut(buffer, size)
+            passage = " ".join(buffer[:cut].split())
+            if passage:
+                yield start_page, passage
+            buffer = buffer[cut:]
+            start_page = page_number
+    passage = " ".join(buffer.split())
+    if passage:
+        yield start_page, passage
+
+
+# ============ PROCESSING ============
+
+def _ingest_row(db, document: PhilosophyDocument) -> DocumentIngest:
+    ingest = db.query(DocumentIngest).filter(DocumentIngest.document_id == document.id).one_or_none()
+    if ingest is None:
+        ingest = DocumentIngest(user_id=document.user_id, document_id=document.id)
+        db.add(ingest)
+    return ingest
+
+
+def queue_document(db, document: PhilosophyDocument) -> DocumentIngest:
+    """Record a stored upload as waiting to be processed. Does not commit."""
+    ingest = _ingest_row(db, document)
+    ingest.status = STATUS_QUEUED
+    ingest.error = ""
+    return ingest
+
+
+class _Deleted(Exception):
+    """The document was deleted while it was being processed"""
+
+
+def _document_exists(db, document_id: int) -> bool:
+    return db.query(PhilosophyDocument.id).filter(PhilosophyDocument.id == document_id).first() is not None
+
+
+def _discard_deleted(db, user_id: int, document_id: int):
+    """Remove what a processing run stored for a document deleted under it, and commit"""
+    db.rollback()
+    db.execute(delete(DocumentPassage).where(DocumentPassage.document_id == document_id))
+    db.query(DocumentIngest).filter(DocumentIngest.document_id == document_id).delete(synchronize_session="fetch")
+    db.commit()
+    VECTOR_INDEX.remove_document(user_id, document_id)
+
+
+def _store_passages(db, ingest: DocumentIngest, batch: List[dict]):
+    """
+    Insert a batch of passages, commit them with the progress, then embed them.
+    Raises _Deleted if the document has been deleted since the last batch.
+    """
+    if not _document_exists(db, ingest.document_id):
+        raise _Deleted()
+    if batch:
+        db.execute(insert(DocumentPassage), batch)
+        ingest.passage_count += len(batch)
+    db.commit()
+    if batch:
+        VECTOR_INDEX.add_passages(ingest.user_id, ingest.document_id,
+                                  [(passage["position"], passage["text"]) for passage in batch])
+
+
+def process_document(db, document_id: int) -> Optional[DocumentIngest]:
+    """
+    Extract, split and store one document's text, committing progress every
+    PASSAGE_BATCH passages. Failures are recorded on the DocumentIngest row
+    rather than raised. Returns None if the document no longer exists; if it
+    is deleted part way through, whatever was stored for it is removed.
+    """
+    document = db.get(PhilosophyDocument, document_id)
+    if document is None:
+        return None
+    user_id = document.user_id
+    ingest = _ingest_row(db, document)
+    ingest.status = STATUS_PROCESSING
+    ingest.pages_done = ingest.page_count = ingest.passage_count = 0
+    ingest.error = ""
+    db.execute(delete(DocumentPassage).where(DocumentPassage.document_id == document.id))
+    db.commit()
+    VECTOR_INDEX.remove_document(document.user_id, document.id)
+
+    counts: Counter = Counter()
+    excerpt: List[str] = []
+    excerpt_length = 0
+    first_passage = last_passage = ""
+    try:
+        if not document.object_path or not os.path.exists(document.object_path):
+            raise FileNotFoundError(f"Uploaded file is missing: {document.file_name}")
+        ingest.page_count, pages = open_pages(document.object_path, document.file_type)
+
+        def counted(pages):
+            for page in pages:
+                yield page
+                ingest.pages_done += 1
+
+        batch = []
+        for position, (page, passage) in enumerate(split_passages(counted(pages))):
+            batch.append({
+                "user_id": document.user_id, "document_id": document.id,
+                "position": position, "page": page, "text": passage,
+            })
+            counts.update(tokenize(passage))
+            if excerpt_length < EXCERPT_CHARS:
+                excerpt.append(passage)
+                excerpt_length += len(passage) + 2
+            first_passage = first_passage or passage
+            last_passage = passage
+            if len(batch) >= PASSAGE_BATCH:
+                _store_passages(db, ingest, batch)
+                batch = []
+        ingest.page_count = max(ingest.page_count, ingest.pages_done)
+        _store_passages(db, ingest, batch)
+
+        if not _document_exists(db, document_id):
+            raise _Deleted()
+        index = KNOWLEDGE_INDEX.get(db, user_id)
+        document.extracted_text = "\n\n".join(excerpt)[:EXCERPT_CHARS]
+        document.ai_summary = generate_ai_summary(
+            first_passage if first_passage == last_passage else f"{first_passage} {last_passage}"
+        )
+        document.key_themes = sorted(counts, key=lambda term: index.weight(term, counts[term]), reverse=True)[:THEME_COUNT]
+        document.is_processed = True
+        counts.update(tokenize(document.title))
+        KNOWLEDGE_INDEX.index_document(db, document, dict(counts))
+        ingest.status = STATUS_DONE
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        # Deleted between our check and commit shows up as a StaleDataError
+        if isinstance(e, _Deleted) or not _document_exists(db, document_id):
+            _discard_deleted(db, user_id, document_id)
+            return None
+        VECTOR_INDEX.remove_document(user_id, document_id)
+        db.execute(delete(DocumentPassage).where(DocumentPassage.document_id == document_id))
+        ingest.status = STATUS_FAILED
+        ingest.error = str(e) or e.__class__.__name__
+        db.commit()
+        return ingest
+    return ingest
+
+
+def pending_document_ids(db) -> List[int]:
+    """Unprocessed uploads that are queued, or were interrupted mid-way"""
+    return [
+        document_id for (document_id,) in db.query(PhilosophyDocument.id).outerjoin(
+            DocumentIngest, DocumentIngest.document_id == PhilosophyDocument.id
+        ).filter(
+            PhilosophyDocument.is_processed.is_(False),
+            PhilosophyDocument.object_path != "",
+            or_(DocumentIngest.id.is_(None), DocumentIngest.status.in_((STATUS_QUEUED, STATUS_PROCESSING)))
+        ).order_by(PhilosophyDocument.id)
+    ]
+
+
+def delete_document(db, document: PhilosophyDocument):
+    """Delete a document with its passages, progress, index entry and stored file, and commit"""
+    db.execute(delete(DocumentPassage).where(DocumentPassage.document_id == document.id))
+    ingest = db.query(DocumentIngest).filter(DocumentIngest.document_id == document.id).one_or_none()
+    if ingest is not None:
+        db.delete(ingest)
+    KNOWLEDGE_INDEX.remove(db, SOURCE_DOCUMENT, document.id, document.user_id)
+    path = document.object_path
+    user_id, document_id = document.user_id, document.id
+    db.delete(document)
+    db.commit()
+    VECTOR_INDEX.remove_document(user_id, document_id)
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+# ============ WORKER ============
+
+class DocumentIngestor(threading.Thread):
+    """Daemon thread that processes queued documents one at a time"""
+
+    def __init__(self):
+        super().__init__(name="document-ingestor", daemon=True)
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+
+    def enqueue(self, document_id: int):
+        self._queue.put(document_id)
+
+    def run(self):
+        try:
+            with session_scope() as db:
+                for document_id in pending_document_ids(db):
+                    self.enqueue(document_id)
+        except Exception as e:
+            logger.warning("Could not load pending documents: %s", e)
+        while True:
+            document_id = self._queue.get()
+            if document_id is None:
+                return
+            try:
+                with session_scope() as db:
+                    process_document(db, document_id)
+            except Exception as e:
+                logger.warning("Document %s processing failed: %s", document_id, e)
+
+    def stop(self):
+        self._queue.put(None)
+
+
+_ingestor: Optional[DocumentIngestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def start_document_ingestor() -> DocumentIngestor:
+    """Start the process-wide worker once; it picks up documents left pending"""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None or not _ingestor.is_alive():
+            _ingestor = DocumentIngestor()
+            _ingestor.start()
+        return _ingestor
+
+
+def enqueue_document(document_id: int):
+    """Hand a committed, queued document to the background worker"""
+    start_document_ingestor().enqueue(document_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal Quest document ingestion")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    process = subparsers.add_parser("process", help="Process pending (or the given) documents")
+    process.add_argument("document_ids", nargs="*", type=int)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        for document_id in args.document_ids or pending_document_ids(db):
+            ingest = process_document(db, document_id)
+            if ingest is None:
+                print(f"Document {document_id}: not found")
+            elif ingest.status == STATUS_FAILED:
+                print(f"Document {document_id}: failed - {ingest.error}")
+            else:
+                print(f"Document {document_id}: {ingest.passage_count} passages from {ingest.pages_done} pages")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Goal Quest Active Effects - Cached effect lookups and expiry sweeping
+A user's unexpired effects are cached in-process in a heap ordered by
+expires_at, together with the reward pipeline compiled from them and the
+user's always-on items, so reward paths resolve modifiers without a query and
+expired buffs drop out on their own. Purchases and consumes invalidate the
+user's entry; a background sweeper bulk-deletes expired rows.
+
+Sweep from the command line:
+    python effects.py sweep
+"""
+
+import argparse
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from database import (
+    ActiveEffect, InventoryItem, SessionLocal, after_commit, init_db, session_scope, DEFAULT_USER_ID
+)
+from rewards import RewardPipeline, always_on_items, timed_effect
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on staleness when another process changes a user's effects
+EFFECT_CACHE_TTL = timedelta(seconds=60)
+
+# Expiry of effects that are spent by use rather than time (streak shield charges)
+NEVER_EXPIRES = datetime(9999, 12, 31)
+
+SWEEP_INTERVAL_SECONDS = 300
+SWEEP_BATCH_SIZE = 1000
+
+
+class _UserEffects:
+    """
+    One user's unexpired effects as (expires_at, id, type, value, item_id) in
+    a min-heap, plus their owned items; derived values are rebuilt on expiry.
+    """
+
+    def __init__(self, rows: List[Tuple[datetime, int, str, float, Optional[str]]],
+                 owned_item_ids: List[str], loaded_at: datetime):
+        self.heap = list(rows)
+        heapq.heapify(self.heap)
+        self.owned_item_ids = owned_item_ids
+        self.loaded_at = loaded_at
+        self._reset()
+
+    def _reset(self):
+        self.multipliers = self._products()
+        self._pipeline: Optional[RewardPipeline] = None
+
+    def evict(self, now: datetime):
+        """Drop expired entries; rebuild derived values only if something expired"""
+        if self.heap and self.heap[0][0] <= now:
+            while self.heap and self.heap[0][0] <= now:
+                heapq.heappop(self.heap)
+            self._reset()
+
+    def _products(self) -> Dict[str, float]:
+        multipliers: Dict[str, float] = {}
+        for _, _, effect_type, value, _ in self.heap:
+            multipliers[effect_type] = multipliers.get(effect_type, 1.0) * (1.0 if value is None else value)
+        return multipliers
+
+    @property
+    def pipeline(self) -> RewardPipeline:
+        if self._pipeline is None:
+            effects = [timed_effect(effect_type, value, item_id) for _, _, effect_type, value, item_id in self.heap]
+            effects += [item.effect for item in always_on_items(self.owned_item_ids)]
+            self._pipeline = RewardPipeline(effects)
+        return self._pipeline
+
+
+class ActiveEffectCache:
+    """
+    Per-process cache of users' active effects, keyed by user and effect type.
+    Loads run outside the lock, so each invalidation bumps a generation and a
+    load that raced with one is returned but not cached.
+    """
+
+    def __init__(self, ttl: timedelta = EFFECT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users: Dict[int, _UserEffects] = {}
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # Bumped when every user is invalidated
+
+    def get_multipliers(self, db, user_id: int = DEFAULT_USER_ID,
+                        now: Optional[datetime] = None) -> Dict[str, float]:
+        """Effect type -> product of the user's unexpired effects"""
+        entry = self._entry(db, user_id, now)
+        with self._lock:
+            return dict(entry.multipliers)
+
+    def get_pipeline(self, db, user_id: int = DEFAULT_USER_ID,
+                     now: Optional[datetime] = None) -> RewardPipeline:
+        """The user's compiled reward pipeline"""
+        entry = self._entry(db, user_id, now)
+        with self._lock:
+            return entry.pipeline
+
+    def _entry(self, db, user_id: int, now: Optional[datetime]) -> _UserEffects:
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and now - entry.loaded_at < self.ttl:
+                entry.evict(now)
+                return entry
+            generation = (self._epoch, self._generations.get(user_id, 0))
+
+        rows = db.query(
+            ActiveEffect.expires_at, ActiveEffect.id, ActiveEffect.effect_type,
+            ActiveEffect.value, ActiveEffect.item_id
+        ).filter(
+            ActiveEffect.user_id == user_id,
+            ActiveEffect.expires_at > now
+        ).all()
+        owned = [item_id for (item_id,) in db.query(InventoryItem.item_id).filter(
+            InventoryItem.user_id == user_id,
+            InventoryItem.quantity > 0
+        ).distinct()]
+        entry = _UserEffects([tuple(row) for row in rows], owned, now)
+        with self._lock:
+            if generation == (self._epoch, self._generations.get(user_id, 0)):
+                self._users[user_id] = entry
+        return entry
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Forget one user's effects, or everyone's"""
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+                self._epoch += 1
+            else:
+                self._users.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+EFFECT_CACHE = ActiveEffectCache()
+
+
+def get_active_multipliers(db, user_id: int = DEFAULT_USER_ID) -> Dict[str, float]:
+    """Effect type -> product of the user's unexpired effects"""
+    return EFFECT_CACHE.get_multipliers(db, user_id)
+
+
+def get_reward_pipeline(db, user_id: int = DEFAULT_USER_ID) -> RewardPipeline:
+    """The user's active effects and items compiled into reward modifiers"""
+    return EFFECT_CACHE.get_pipeline(db, user_id)
+
+
+def invalidate_on_commit(db, user_id: int = DEFAULT_USER_ID):
+    """Drop the user's cached effects now and again once the session commits"""
+    EFFECT_CACHE.invalidate(user_id)
+    after_commit(db, lambda: EFFECT_CACHE.invalidate(user_id))
+
+
+def activate_effect(db, effect_type: str, value: float, duration_seconds: int,
+                    user_id: int = DEFAULT_USER_ID, item_id: Optional[str] = None) -> ActiveEffect:
+    """Start a timed effect (e.g. when a consumable is used). Does not commit."""
+    active = ActiveEffect(
+        user_id=user_id,
+        effect_type=effect_type,
+        value=value,
+        expires_at=datetime.now() + timedelta(seconds=duration_seconds),
+        item_id=item_id,
+    )
+    db.add(active)
+    invalidate_on_commit(db, user_id)
+    return active
+
+
+def add_charges(db, effect_type: str, charges: int, user_id: int = DEFAULT_USER_ID,
+                item_id: Optional[str] = None) -> ActiveEffect:
+    """Store an effect spent by use, with value = uses left. Does not commit."""
+    active = ActiveEffect(
+        user_id=user_id,
+        effect_type=effect_type,
+        value=float(charges),
+        expires_at=NEVER_EXPIRES,
+        item_id=item_id,
+    )
+    db.add(active)
+    invalidate_on_commit(db, user_id)
+    return active
+
+
+def spend_charges(db, effect_type: str, charges: int, user_id: int = DEFAULT_USER_ID) -> bool:
+    """
+    Spend `charges` uses of an effect, oldest rows first, deleting rows used up.
+    All or nothing: returns False and spends nothing if the user has fewer.
+    Does not commit.
+    """
+    rows = db.query(ActiveEffect).filter(
+        ActiveEffect.user_id == user_id,
+        ActiveEffect.effect_type == effect_type,
+        ActiveEffect.expires_at > datetime.now(),
+        ActiveEffect.value > 0
+    ).order_by(ActiveEffect.id).with_for_update().all()
+    if sum(int(row.value) for row in rows) < charges:
+        return False
+    for row in rows:
+        if not charges:
+            break
+        spent = min(charges, int(row.value))
+        row.value -= spent
+        charges -= spent
+        if not row.value:
+            db.delete(row)
+    invalidate_on_commit(db, user_id)
+    return True
+
+
+# ============ SWEEPER ============
+
+def sweep_expired_effects(db, now: Optional[datetime] = None, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Bulk-delete expired effect rows in batches, committing each. Returns rows deleted."""
+    now = now or datetime.now()
+    deleted = 0
+    while True:
+        expired = select(ActiveEffect.id).where(ActiveEffect.expires_at <= now).limit(batch_size)
+        count = db.execute(
+            delete(ActiveEffect).where(ActiveEffect.id.in_(expired)),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+class EffectSweeper(threading.Thread):
+    """Daemon thread that periodically deletes expired effects"""
+
+    def __init__(self, interval: float = SWEEP_INTERVAL_SECONDS):
+        super().__init__(name="effect-sweeper", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                with session_scope() as db:
+                    sweep_expired_effects(db)
+            except Exception as e:
+                logger.warning("Effect sweep failed: %s", e)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_sweeper: Optional[EffectSweeper] = None
+_sweeper_lock = threading.Lock()
+
+
+def start_effect_sweeper(interval: float = SWEEP_INTERVAL_SECONDS) -> EffectSweeper:
+    """Start the process-wide sweeper once; later calls return the running one"""
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = EffectSweeper(interval)
+            _sweeper.start()
+        return _sweeper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal Quest active effect maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sweep = subparsers.add_parser("sweep", help="Delete expired active effects")
+    sweep.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = sweep_expired_effects(db, batch_size=args.batch_size)
+        print(f"Deleted {deleted} expired effects")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,28 +4,37 @@ Exact replication of the Replit gameplay.ts
 """
 
 import math
+from bisect import bisect_right
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
+from datetime import date
 
 
 # ============ XP SYSTEM ============
 
 BASE_XP = 1000  # XP required for level 1 -> 2
 XP_GROWTH_RATE = 1.05  # 5% compound growth per level
+MAX_LEVEL = 100  # Level cap
 
 
 def calculate_xp_for_level(level: int) -> int:
     """Calculate XP required to reach a specific level"""
     if level <= 1:
         return 0
-    return int(BASE_XP * (XP_GROWTH_RATE ** (level - 1)))
+    if level < len(_XP_FOR_LEVEL):
+        return _XP_FOR_LEVEL[level]
+    return _xp_for_level(level)
 
 
 def calculate_total_xp_for_level(level: int) -> int:
     """Calculate total XP needed from 0 to reach a level"""
-    total = 0
-    for lvl in range(2, level + 1):
-        total += calculate_xp_for_level(lvl)
+    if level <= 1:
+        return 0
+    if level < len(_CUMULATIVE_XP):
+        return _CUMULATIVE_XP[level]
+    total = _CUMULATIVE_XP[-1]
+    for lvl in range(len(_CUMULATIVE_XP), level + 1):
+        total += _xp_for_level(lvl)
     return total
 
 
@@ -34,17 +43,51 @@ def calculate_level_from_xp(total_xp: int) -> Tuple[int, int, int]:
     Calculate level and progress from total XP
     Returns: (level, current_xp_in_level, xp_needed_for_next_level)
     """
-    level = 1
-    remaining_xp = total_xp
+    # _CUMULATIVE_XP[level] <= total_xp < _CUMULATIVE_XP[level + 1]
+    level = max(bisect_right(_CUMULATIVE_XP, total_xp) - 1, 1)
+    if level > MAX_LEVEL:
+        # XP past the cap keeps counting into the (never reached) next level
+        return MAX_LEVEL, total_xp - _CUMULATIVE_XP[MAX_LEVEL + 1], _XP_FOR_LEVEL[MAX_LEVEL + 1]
+    return level, total_xp - _CUMULATIVE_XP[level], _XP_FOR_LEVEL[level + 1]
+
+
+def calculate_levels_from_xp(total_xps):
+    """
+    Vectorized calculate_level_from_xp for analytics and leaderboards.
+    Takes any array-like of XP totals and returns three NumPy int64 arrays:
+    (levels, current_xp_in_level, xp_needed_for_next_level)
+    """
+    import numpy as np
     
-    while True:
-        xp_for_next = calculate_xp_for_level(level + 1)
-        if remaining_xp < xp_for_next:
-            return level, remaining_xp, xp_for_next
-        remaining_xp -= xp_for_next
-        level += 1
-        if level > 100:  # Cap at level 100
-            return 100, remaining_xp, xp_for_next
+    totals = np.asarray(total_xps, dtype=np.int64)
+    cumulative = np.asarray(_CUMULATIVE_XP, dtype=np.int64)
+    per_level = np.asarray(_XP_FOR_LEVEL, dtype=np.int64)
+    
+    levels = np.clip(np.searchsorted(cumulative, totals, side="right") - 1, 1, MAX_LEVEL + 1)
+    in_level = totals - cumulative[levels]
+    needed = per_level[np.minimum(levels + 1, MAX_LEVEL + 1)]
+    return np.minimum(levels, MAX_LEVEL), in_level, needed
+
+
+def _xp_for_level(level: int) -> int:
+    return int(BASE_XP * (XP_GROWTH_RATE ** (level - 1)))
+
+
+def _build_xp_tables(max_level: int) -> Tuple[List[int], List[int]]:
+    """
+    Precompute per-level and cumulative XP, both indexed by level.
+    Index 0 is a placeholder so that table[level] reads naturally.
+    """
+    per_level = [0, 0]
+    cumulative = [0, 0]
+    for level in range(2, max_level + 1):
+        per_level.append(_xp_for_level(level))
+        cumulative.append(cumulative[-1] + per_level[-1])
+    return per_level, cumulative
+
+
+# Covers one level past the cap, which calculate_level_from_xp reports at MAX_LEVEL
+_XP_FOR_LEVEL, _CUMULATIVE_XP = _build_xp_tables(MAX_LEVEL + 1)
 
 
 # ============ DIFFICULTY & XP REWARDS ============
@@ -231,8 +274,8 @@ DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
 def should_show_habit_today(frequency: str, frequency_days: List[int], custom_interval: int, 
-                            start_date: str, today_weekday: int) -> bool:
-    """Check if a habit should be shown/tracked today"""
+                            start_date: str, today_weekday: int, on: Optional[date] = None) -> bool:
+    """Check if a habit should be shown/tracked today, or on the day `on`"""
     if frequency == "daily":
         return True
     elif frequency == "weekdays":
@@ -246,7 +289,7 @@ def should_show_habit_today(frequency: str, frequency_days: List[int], custom_in
         from datetime import datetime
         try:
             start = datetime.strptime(start_date[:10], "%Y-%m-%d")
-            today = datetime.now()
+            today = datetime.combine(on, datetime.min.time()) if on else datetime.now()
             days_since = (today - start).days
             return days_since % custom_interval == 0
         except:
@@ -0,0 +1,79 @@
+"""
+Goal Quest Habit Queries - Batched read models for habit pages
+Loads every active habit with its today status, streak and recent completion
+count in a single query, so page render cost stays flat as habits grow.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, func
+
+from database import Habit, Completion, HabitStreak, DEFAULT_USER_ID
+from streaks import current_streak, get_streak_states
+
+
+DEFAULT_WINDOW_DAYS = 30
+
+
+@dataclass
+class HabitSummary:
+    habit: Habit
+    completed_today: bool
+    streak: int
+    longest_streak: int
+    window_completions: int  # Completions in the last window_days, today included
+
+
+def get_habit_summaries(db, today: Optional[date] = None, priority_only: bool = False,
+                        limit: Optional[int] = None,
+                        window_days: int = DEFAULT_WINDOW_DAYS,
+                        user_id: int = DEFAULT_USER_ID) -> List[HabitSummary]:
+    """
+    Get a user's active habits with today status, streak and window completion count.
+    One query in the steady state; habits without a streak row yet get it
+    rebuilt once on first sight.
+    """
+    today = today or date.today()
+    window_start = today - timedelta(days=window_days - 1)
+    
+    recent = db.query(
+        Completion.habit_id.label("habit_id"),
+        func.count(Completion.id).label("window_completions"),
+        func.max(case((Completion.date == today, 1), else_=0)).label("done_today"),
+    ).filter(
+        Completion.user_id == user_id,
+        Completion.completed == True,
+        Completion.date >= window_start
+    ).group_by(Completion.habit_id).subquery()
+    
+    query = db.query(
+        Habit, HabitStreak, recent.c.window_completions, recent.c.done_today
+    ).outerjoin(
+        HabitStreak, HabitStreak.habit_id == Habit.id
+    ).outerjoin(
+        recent, recent.c.habit_id == Habit.id
+    ).filter(Habit.user_id == user_id, Habit.active == True)
+    
+    if priority_only:
+        query = query.filter(Habit.priority == True)
+    query = query.order_by(Habit.id)
+    if limit is not None:
+        query = query.limit(limit)
+    rows = query.all()
+    
+    missing = [habit.id for habit, state, _, _ in rows if state is None]
+    rebuilt = get_streak_states(db, missing, today) if missing else {}
+    
+    summaries = []
+    for habit, state, window_completions, done_today in rows:
+        state = state if state is not None else rebuilt[habit.id]
+        summaries.append(HabitSummary(
+            habit=habit,
+            completed_today=bool(done_today),
+            streak=current_streak(state, today),
+            longest_streak=state.longest_streak or 0,
+            window_completions=window_completions or 0,
+        ))
+    return summaries
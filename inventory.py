@@ -0,0 +1,203 @@
+"""
+Goal Quest Inventory - Purchases and owned items
+One inventory row per (user, item) with a quantity. Purchases debit gold with
+a guarded UPDATE (current_gold >= price), so concurrent tabs cannot overspend,
+and add to the row's quantity within the item's stack limit. A cart is bought
+all-or-nothing inside a savepoint and committed once. Using a consumable
+spends one and applies its effect in the same commit.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy.exc import IntegrityError
+
+from database import Habit, InventoryItem, UserStats, DEFAULT_USER_ID
+from gameplay import STAT_METADATA
+from shop_items import ShopItem, SHOP_ITEMS_BY_ID
+from achievements import AchievementDef, EVENT_PURCHASE
+from effects import activate_effect, add_charges, invalidate_on_commit
+from progression import HabitCompletion, Progress, complete_habit
+
+
+ItemRef = Union[str, ShopItem]
+
+
+@dataclass
+class PurchaseResult:
+    ok: bool
+    reason: Optional[str] = None  # Why the purchase was declined
+    gold_spent: int = 0
+    quantities: Dict[str, int] = field(default_factory=dict)  # item_id -> quantity owned afterwards
+    unlocked: List[AchievementDef] = field(default_factory=list)
+
+
+@dataclass
+class UseResult:
+    ok: bool
+    reason: Optional[str] = None  # Why nothing was used
+    unlocked: List[AchievementDef] = field(default_factory=list)
+    completion: Optional[HabitCompletion] = None  # Set by instant_complete_habit
+
+
+class _Declined(Exception):
+    """Rolls the purchase savepoint back"""
+
+
+def _resolve(item: ItemRef) -> ShopItem:
+    if isinstance(item, ShopItem):
+        return item
+    try:
+        return SHOP_ITEMS_BY_ID[item]
+    except KeyError:
+        raise ValueError(f"Unknown shop item: {item}")
+
+
+def stack_limit(item: ShopItem) -> int:
+    """Most of an item a user can hold"""
+    return item.max_stack if item.stackable else 1
+
+
+def get_inventory(db, user_id: int = DEFAULT_USER_ID) -> Dict[str, int]:
+    """item_id -> quantity for everything the user holds"""
+    return {
+        item_id: quantity
+        for item_id, quantity in db.query(InventoryItem.item_id, InventoryItem.quantity).filter(
+            InventoryItem.user_id == user_id,
+            InventoryItem.quantity > 0
+        )
+    }
+
+
+def get_quantity(db, item_id: str, user_id: int = DEFAULT_USER_ID) -> int:
+    """How many of one item the user holds"""
+    return db.query(InventoryItem.quantity).filter(
+        InventoryItem.user_id == user_id,
+        InventoryItem.item_id == item_id
+    ).scalar() or 0
+
+
+def _debit_gold(db, user_id: int, gold: int, level_required: int):
+    """Guarded UPDATE: spend gold only if the user has enough and meets the level"""
+    debited = db.query(UserStats).filter(
+        UserStats.user_id == user_id,
+        UserStats.current_gold >= gold,
+        UserStats.level >= level_required
+    ).update({UserStats.current_gold: UserStats.current_gold - gold}, synchronize_session="fetch")
+    if not debited:
+        stats = db.query(UserStats.current_gold, UserStats.level).filter(UserStats.user_id == user_id).first()
+        if stats is not None and (stats.level or 1) < level_required:
+            raise _Declined(f"Requires level {level_required}")
+        raise _Declined("Not enough gold")
+
+
+def _add_quantity(db, user_id: int, item: ShopItem, quantity: int) -> int:
+    """Upsert the (user, item) row within the stack limit. Returns the new quantity."""
+    limit = stack_limit(item)
+    row_filter = (InventoryItem.user_id == user_id, InventoryItem.item_id == item.id)
+    for _ in range(2):
+        updated = db.query(InventoryItem).filter(
+            *row_filter,
+            InventoryItem.quantity + quantity <= limit
+        ).update({InventoryItem.quantity: InventoryItem.quantity + quantity}, synchronize_session=False)
+        if updated:
+            return db.query(InventoryItem.quantity).filter(*row_filter).scalar()
+        if db.query(InventoryItem.id).filter(*row_filter).first():
+            raise _Declined(f"You can hold at most {limit} {item.name}")
+        if quantity > limit:
+            raise _Declined(f"You can hold at most {limit} {item.name}")
+        try:
+            # The unique (user_id, item_id) index settles races between sessions
+            with db.begin_nested():
+                db.add(InventoryItem(user_id=user_id, item_id=item.id, quantity=quantity))
+            return quantity
+        except IntegrityError:
+            continue  # Another session created the row first: add to it
+    raise _Declined(f"Could not add {item.name}")
+
+
+def purchase_items(db, cart: Iterable[Tuple[ItemRef, int]], user_id: int = DEFAULT_USER_ID) -> PurchaseResult:
+    """
+    Buy several items at once, all-or-nothing, and commit.
+    Declined carts (not enough gold, level too low, stack full) change nothing
+    and return ok=False with a reason.
+    """
+    order: Dict[str, Tuple[ShopItem, int]] = {}
+    for ref, quantity in cart:
+        item = _resolve(ref)
+        if quantity < 1:
+            raise ValueError(f"Quantity must be positive: {item.id} x{quantity}")
+        previous = order.get(item.id, (item, 0))[1]
+        order[item.id] = (item, previous + quantity)
+    if not order:
+        return PurchaseResult(ok=True)
+
+    gold = sum(item.price.gold * quantity for item, quantity in order.values())
+    level_required = max(item.level_required or 0 for item, _ in order.values())
+    quantities: Dict[str, int] = {}
+    try:
+        with db.begin_nested():
+            _debit_gold(db, user_id, gold, level_required)
+            for item, quantity in order.values():
+                quantities[item.id] = _add_quantity(db, user_id, item, quantity)
+    except _Declined as declined:
+        return PurchaseResult(ok=False, reason=str(declined))
+
+    invalidate_on_commit(db, user_id)
+    progress = Progress(db, user_id)
+    for item, quantity in order.values():
+        progress.emit(EVENT_PURCHASE, item=item, quantity=quantity)
+    progress.commit()
+    return PurchaseResult(ok=True, gold_spent=gold, quantities=quantities, unlocked=progress.unlocked)
+
+
+def purchase_item(db, item: ItemRef, quantity: int = 1, user_id: int = DEFAULT_USER_ID) -> PurchaseResult:
+    """Buy one item (optionally several of it) and commit"""
+    return purchase_items(db, [(item, quantity)], user_id)
+
+
+def use_item(db, item: ItemRef, user_id: int = DEFAULT_USER_ID, stat: Optional[str] = None,
+             habit: Optional[Habit] = None) -> UseResult:
+    """
+    Consume one of a held item, apply its effect and commit: timed effects
+    start, streak shields become charges, stat potions raise `stat` and
+    scrolls complete `habit` for today. Returns ok=False if the user holds
+    none, or the habit is already done and the item is kept.
+    """
+    item = _resolve(item)
+    effect = item.effect
+    effect_type = effect.type if effect is not None else None
+    if effect_type == "stat_boost_perm":
+        stat = stat if effect.choosable else effect.stats
+        if stat not in STAT_METADATA:
+            raise ValueError(f"{item.name} needs a stat to raise, one of: {', '.join(STAT_METADATA)}")
+    if effect_type == "instant_complete_habit" and (habit is None or habit.user_id != user_id):
+        raise ValueError(f"{item.name} needs one of the user's habits to complete")
+
+    used = db.query(InventoryItem).filter(
+        InventoryItem.user_id == user_id,
+        InventoryItem.item_id == item.id,
+        InventoryItem.quantity >= 1
+    ).update({InventoryItem.quantity: InventoryItem.quantity - 1}, synchronize_session=False)
+    if not used:
+        return UseResult(ok=False, reason=f"You have no {item.name}")
+
+    if effect_type == "instant_complete_habit":
+        # complete_habit commits the spent scroll with the completion
+        completion = complete_habit(db, habit)
+        if not completion.created:
+            db.rollback()
+            return UseResult(ok=False, reason=f"{habit.name} is already complete today")
+        return UseResult(ok=True, unlocked=completion.unlocked, completion=completion)
+
+    progress = Progress(db, user_id)
+    if effect is not None and effect.duration:
+        activate_effect(db, effect.type, effect.value, effect.duration, user_id=user_id, item_id=item.id)
+    elif effect_type == "streak_protection":
+        add_charges(db, effect.type, effect.uses or 1, user_id=user_id, item_id=item.id)
+    elif effect_type == "stat_boost_perm":
+        progress.grant(stat_gains={stat: int(effect.value or 0)})
+    else:
+        invalidate_on_commit(db, user_id)
+    progress.commit()
+    return UseResult(ok=True, unlocked=progress.unlocked)
@@ -0,0 +1,185 @@
+"""
+Goal Quest Knowledge Index - TF-IDF over a user's notes and philosophy documents
+Each user's text_index.InvertedIndex is built once per process from persisted
+term vectors (term_vectors table), so a restart re-tokenizes nothing that is
+unchanged. Saving a note re-tokenizes only that note; notes edited elsewhere
+are caught by comparing updated_at when the index is loaded.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from database import Note, PhilosophyDocument, TermVector, after_commit, session_scope, DEFAULT_USER_ID
+from text_index import InvertedIndex, term_counts
+
+
+SOURCE_NOTE = "note"
+SOURCE_DOCUMENT = "document"
+
+
+def note_text(note) -> str:
+    return f"{note.title or ''}\n{note.content or ''}"
+
+
+def document_text(document) -> str:
+    return f"{document.title or ''}\n{document.extracted_text or ''}"
+
+
+def _save_vector(db, user_id: int, source: str, doc_id: int, counts: Dict[str, int]):
+    """Upsert a document's term counts. Runs in the caller's transaction."""
+    values = {TermVector.terms: counts, TermVector.indexed_at: datetime.utcnow()}
+    row_filter = (TermVector.user_id == user_id, TermVector.source == source, TermVector.doc_id == doc_id)
+    if db.query(TermVector).filter(*row_filter).update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(TermVector(user_id=user_id, source=source, doc_id=doc_id, terms=counts))
+    except IntegrityError:
+        db.query(TermVector).filter(*row_filter).update(values, synchronize_session=False)
+
+
+class KnowledgeIndex:
+    """Per-process cache of each user's inverted index"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: Dict[int, InvertedIndex] = {}
+
+    def get(self, db, user_id: int = DEFAULT_USER_ID) -> InvertedIndex:
+        """The user's index, loaded (and brought up to date) on first use"""
+        with self._lock:
+            index = self._users.get(user_id)
+        if index is None:
+            index = self._load(db, user_id)
+            with self._lock:
+                index = self._users.setdefault(user_id, index)
+        return index
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def _load(self, db, user_id: int) -> InvertedIndex:
+        index = InvertedIndex()
+        indexed_at: Dict[Tuple[str, int], datetime] = {}
+        for source, doc_id, terms, stamp in db.query(
+            TermVector.source, TermVector.doc_id, TermVector.terms, TermVector.indexed_at
+        ).filter(TermVector.user_id == user_id):
+            index.add((source, doc_id), terms or {})
+            indexed_at[(source, doc_id)] = stamp
+
+        # Re-tokenize only what changed since it was indexed
+        notes = dict(db.query(Note.id, Note.updated_at).filter(Note.user_id == user_id).all())
+        documents = {doc_id for (doc_id,) in db.query(PhilosophyDocument.id).filter(PhilosophyDocument.user_id == user_id)}
+        stale_notes = [
+            note_id for note_id, updated_at in notes.items()
+            if (SOURCE_NOTE, note_id) not in indexed_at
+            or (updated_at and indexed_at[(SOURCE_NOTE, note_id)] and updated_at > indexed_at[(SOURCE_NOTE, note_id)])
+        ]
+        new_documents = [doc_id for doc_id in documents if (SOURCE_DOCUMENT, doc_id) not in indexed_at]
+        removed = [
+            key for key in indexed_at
+            if (key[0] == SOURCE_NOTE and key[1] not in notes)
+            or (key[0] == SOURCE_DOCUMENT and key[1] not in documents)
+        ]
+        if not (stale_notes or new_documents or removed):
+            return index
+
+        # Persist in a session of our own so read-only callers stay read-only
+        with session_scope() as writer:
+            for note in writer.query(Note).filter(Note.id.in_(stale_notes)) if stale_notes else ():
+                counts = term_counts(note_text(note))
+                index.add((SOURCE_NOTE, note.id), counts)
+                _save_vector(writer, user_id, SOURCE_NOTE, note.id, counts)
+            for document in writer.query(PhilosophyDocument).filter(
+                PhilosophyDocument.id.in_(new_documents)
+            ) if new_documents else ():
+                counts = term_counts(document_text(document))
+                index.add((SOURCE_DOCUMENT, document.id), counts)
+                _save_vector(writer, user_id, SOURCE_DOCUMENT, document.id, counts)
+            for source, doc_id in removed:
+                index.remove((source, doc_id))
+                writer.query(TermVector).filter(
+                    TermVector.user_id == user_id, TermVector.source == source, TermVector.doc_id == doc_id
+                ).delete(synchronize_session=False)
+        return index
+
+    def _after_commit(self, db, user_id: int, apply):
+        """Apply a change to the cached index once the session commits; a rollback drops it"""
+        def on_commit():
+            with self._lock:
+                index = self._users.get(user_id)
+            if index is not None:
+                apply(index)
+        after_commit(db, on_commit)
+
+    def index_note(self, db, note: Note):
+        """Re-tokenize one note and save its vector. Does not commit; note must have an id."""
+        counts = term_counts(note_text(note))
+        _save_vector(db, note.user_id, SOURCE_NOTE, note.id, counts)
+        key = (SOURCE_NOTE, note.id)
+        self._after_commit(db, note.user_id, lambda index: index.add(key, counts))
+
+    def index_document(self, db, document: PhilosophyDocument, counts: Optional[Dict[str, int]] = None):
+        """
+        Save a philosophy document's vector, re-tokenizing its text unless the
+        caller already counted terms (document_ingest counts whole books passage
+        by passage). Does not commit.
+        """
+        counts = counts if counts is not None else term_counts(document_text(document))
+        _save_vector(db, document.user_id, SOURCE_DOCUMENT, document.id, counts)
+        key = (SOURCE_DOCUMENT, document.id)
+        self._after_commit(db, document.user_id, lambda index: index.add(key, counts))
+
+    def remove(self, db, source: str, doc_id: int, user_id: int = DEFAULT_USER_ID):
+        """Drop a deleted note or document. Does not commit."""
+        db.query(TermVector).filter(
+            TermVector.user_id == user_id, TermVector.source == source, TermVector.doc_id == doc_id
+        ).delete(synchronize_session=False)
+        key = (source, doc_id)
+        self._after_commit(db, user_id, lambda index: index.remove(key))
+
+
+KNOWLEDGE_INDEX = KnowledgeIndex()
+
+
+# ============ QUERIES ============
+
+def get_knowledge_index(db, user_id: int = DEFAULT_USER_ID) -> InvertedIndex:
+    return KNOWLEDGE_INDEX.get(db, user_id)
+
+
+def note_themes(db, user_id: int = DEFAULT_USER_ID, note_ids: Optional[Iterable[int]] = None,
+                k: int = 8) -> List[Tuple[str, float]]:
+    """Most characteristic terms across a user's notes (or a subset)"""
+    index = KNOWLEDGE_INDEX.get(db, user_id)
+    keys = None if note_ids is None else [(SOURCE_NOTE, note_id) for note_id in note_ids]
+    if keys is None:
+        keys = [key for key in index.documents if key[0] == SOURCE_NOTE]
+    return index.top_terms(keys, k)
+
+
+def related_notes(db, note_id: int, user_id: int = DEFAULT_USER_ID,
+                  k: int = 5) -> List[Tuple[int, float, List[str]]]:
+    """(note_id, similarity, shared terms) for the notes closest to one note"""
+    index = KNOWLEDGE_INDEX.get(db, user_id)
+    key = (SOURCE_NOTE, note_id)
+    notes = [doc for doc in index.documents if doc[0] == SOURCE_NOTE]
+    return [
+        (other[1], score, index.shared_terms(key, other))
+        for other, score in index.similar(key, k, candidates=notes)
+    ]
+
+
+def find_similar(db, text: str, user_id: int = DEFAULT_USER_ID, k: int = 5,
+                 sources: Tuple[str, ...] = (SOURCE_NOTE, SOURCE_DOCUMENT)) -> List[Tuple[str, int, float]]:
+    """(source, id, similarity) of the notes and documents closest to free text"""
+    index = KNOWLEDGE_INDEX.get(db, user_id)
+    candidates = [doc for doc in index.documents if doc[0] in sources]
+    return [(source, doc_id, score) for (source, doc_id), score in index.query(text, k, candidates=candidates)]
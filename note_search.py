@@ -0,0 +1,159 @@
+"""
+Goal Quest Note Search - Ranked full-text search over a user's notes
+Backed by SQLite FTS5 or a Postgres tsvector/GIN index (see
+database.migrate_note_search), which the database keeps in sync on every
+insert, update and delete. Only the page of hits is transferred, with a short
+preview instead of the full body. Databases without full-text support fall
+back to LIKE.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import String, and_, cast, func, inspect, literal, literal_column, or_, select, table, column, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from database import Note, DEFAULT_USER_ID
+from knowledge_index import KNOWLEDGE_INDEX, SOURCE_NOTE
+from vector_index import VECTOR_INDEX
+
+
+NOTES_PAGE_SIZE = 20
+PREVIEW_CHARS = 200
+
+# bm25 column weights: title matches count more than body matches
+_BM25 = "bm25(notes_fts, 10.0, 1.0)"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_notes_fts = table("notes_fts", column("rowid"))
+
+
+@dataclass
+class NoteHit:
+    id: int
+    title: str
+    preview: str  # First PREVIEW_CHARS characters of the content
+    category: str
+    tags: List[str]
+    pinned: bool
+    color: str
+    created_at: Optional[datetime]
+    content_length: int = 0
+    rank: Optional[float] = None
+
+
+@dataclass
+class NotePage:
+    hits: List[NoteHit] = field(default_factory=list)
+    has_more: bool = False
+
+
+def search_tokens(query: str) -> List[str]:
+    """Words in a user's query; punctuation and FTS operators are dropped"""
+    return [token.lower() for token in _TOKEN.findall(query or "")]
+
+
+_sqlite_fts: Dict[str, bool] = {}
+
+
+def _sqlite_fts_available(db) -> bool:
+    """Whether migrate_note_search created the FTS5 table, checked once per database"""
+    bind = db.get_bind()
+    url = str(bind.url)
+    if url not in _sqlite_fts:
+        _sqlite_fts[url] = inspect(bind).has_table("notes_fts")
+    return _sqlite_fts[url]
+
+
+def _tag_filter(db, tags: Sequence[str]):
+    """Notes carrying every tag"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return cast(Note.tags, JSONB).contains(list(tags))
+    if dialect == "sqlite":
+        conditions = []
+        for tag in tags:
+            values = func.json_each(Note.tags).table_valued("value")
+            conditions.append(select(literal(1)).select_from(values).where(values.c.value == tag).exists())
+        return and_(*conditions)
+    return and_(*[cast(Note.tags, String).like(f'%"{tag}"%') for tag in tags])
+
+
+def search_notes(db, query: str = "", user_id: int = DEFAULT_USER_ID,
+                 category: Optional[str] = None, tags: Sequence[str] = (),
+                 limit: int = NOTES_PAGE_SIZE, offset: int = 0) -> NotePage:
+    """
+    One page of a user's notes. With a query, every word must match (the last
+    characters of each word may be missing, so "medit" finds "meditation") and
+    hits are ordered by relevance; without one, pinned notes come first, then
+    newest. Category and tags narrow the results.
+    """
+    tokens = search_tokens(query)
+    dialect = db.get_bind().dialect.name
+    columns = [
+        Note.id, Note.title, func.substr(Note.content, 1, PREVIEW_CHARS).label("preview"),
+        Note.category, Note.tags, Note.pinned, Note.color, Note.created_at,
+        func.length(Note.content).label("content_length"),
+    ]
+    filters = [Note.user_id == user_id]
+    if category:
+        filters.append(Note.category == category)
+    if tags:
+        filters.append(_tag_filter(db, tags))
+
+    if tokens and dialect == "sqlite" and _sqlite_fts_available(db):
+        rank = literal_column(_BM25)
+        statement = select(*columns, rank.label("rank")).select_from(
+            Note.__table__.join(_notes_fts, _notes_fts.c.rowid == Note.id)
+        ).where(
+            text("notes_fts MATCH :match").bindparams(match=" ".join(f'"{token}"*' for token in tokens)),
+            *filters
+        ).order_by(rank)
+    elif tokens and dialect == "postgresql":
+        tsquery = func.to_tsquery("english", " & ".join(f"{token}:*" for token in tokens))
+        vector = literal_column("notes.search_vector")
+        rank = func.ts_rank_cd(vector, tsquery)
+        statement = select(*columns, rank.label("rank")).where(
+            vector.op("@@")(tsquery), *filters
+        ).order_by(rank.desc())
+    else:
+        for token in tokens:
+            pattern = f"%{token}%"
+            filters.append(or_(Note.title.ilike(pattern), Note.content.ilike(pattern)))
+        statement = select(*columns, literal(None).label("rank")).where(*filters).order_by(
+            Note.pinned.desc(), Note.created_at.desc()
+        )
+
+    rows = db.execute(statement.limit(limit + 1).offset(offset)).all()
+    hits = [
+        NoteHit(
+            id=row.id, title=row.title, preview=row.preview or "", category=row.category,
+            tags=list(row.tags or []), pinned=bool(row.pinned), color=row.color,
+            created_at=row.created_at, content_length=row.content_length or 0, rank=row.rank,
+        )
+        for row in rows[:limit]
+    ]
+    return NotePage(hits=hits, has_more=len(rows) > limit)
+
+
+def get_user_tags(db, user_id: int = DEFAULT_USER_ID) -> List[str]:
+    """Every tag a user has used, for the tag filter"""
+    found = set()
+    for (tags,) in db.query(Note.tags).filter(Note.user_id == user_id):
+        found.update(tags or [])
+    return sorted(found)
+
+
+def delete_note(db, note_id: int, user_id: int = DEFAULT_USER_ID) -> bool:
+    """Delete one of a user's notes and commit; the search and knowledge indexes follow"""
+    deleted = db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).delete(
+        synchronize_session=False
+    )
+    if deleted:
+        KNOWLEDGE_INDEX.remove(db, SOURCE_NOTE, note_id, user_id)
+    db.commit()
+    if deleted:
+        VECTOR_INDEX.remove_note(user_id, note_id)
+    return deleted > 0
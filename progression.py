@@ -0,0 +1,320 @@
+"""
+Goal Quest Progression - XP, gold, stats and achievement payouts
+Plain functions over a SQLAlchemy session with no Streamlit dependency, so the
+app, CLI tools and background workers share one implementation. UI feedback
+(balloons, toasts) is left to the caller via the returned results.
+
+Every reward path goes through Progress: the user's stats row is locked once,
+the compiled reward pipeline (rewards.py) is fetched once, changes are applied
+in memory together with any achievements they unlock, and the whole action
+commits once.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from database import Completion, DailyRollup, Goal, Habit, UserStats, DEFAULT_USER_ID
+from effects import get_active_multipliers, get_reward_pipeline
+from rewards import RewardModifier, RewardPipeline, UNMODIFIED
+from gameplay import (
+    calculate_level_from_xp, calculate_gold_reward, calculate_streak_bonus,
+    get_goal_xp, get_habit_xp, get_stat_for_category
+)
+from streaks import get_current_streak, record_completion
+from rollups import record_rollup
+from achievements import (
+    AchievementDef, EVENT_GOAL_COMPLETED, EVENT_HABIT_COMPLETED, EVENT_LEVEL_UP, EVENT_ACHIEVEMENT_UNLOCKED
+)
+from achievement_engine import ACHIEVEMENT_ENGINE
+
+
+@dataclass
+class XPAward:
+    amount: int  # XP after multipliers
+    level: int
+    leveled_up: bool
+    unlocked: List[AchievementDef] = field(default_factory=list)  # Unlocked by the level up
+
+
+@dataclass
+class HabitCompletion:
+    created: bool  # False if the habit was already completed that day
+    xp: int = 0
+    gold: int = 0
+    stat: Optional[str] = None
+    streak: int = 0
+    level: int = 1
+    leveled_up: bool = False
+    critical: bool = False  # Critical strike multiplied the XP
+    doubled: bool = False  # Counted twice
+    unlocked: List[AchievementDef] = field(default_factory=list)
+
+
+@dataclass
+class GoalCompletion:
+    created: bool  # False if the goal was already completed
+    xp: int = 0
+    gold: int = 0
+    level: int = 1
+    leveled_up: bool = False
+    unlocked: List[AchievementDef] = field(default_factory=list)
+
+
+def calculate_streak(db, habit_id: int) -> int:
+    """Get current streak for a habit from the persisted streak state"""
+    return get_current_streak(db, habit_id)
+
+
+def get_active_multiplier(db, effect_type: str, user_id: int = DEFAULT_USER_ID) -> float:
+    """Product of a user's unexpired effects of one type"""
+    return get_active_multipliers(db, user_id).get(effect_type, 1.0)
+
+
+# ============ UNIT OF WORK ============
+
+class Progress:
+    """
+    Reward changes for one user, applied in memory and committed once.
+    Achievement events raised along the way (including level ups and the
+    unlocks themselves) are evaluated in the same transaction. `day` is the
+    day the action counts for (a backdated completion), by default today.
+    """
+
+    def __init__(self, db, user_id: int = DEFAULT_USER_ID, day: Optional[date] = None):
+        self.db = db
+        self.user_id = user_id
+        self.day = day
+        self.unlocked: List[AchievementDef] = []
+        self._stats: Optional[UserStats] = None
+        self._pipeline: Optional[RewardPipeline] = None
+        self._starting_level: Optional[int] = None
+        self._events: List[Tuple[str, Dict[str, Any]]] = []
+
+    @property
+    def stats(self) -> UserStats:
+        """The user's stats row, locked for the rest of the transaction"""
+        if self._stats is None:
+            self._stats = self._locked_stats() or self._create_stats()
+            self._starting_level = self._stats.level
+        return self._stats
+
+    def _locked_stats(self) -> Optional[UserStats]:
+        return self.db.query(UserStats).filter(
+            UserStats.user_id == self.user_id
+        ).with_for_update().one_or_none()
+
+    def _create_stats(self) -> UserStats:
+        """First action of a new user: create the stats row inside this unit of work"""
+        try:
+            # The unique user_id index settles races between sessions
+            with self.db.begin_nested():
+                stats = UserStats(user_id=self.user_id)
+                self.db.add(stats)
+            return stats
+        except IntegrityError:
+            return self._locked_stats()
+
+    @property
+    def pipeline(self) -> RewardPipeline:
+        if self._pipeline is None:
+            self._pipeline = get_reward_pipeline(self.db, self.user_id)
+        return self._pipeline
+
+    @property
+    def leveled_up(self) -> bool:
+        return self._stats is not None and self._stats.level > self._starting_level
+
+    def grant(self, xp: int = 0, gold: int = 0, stat_gains: Optional[Dict[str, int]] = None,
+              day: Optional[date] = None, modifier: Optional[RewardModifier] = None,
+              achievement: bool = False, **rollup_counters: int) -> Tuple[int, int]:
+        """
+        Apply XP and gold (after the modifier's multipliers, by default the
+        user's global ones) and stat gains in memory, and add them to the day's
+        rollup. Achievement rewards are also booked as achievement_xp so they
+        do not count toward the daily XP achievements. Returns (final_xp, final_gold).
+        """
+        stats = self.stats
+        final_xp, final_gold = (modifier or self.pipeline.base).scale(xp, gold)
+        day = day or self.day
+        if achievement:
+            rollup_counters["achievement_xp"] = final_xp
+
+        if final_xp:
+            stats.current_xp += final_xp
+            stats.total_xp += final_xp
+            level, current_in_level, needed = calculate_level_from_xp(stats.total_xp)
+            if level > stats.level:
+                stats.level = level
+                stats.current_xp = current_in_level
+                stats.last_level_up = datetime.now()
+                self._events.append((EVENT_LEVEL_UP, {"level": level}))
+        if final_gold:
+            stats.current_gold += final_gold
+            stats.lifetime_gold += final_gold
+        for stat_name, amount in (stat_gains or {}).items():
+            setattr(stats, stat_name, (getattr(stats, stat_name, 0) or 0) + amount)
+
+        record_rollup(
+            self.db, day, user_id=self.user_id, xp_earned=final_xp, gold_earned=final_gold,
+            **{f"{stat_name}_gain": amount for stat_name, amount in (stat_gains or {}).items()},
+            **rollup_counters
+        )
+        return final_xp, final_gold
+
+    def emit(self, event: Optional[str] = None, **payload):
+        """Evaluate an event plus everything queued, paying out unlocks as they happen"""
+        if event is not None:
+            self._events.append((event, payload))
+        while self._events:
+            event, payload = self._events.pop(0)
+            if self.day is not None:
+                payload.setdefault("today", self.day)
+            day = payload.get("today")
+            self.db.flush()
+            unlocked = ACHIEVEMENT_ENGINE.dispatch(self.db, event, user_id=self.user_id, **payload)
+            if not unlocked:
+                continue
+            for achievement in unlocked:
+                stat_gains = (
+                    {achievement.stat_bonus.stat: achievement.stat_bonus.amount}
+                    if achievement.stat_bonus else None
+                )
+                self.grant(
+                    xp=achievement.xp_reward, gold=achievement.gold_reward, stat_gains=stat_gains,
+                    day=day, achievement=True
+                )
+            self.unlocked += unlocked
+            # Rewards and unlock counts may satisfy further achievements
+            self._events.append((EVENT_ACHIEVEMENT_UNLOCKED, {"today": day} if day else {}))
+
+    def commit(self):
+        """Evaluate pending events and commit everything in one transaction"""
+        self.emit()
+        self.db.commit()
+
+
+# ============ SERVICES ============
+
+def complete_habit(db, habit: Habit, day: Optional[date] = None) -> HabitCompletion:
+    """
+    Complete a habit for a day: record the completion, advance the streak,
+    award XP, gold and the category stat, evaluate achievements - one commit.
+    Idempotent on (habit, day): repeats, double clicks and racing tabs get
+    created=False and no rewards.
+    """
+    day = day or date.today()
+    if db.query(Completion.id).filter(Completion.habit_id == habit.id, Completion.date == day).first():
+        return HabitCompletion(created=False)
+    try:
+        # The unique (habit_id, date) index settles races between sessions
+        with db.begin_nested():
+            db.add(Completion(user_id=habit.user_id, habit_id=habit.id, date=day, completed=True))
+    except IntegrityError:
+        return HabitCompletion(created=False)
+
+    streak = record_completion(db, habit.id, day).current_streak
+    stat = get_stat_for_category(habit.category)
+
+    progress = Progress(db, habit.user_id, day)
+    modifier = progress.pipeline.modifier(habit.category, habit.difficulty)
+    chain = 0
+    if modifier.chain_per_completion:
+        chain = db.query(DailyRollup.completions).filter(
+            DailyRollup.user_id == habit.user_id,
+            DailyRollup.date == day
+        ).scalar() or 0
+    roll = modifier.apply(
+        int(get_habit_xp(habit.difficulty) * calculate_streak_bonus(streak)),
+        calculate_gold_reward(habit.difficulty, is_habit=True),
+        chain=chain,
+    )
+    xp, gold = progress.grant(
+        xp=roll.xp,
+        gold=roll.gold,
+        stat_gains={stat: 1},
+        day=day,
+        modifier=UNMODIFIED,
+        completions=1,
+    )
+    progress.emit(EVENT_HABIT_COMPLETED, habit=habit, streak=streak, today=day)
+    progress.commit()
+
+    return HabitCompletion(
+        created=True, xp=xp, gold=gold, stat=stat, streak=streak,
+        level=progress.stats.level, leveled_up=progress.leveled_up,
+        critical=roll.critical, doubled=roll.doubled, unlocked=progress.unlocked,
+    )
+
+
+def complete_goal(db, goal: Goal, day: Optional[date] = None) -> GoalCompletion:
+    """
+    Complete a goal: mark it done, award its XP and gold, count it in the
+    day's rollup and evaluate achievements - one commit. The guarded UPDATE
+    makes it idempotent: a goal completed already (another tab, a double
+    click) gets created=False and no rewards.
+    """
+    from_progress = goal.progress or 0
+    completed = db.query(Goal).filter(
+        Goal.id == goal.id,
+        Goal.completed == False
+    ).update({Goal.completed: True, Goal.progress: 100}, synchronize_session="fetch")
+    if not completed:
+        db.commit()
+        return GoalCompletion(created=False)
+
+    progress = Progress(db, goal.user_id, day)
+    xp, gold = progress.grant(
+        xp=get_goal_xp(goal.difficulty),
+        gold=calculate_gold_reward(goal.difficulty, is_habit=False),
+        day=day,
+        goals_completed=1,
+    )
+    progress.emit(EVENT_GOAL_COMPLETED, goal=goal, from_progress=from_progress)
+    progress.commit()
+
+    return GoalCompletion(
+        created=True, xp=xp, gold=gold, level=progress.stats.level,
+        leveled_up=progress.leveled_up, unlocked=progress.unlocked,
+    )
+
+
+def award_xp(db, amount: int, source: str = "habit", user_id: int = DEFAULT_USER_ID) -> XPAward:
+    """Award XP to a user, handle level ups and commit"""
+    progress = Progress(db, user_id)
+    final_xp, _ = progress.grant(xp=amount)
+    progress.commit()
+    return XPAward(
+        amount=final_xp, level=progress.stats.level,
+        leveled_up=progress.leveled_up, unlocked=progress.unlocked
+    )
+
+
+def award_gold(db, amount: int, user_id: int = DEFAULT_USER_ID) -> int:
+    """Award gold to a user and commit. Returns the gold after multipliers."""
+    progress = Progress(db, user_id)
+    _, final_gold = progress.grant(gold=amount)
+    progress.commit()
+    return final_gold
+
+
+def update_stat(db, stat_name: str, amount: int = 1, user_id: int = DEFAULT_USER_ID):
+    """Update a specific stat and commit"""
+    progress = Progress(db, user_id)
+    progress.grant(stat_gains={stat_name: amount})
+    progress.commit()
+
+
+def emit_event(db, event: str, user_id: int = DEFAULT_USER_ID, **payload) -> List[AchievementDef]:
+    """
+    Dispatch a gameplay event, persist its progress and pay out any achievements
+    it unlocks - one commit, which also carries the session's pending changes
+    (the new habit, goal or note that raised the event). Returns every
+    achievement unlocked, including those unlocked in turn by the rewards.
+    """
+    progress = Progress(db, user_id)
+    progress.emit(event, **payload)
+    progress.commit()
+    return progress.unlocked
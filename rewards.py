@@ -0,0 +1,238 @@
+"""
+Goal Quest Reward Pipeline - Shop effects compiled into reward modifiers
+A user's active effects and owned equipment/abilities are folded once into a
+RewardModifier per (category, difficulty): plain multipliers and chances, so
+applying every effect to a completion is a dict lookup plus a few multiplies.
+Pipelines are cached per user in effects.py and rebuilt only when inventory or
+effects change.
+
+Effect types that do not shape XP or gold are collected as passives for the
+systems that consult them: streak shields in streaks.py, temporary stat boosts
+in stat_boosts().
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from gameplay import CATEGORY_COLORS, DIFFICULTY_NAMES, STAT_METADATA
+from shop_items import Effect, ShopItem, SHOP_ITEMS_BY_ID
+
+
+# Shop effects name difficulties; habits store 1-3
+EFFECT_DIFFICULTIES = {"easy": 1, "medium": 2, "hard": 3, "challenging": 3}
+
+# Owned items of these shop categories are always in effect
+ALWAYS_ON_CATEGORIES = ("equipment", "ability")
+
+
+@dataclass(frozen=True)
+class RewardRoll:
+    xp: int
+    gold: int
+    critical: bool = False
+    doubled: bool = False
+
+
+@dataclass(frozen=True)
+class RewardModifier:
+    """Every reward effect for one (category, difficulty), folded into constants"""
+    xp_multiplier: float = 1.0
+    gold_multiplier: float = 1.0
+    critical_chance: float = 0.0
+    critical_multiplier: float = 1.0
+    double_chance: float = 0.0
+    chain_per_completion: float = 0.0
+    chain_max: float = 0.0
+
+    def scale(self, xp: int, gold: int) -> Tuple[int, int]:
+        """Multipliers only - for rewards that are not completions"""
+        return int(xp * self.xp_multiplier), int(gold * self.gold_multiplier)
+
+    def apply(self, xp: int, gold: int, chain: int = 0, rng=random) -> RewardRoll:
+        """
+        Full completion reward: multipliers, the chain bonus for `chain` earlier
+        completions today, and the critical and double-count rolls.
+        """
+        xp_multiplier = self.xp_multiplier
+        if self.chain_per_completion:
+            xp_multiplier *= 1 + min(self.chain_per_completion * chain, self.chain_max)
+        critical = self.critical_chance > 0 and rng.random() < self.critical_chance
+        if critical:
+            xp_multiplier *= self.critical_multiplier
+        doubled = self.double_chance > 0 and rng.random() < self.double_chance
+        repeat = 2 if doubled else 1
+        return RewardRoll(
+            xp=int(xp * xp_multiplier) * repeat,
+            gold=int(gold * self.gold_multiplier) * repeat,
+            critical=critical,
+            doubled=doubled,
+        )
+
+
+UNMODIFIED = RewardModifier()
+
+
+# ============ EFFECT HANDLERS ============
+
+@dataclass
+class _Factors:
+    """Effects accumulated before compiling"""
+    xp: float = 1.0
+    gold: float = 1.0
+    category_xp: Dict[str, float] = field(default_factory=dict)
+    difficulty_xp: Dict[int, float] = field(default_factory=dict)
+    habit_xp: float = 1.0  # Habits only; goals have no difficulty to reduce
+    critical_miss: float = 1.0  # Probability no critical source fires
+    critical_multiplier: float = 1.0
+    double_miss: float = 1.0
+    chain_per_completion: float = 0.0
+    chain_max: float = 0.0
+
+
+EFFECT_HANDLERS: Dict[str, Callable[[_Factors, Effect], None]] = {}
+
+
+def handles(*effect_types: str):
+    """Register how an effect type folds into the reward factors"""
+    def register(fn):
+        for effect_type in effect_types:
+            EFFECT_HANDLERS[effect_type] = fn
+        return fn
+    return register
+
+
+@handles("xp_multiplier")
+def _xp_multiplier(factors: _Factors, effect: Effect):
+    factors.xp *= effect.value or 1.0
+
+
+@handles("gold_multiplier", "gold_multiplier_perm")
+def _gold_multiplier(factors: _Factors, effect: Effect):
+    factors.gold *= effect.value or 1.0
+
+
+@handles("all_multiplier")
+def _all_multiplier(factors: _Factors, effect: Effect):
+    factors.xp *= effect.xp or effect.value or 1.0
+    factors.gold *= effect.gold_mult or effect.value or 1.0
+
+
+@handles("category_xp_boost")
+def _category_xp_boost(factors: _Factors, effect: Effect):
+    category = (effect.category or "").lower()
+    factors.category_xp[category] = factors.category_xp.get(category, 1.0) * (effect.value or 1.0)
+
+
+@handles("difficulty_xp_boost")
+def _difficulty_xp_boost(factors: _Factors, effect: Effect):
+    difficulty = EFFECT_DIFFICULTIES.get((effect.difficulty or "").lower())
+    if difficulty is not None:
+        factors.difficulty_xp[difficulty] = factors.difficulty_xp.get(difficulty, 1.0) * (effect.value or 1.0)
+
+
+@handles("difficulty_reduction")
+def _difficulty_reduction(factors: _Factors, effect: Effect):
+    # A habit made 5% easier pays the same XP for 5% less effort
+    factors.habit_xp /= 1 - min(effect.value or 0.0, 0.5)
+
+
+@handles("critical_chance")
+def _critical_chance(factors: _Factors, effect: Effect):
+    factors.critical_miss *= 1 - (effect.chance or effect.value or 0.0)
+    factors.critical_multiplier = max(factors.critical_multiplier, effect.multiplier or 1.0)
+
+
+@handles("habit_double_chance")
+def _habit_double_chance(factors: _Factors, effect: Effect):
+    factors.double_miss *= 1 - (effect.chance or effect.value or 0.0)
+
+
+@handles("chain_bonus")
+def _chain_bonus(factors: _Factors, effect: Effect):
+    factors.chain_per_completion += effect.per_habit or effect.value or 0.0
+    factors.chain_max = max(factors.chain_max, effect.max_bonus or 0.0)
+
+
+# ============ PIPELINE ============
+
+class RewardPipeline:
+    """A user's effects compiled into one RewardModifier per (category, difficulty)"""
+
+    def __init__(self, effects: Iterable[Effect]):
+        self.factors = _Factors()
+        self.passives: Dict[str, List[Effect]] = {}
+        for effect in effects:
+            handler = EFFECT_HANDLERS.get(effect.type)
+            if handler is not None:
+                handler(self.factors, effect)
+            else:
+                self.passives.setdefault(effect.type, []).append(effect)
+
+        self.base = self._compile(None, None)
+        self._modifiers: Dict[Tuple[Optional[str], Optional[int]], RewardModifier] = {(None, None): self.base}
+        for category in CATEGORY_COLORS:
+            for difficulty in DIFFICULTY_NAMES:
+                self._modifiers[(category, difficulty)] = self._compile(category, difficulty)
+
+    def _compile(self, category: Optional[str], difficulty: Optional[int]) -> RewardModifier:
+        factors = self.factors
+        return RewardModifier(
+            xp_multiplier=(
+                factors.xp
+                * factors.category_xp.get(category, 1.0)
+                * factors.difficulty_xp.get(difficulty, 1.0)
+                * (factors.habit_xp if difficulty is not None else 1.0)
+            ),
+            gold_multiplier=factors.gold,
+            critical_chance=1 - factors.critical_miss,
+            critical_multiplier=factors.critical_multiplier,
+            double_chance=1 - factors.double_miss,
+            chain_per_completion=factors.chain_per_completion,
+            chain_max=factors.chain_max,
+        )
+
+    def modifier(self, category: Optional[str] = None, difficulty: Optional[int] = None) -> RewardModifier:
+        """The modifier for a habit or goal; unknown categories are compiled on first use"""
+        key = (category.lower() if category else None, difficulty)
+        modifier = self._modifiers.get(key)
+        if modifier is None:
+            modifier = self._modifiers[key] = self._compile(*key)
+        return modifier
+
+    def has(self, effect_type: str) -> bool:
+        """Whether a passive effect (e.g. streak_immunity) is in force"""
+        return effect_type in self.passives
+
+    def stat_boosts(self) -> Dict[str, int]:
+        """Stat -> temporary bonus from stat_boost_temp effects, on top of the stored stats"""
+        boosts: Dict[str, int] = {}
+        for effect in self.passives.get("stat_boost_temp", ()):
+            stats = STAT_METADATA if effect.stats in (None, "all") else [effect.stats]
+            for stat in stats:
+                boosts[stat] = boosts.get(stat, 0) + int(effect.value or 0)
+        return boosts
+
+
+def always_on_items(item_ids: Iterable[str]) -> List[ShopItem]:
+    """Owned equipment and abilities in effect - the best (priciest) item per equipment slot"""
+    by_slot: Dict[str, ShopItem] = {}
+    items: List[ShopItem] = []
+    for item_id in set(item_ids):
+        item = SHOP_ITEMS_BY_ID.get(item_id)
+        if item is None or item.effect is None or item.category not in ALWAYS_ON_CATEGORIES:
+            continue
+        if item.slot is None:
+            items.append(item)
+        elif item.slot not in by_slot or item.price.gold > by_slot[item.slot].price.gold:
+            by_slot[item.slot] = item
+    return items + list(by_slot.values())
+
+
+def timed_effect(effect_type: str, value: Optional[float], item_id: Optional[str] = None) -> Effect:
+    """An ActiveEffect row as an Effect, keeping its source item's extra fields"""
+    item = SHOP_ITEMS_BY_ID.get(item_id) if item_id else None
+    if item is not None and item.effect is not None and item.effect.type == effect_type:
+        source = item.effect
+        return Effect(**{**source.__dict__, "value": value if value is not None else source.value})
+    return Effect(type=effect_type, value=value)
@@ -0,0 +1,136 @@
+"""
+Goal Quest Daily Rollups - Materialized per-day completions, XP, gold and stats
+Award paths increment today's row inside their own transaction, so long-range
+charts and daily achievements read one row per day instead of raw history.
+
+Backfill from history:
+    python rollups.py backfill [--replace]
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, DailyRollup, Completion, Habit, DEFAULT_USER_ID, init_db
+from gameplay import get_habit_xp, calculate_gold_reward, get_stat_for_category, STAT_METADATA
+
+
+# Columns that record_rollup() may increment
+ROLLUP_COUNTERS = (
+    ["completions", "goals_completed", "xp_earned", "achievement_xp", "gold_earned"]
+    + [f"{stat}_gain" for stat in STAT_METADATA]
+)
+
+
+def record_rollup(db, day: Optional[date] = None, user_id: int = DEFAULT_USER_ID, **increments: int):
+    """
+    Atomically add increments to a day's rollup row, creating it if needed.
+    Runs in the caller's transaction and does not commit.
+    Example: record_rollup(db, xp_earned=150, completions=1)
+    """
+    increments = {name: amount for name, amount in increments.items() if amount}
+    if not increments:
+        return
+    unknown = set(increments) - set(ROLLUP_COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown rollup counters: {sorted(unknown)}")
+    day = day or date.today()
+    
+    db.flush()
+    if _increment(db, day, user_id, increments):
+        return
+    try:
+        with db.begin_nested():
+            db.add(DailyRollup(user_id=user_id, date=day, **increments))
+    except IntegrityError:
+        # Another session created the row first
+        _increment(db, day, user_id, increments)
+
+
+def _increment(db, day: date, user_id: int, increments: Dict[str, int]) -> bool:
+    """UPDATE ... SET col = col + n for an existing row. Returns True if a row matched."""
+    values = {getattr(DailyRollup, name): getattr(DailyRollup, name) + amount for name, amount in increments.items()}
+    updated = db.query(DailyRollup).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.date == day
+    ).update(values, synchronize_session=False)
+    return updated > 0
+
+
+def get_rollup(db, day: Optional[date] = None, user_id: int = DEFAULT_USER_ID) -> Optional[DailyRollup]:
+    """Get a single day's rollup row"""
+    return db.query(DailyRollup).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.date == (day or date.today())
+    ).first()
+
+
+def get_daily_xp(db, day: Optional[date] = None, user_id: int = DEFAULT_USER_ID) -> int:
+    """XP earned on a day from habits and goals - achievement rewards are left out"""
+    rollup = get_rollup(db, day, user_id)
+    return (rollup.xp_earned or 0) - (rollup.achievement_xp or 0) if rollup else 0
+
+
+# ============ BACKFILL ============
+
+def backfill_daily_rollups(db, user_id: int = DEFAULT_USER_ID, replace: bool = False) -> int:
+    """
+    Rebuild rollups from the completion log and commit. Returns rows written.
+    Historical multipliers were never stored, so XP and gold are estimated
+    from base rewards. Days that already have a row are kept unless replace=True.
+    Goals have no completion date and are not backfilled.
+    """
+    rows = db.query(
+        Completion.date, Habit.difficulty, Habit.category, func.count(Completion.id)
+    ).join(
+        Habit, Habit.id == Completion.habit_id
+    ).filter(
+        Completion.user_id == user_id,
+        Completion.completed == True
+    ).group_by(Completion.date, Habit.difficulty, Habit.category).all()
+    
+    days = defaultdict(lambda: defaultdict(int))
+    for day, difficulty, category, count in rows:
+        totals = days[day]
+        totals["completions"] += count
+        totals["xp_earned"] += get_habit_xp(difficulty) * count
+        totals["gold_earned"] += calculate_gold_reward(difficulty, is_habit=True) * count
+        totals[f"{get_stat_for_category(category or 'personal')}_gain"] += count
+    
+    existing = db.query(DailyRollup).filter(DailyRollup.user_id == user_id)
+    if replace:
+        existing.delete(synchronize_session=False)
+    else:
+        kept = {rollup.date for rollup in existing.with_entities(DailyRollup.date)}
+        days = {day: totals for day, totals in days.items() if day not in kept}
+    
+    db.bulk_insert_mappings(DailyRollup, [
+        {"user_id": user_id, "date": day, **totals} for day, totals in sorted(days.items())
+    ])
+    db.commit()
+    return len(days)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal Quest daily rollup maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser("backfill", help="Rebuild daily rollups from completion history")
+    backfill.add_argument("--replace", action="store_true", help="Overwrite days that already have a rollup")
+    backfill.add_argument("--user-id", type=int, default=DEFAULT_USER_ID)
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        written = backfill_daily_rollups(db, user_id=args.user_id, replace=args.replace)
+        print(f"Wrote {written} daily rollups")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@ Goal Quest Shop Items System - All 50+ items
 Exact replication of the Replit shopItems.ts
 """
 
-from typing import Dict, List, Optional, Any
+from bisect import bisect_right
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 
 
@@ -514,35 +515,105 @@ ALL_SHOP_ITEMS: List[ShopItem] = [
 SHOP_ITEMS_BY_ID: Dict[str, ShopItem] = {item.id: item for item in ALL_SHOP_ITEMS}
 
 
+class ShopCatalog:
+    """
+    Shop items indexed once: category/rarity/slot buckets, plus items sorted by
+    gold price and by required level so affordability and unlock queries are a
+    bisect. Results keep catalog order.
+    """
+
+    def __init__(self, items: List[ShopItem]):
+        self.items = list(items)
+        self.by_id: Dict[str, ShopItem] = {item.id: item for item in self.items}
+        self._position = {item.id: i for i, item in enumerate(self.items)}
+
+        self.by_category: Dict[str, List[ShopItem]] = {}
+        self.by_rarity: Dict[str, List[ShopItem]] = {}
+        self.by_slot: Dict[str, List[ShopItem]] = {}
+        for item in self.items:
+            self.by_category.setdefault(item.category, []).append(item)
+            self.by_rarity.setdefault(item.rarity, []).append(item)
+            if item.slot:
+                self.by_slot.setdefault(item.slot, []).append(item)
+
+        self._by_price = sorted(self.items, key=lambda item: item.price.gold)
+        self._prices = [item.price.gold for item in self._by_price]
+        self._by_level = sorted(self.items, key=lambda item: item.level_required or 0)
+        self._levels = [item.level_required or 0 for item in self._by_level]
+
+    def get(self, item_id: str) -> Optional[ShopItem]:
+        return self.by_id.get(item_id)
+
+    def affordable(self, gold: int, crystals: int = 0) -> List[ShopItem]:
+        """Items priced within gold and crystals"""
+        return self.query(max_gold=gold, max_crystals=crystals)
+
+    def unlocked_at(self, level: int) -> List[ShopItem]:
+        """Items available at a level"""
+        return self.query(level=level)
+
+    def query(self, category: Optional[str] = None, rarity: Optional[str] = None,
+              slot: Optional[str] = None, max_gold: Optional[int] = None,
+              max_crystals: Optional[int] = None, level: Optional[int] = None) -> List[ShopItem]:
+        """
+        Items matching every given filter. Starts from the smallest candidate
+        set (a bucket or a bisected prefix) and checks the rest per item.
+        """
+        candidates: List[Tuple[List[ShopItem], bool]] = []  # (items, in catalog order)
+        if category is not None:
+            candidates.append((self.by_category.get(category, []), True))
+        if rarity is not None:
+            candidates.append((self.by_rarity.get(rarity, []), True))
+        if slot is not None:
+            candidates.append((self.by_slot.get(slot, []), True))
+        if max_gold is not None:
+            candidates.append((self._by_price[:bisect_right(self._prices, max_gold)], False))
+        if level is not None:
+            candidates.append((self._by_level[:bisect_right(self._levels, level)], False))
+        if not candidates:
+            return list(self.items)
+
+        items, ordered = min(candidates, key=lambda candidate: len(candidate[0]))
+        matches = [
+            item for item in items
+            if (category is None or item.category == category)
+            and (rarity is None or item.rarity == rarity)
+            and (slot is None or item.slot == slot)
+            and (max_gold is None or item.price.gold <= max_gold)
+            and (max_crystals is None or item.price.crystals <= max_crystals)
+            and (level is None or (item.level_required or 0) <= level)
+        ]
+        if not ordered:
+            matches.sort(key=lambda item: self._position[item.id])
+        return matches
+
+
+SHOP_CATALOG = ShopCatalog(ALL_SHOP_ITEMS)
+
+
 def get_item_by_id(item_id: str) -> Optional[ShopItem]:
     """Get shop item by ID"""
-    return SHOP_ITEMS_BY_ID.get(item_id)
+    return SHOP_CATALOG.get(item_id)
 
 
 def get_items_by_category(category: str) -> List[ShopItem]:
     """Get all items in a category"""
-    return [item for item in ALL_SHOP_ITEMS if item.category == category]
+    return SHOP_CATALOG.query(category=category)
 
 
 def get_items_by_rarity(rarity: str) -> List[ShopItem]:
     """Get all items of a rarity"""
-    return [item for item in ALL_SHOP_ITEMS if item.rarity == rarity]
+    return SHOP_CATALOG.query(rarity=rarity)
 
 
 def get_affordable_items(gold: int, crystals: int = 0) -> List[ShopItem]:
     """Get items the user can afford"""
-    return [
-        item for item in ALL_SHOP_ITEMS
-        if item.price.gold <= gold and item.price.crystals <= crystals
-    ]
+    return SHOP_CATALOG.affordable(gold, crystals)
 
 
 def get_items_for_level(level: int) -> List[ShopItem]:
     """Get items available at a given level"""
-    return [
-        item for item in ALL_SHOP_ITEMS
-        if item.level_required is None or item.level_required <= level
-    ]
+    return SHOP_CATALOG.unlocked_at(level)
 
 
 # Shop categories for display
@@ -0,0 +1,181 @@
+"""
+Goal Quest Streak Engine - Persisted per-habit streak state
+Streaks advance in O(1) when a habit is completed and are repaired lazily
+after a day rollover, so reading a streak never scans the completions table.
+
+A lapse is first offered to the user's streak protection (protect_streak):
+streak immunity, the weekly automatic shield, then streak shield charges.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from database import ActiveEffect, Completion, Habit, HabitStreak
+from effects import get_reward_pipeline, spend_charges
+
+
+# Marker effect while the weekly automatic shield recharges
+SHIELD_COOLDOWN = "auto_streak_shield_cooldown"
+SHIELD_COOLDOWN_DAYS = 7
+
+
+# ============ READS ============
+
+def is_streak_active(state: HabitStreak, today: Optional[date] = None) -> bool:
+    """A streak stays alive while the last completion was today or yesterday"""
+    if state is None or state.last_completed_date is None:
+        return False
+    today = today or date.today()
+    return state.last_completed_date >= today - timedelta(days=1)
+
+
+def current_streak(state: HabitStreak, today: Optional[date] = None) -> int:
+    """Get the live streak value for a streak row without touching the database"""
+    if not is_streak_active(state, today):
+        return 0
+    return state.current_streak or 0
+
+
+def get_streak_states(db, habit_ids: Iterable[int], today: Optional[date] = None) -> Dict[int, HabitStreak]:
+    """
+    Load streak rows for several habits in one query.
+    Missing rows are rebuilt from history once; broken streaks are protected
+    or reset to 0 the first time they are read after the day they lapsed.
+    """
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return {}
+    today = today or date.today()
+    
+    states = {
+        state.habit_id: state
+        for state in db.query(HabitStreak).filter(HabitStreak.habit_id.in_(habit_ids)).all()
+    }
+    
+    changed = False
+    for habit_id in habit_ids:
+        if habit_id not in states:
+            states[habit_id] = rebuild_streak(db, habit_id)
+            changed = True
+        elif protect_streak(db, states[habit_id], today) or repair_streak(states[habit_id], today):
+            changed = True
+    
+    if changed:
+        db.commit()
+    return states
+
+
+def get_streak_state(db, habit_id: int, today: Optional[date] = None) -> HabitStreak:
+    """Get the streak row for a single habit"""
+    return get_streak_states(db, [habit_id], today)[habit_id]
+
+
+def get_current_streak(db, habit_id: int, today: Optional[date] = None) -> int:
+    """Get the current streak for a habit"""
+    return current_streak(get_streak_state(db, habit_id, today), today)
+
+
+# ============ WRITES ============
+
+def repair_streak(state: HabitStreak, today: Optional[date] = None) -> bool:
+    """Zero out a lapsed streak. Returns True if the row changed."""
+    if state.current_streak and not is_streak_active(state, today):
+        state.current_streak = 0
+        return True
+    return False
+
+
+def record_completion(db, habit_id: int, completed_on: Optional[date] = None) -> HabitStreak:
+    """
+    Advance a habit's streak for a new completion.
+    Does not commit - the caller commits together with the Completion row.
+    """
+    completed_on = completed_on or date.today()
+    state = db.get(HabitStreak, habit_id)
+    if state is None:
+        state = rebuild_streak(db, habit_id)
+    
+    last = state.last_completed_date
+    if last is not None and completed_on <= last:
+        if completed_on < last:
+            # Backdated completion - the run boundaries may have moved
+            db.flush()
+            return rebuild_streak(db, habit_id)
+        return state  # Already counted today
+    
+    if last == completed_on - timedelta(days=1) or protect_streak(db, state, completed_on):
+        state.current_streak = (state.current_streak or 0) + 1
+    else:
+        state.current_streak = 1
+    state.longest_streak = max(state.longest_streak or 0, state.current_streak)
+    state.last_completed_date = completed_on
+    return state
+
+
+def protect_streak(db, state: HabitStreak, day: date) -> bool:
+    """
+    Keep a lapsed streak alive through the days missed before `day`: free with
+    streak immunity, otherwise one shield per missed day, the weekly automatic
+    shield first. On success the streak continues as if completed yesterday;
+    returns False (spending nothing) if the user cannot cover every day.
+    Does not commit.
+    """
+    if not state.current_streak or state.last_completed_date is None:
+        return False
+    missed = (day - state.last_completed_date).days - 1
+    if missed < 1:
+        return False
+
+    pipeline = get_reward_pipeline(db, state.user_id)
+    if not pipeline.has("streak_immunity"):
+        auto_shield = pipeline.has("auto_streak_shield") and not db.query(ActiveEffect.id).filter(
+            ActiveEffect.user_id == state.user_id,
+            ActiveEffect.effect_type == SHIELD_COOLDOWN,
+            ActiveEffect.expires_at > datetime.now()
+        ).first()
+        if not spend_charges(db, "streak_protection", missed - int(auto_shield), state.user_id):
+            return False
+        if auto_shield:
+            db.add(ActiveEffect(
+                user_id=state.user_id,
+                effect_type=SHIELD_COOLDOWN,
+                value=1.0,
+                expires_at=datetime.now() + timedelta(days=SHIELD_COOLDOWN_DAYS),
+            ))
+    state.last_completed_date = day - timedelta(days=1)
+    return True
+
+
+def rebuild_streak(db, habit_id: int) -> HabitStreak:
+    """Recompute a habit's streak row from its full completion history"""
+    dates = [
+        row.date for row in db.query(Completion.date).filter(
+            Completion.habit_id == habit_id,
+            Completion.completed == True
+        ).order_by(Completion.date).all()
+    ]
+    run, longest = _runs(dates)
+    
+    state = db.get(HabitStreak, habit_id)
+    if state is None:
+        owner = db.query(Habit.user_id).filter(Habit.id == habit_id).scalar()
+        state = HabitStreak(habit_id=habit_id, user_id=owner)
+        db.add(state)
+    state.current_streak = run
+    state.longest_streak = longest
+    state.last_completed_date = dates[-1] if dates else None
+    return state
+
+
+def _runs(dates: List[date]):
+    """Return (run ending at the last date, longest run) for sorted unique dates"""
+    run = longest = 0
+    previous = None
+    for day in dates:
+        if previous is not None and day == previous + timedelta(days=1):
+            run += 1
+        elif day != previous:
+            run = 1
+        longest = max(longest, run)
+        previous = day
+    return run, longest
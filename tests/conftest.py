@@ -0,0 +1,49 @@
+"""
+Shared fixtures: every test run gets its own SQLite database, upload and
+vector directories, set before the app modules read their configuration.
+Each test works as a freshly created user, so tests do not see each other's rows.
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+
+_ROOT = tempfile.mkdtemp(prefix="goal-quest-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_ROOT, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_ROOT, "uploads")
+os.environ["VECTOR_DIR"] = os.path.join(_ROOT, "vectors")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database import Habit, SessionLocal, create_user, init_db
+
+_usernames = itertools.count(1)
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def user_id(db):
+    user = create_user(db, f"tester{next(_usernames)}")
+    return user.id
+
+
+@pytest.fixture
+def make_habit(db, user_id):
+    def make(name="Read", category="learning", difficulty=1, **columns):
+        habit = Habit(user_id=user_id, name=name, category=category, difficulty=difficulty, **columns)
+        db.add(habit)
+        db.commit()
+        return habit
+    return make
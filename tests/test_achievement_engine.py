@@ -0,0 +1,111 @@
+"""Achievement counters are seeded and advanced in the triggering transaction"""
+
+from datetime import date, datetime, timedelta
+
+from achievement_engine import ACHIEVEMENT_ENGINE, get_progress
+from achievements import (
+    ACHIEVEMENT_RULES, ACHIEVEMENTS_BY_KEY, ALL_ACHIEVEMENTS, APP_PAGE_COUNT, UNREACHABLE,
+    EVENT_HABIT_CREATED, EVENT_NOTE_CREATED, EVENT_PAGE_VIEWED
+)
+from database import AchievementProgress, Goal, Habit, SessionLocal
+from progression import complete_goal, complete_habit, emit_event
+
+
+def test_counters_survive_a_rolled_back_first_event(db, user_id, make_habit):
+    habit = make_habit()
+    ACHIEVEMENT_ENGINE.dispatch(db, EVENT_NOTE_CREATED, user_id=user_id)
+    db.rollback()
+    assert db.query(AchievementProgress).filter(AchievementProgress.user_id == user_id).count() == 0
+
+    result = complete_habit(db, habit)
+
+    assert [a.key for a in result.unlocked if a.key == "first_complete"] == ["first_complete"]
+    assert get_progress(db, ["complete_10"], user_id)["complete_10"][0] == 1
+
+
+def test_seeding_is_idempotent_across_sessions(db, user_id):
+    other = SessionLocal()
+    try:
+        ACHIEVEMENT_ENGINE.ensure_progress_rows(db, user_id)
+        db.flush()
+        db.commit()
+        # A second process that has not seen this user seeds again without a unique violation
+        ACHIEVEMENT_ENGINE._seeded_users.discard(user_id)
+        ACHIEVEMENT_ENGINE.ensure_progress_rows(other, user_id)
+        other.commit()
+    finally:
+        other.close()
+    rows = db.query(AchievementProgress).filter(AchievementProgress.user_id == user_id).count()
+    assert rows == len(ACHIEVEMENT_ENGINE.targets)
+
+
+def test_note_counter_moves_with_the_commit(db, user_id):
+    ACHIEVEMENT_ENGINE.dispatch(db, EVENT_NOTE_CREATED, user_id=user_id)
+    db.rollback()
+    ACHIEVEMENT_ENGINE.dispatch(db, EVENT_NOTE_CREATED, user_id=user_id)
+    db.commit()
+    assert get_progress(db, ["notes_10"], user_id)["notes_10"][0] == 1
+
+
+def test_event_commits_with_the_row_that_raised_it(db, user_id):
+    habit = Habit(user_id=user_id, name="Stretch")
+    db.add(habit)
+    unlocked = emit_event(db, EVENT_HABIT_CREATED, user_id=user_id, habit=habit)
+
+    assert [a.key for a in unlocked if a.key == "first_habit"] == ["first_habit"]
+    other = SessionLocal()
+    try:
+        assert other.query(Habit).filter(Habit.user_id == user_id).count() == 1
+        assert get_progress(other, ["first_habit"], user_id)["first_habit"][0] == 1
+    finally:
+        other.close()
+
+
+def test_every_achievement_has_a_rule_or_a_reason():
+    keys = {a.key for a in ALL_ACHIEVEMENTS}
+    assert keys == set(ACHIEVEMENT_RULES) | set(UNREACHABLE)
+    assert not set(ACHIEVEMENT_RULES) & set(UNREACHABLE)
+    assert ACHIEVEMENTS_BY_KEY["completionist"].target == 150
+    legend = ACHIEVEMENTS_BY_KEY["legend"]
+    assert legend.target == len(ACHIEVEMENT_RULES) - 2  # Not itself, nor enlightened which needs it
+    assert str(legend.target) in legend.description
+
+
+def test_goal_finished_from_zero_before_its_deadline(db, user_id):
+    goal = Goal(user_id=user_id, title="Run 10k", deadline=date.today() + timedelta(days=10))
+    db.add(goal)
+    db.commit()
+
+    unlocked = {a.key for a in complete_goal(db, goal).unlocked}
+
+    assert {"on_time_1", "early_bird_goal", "month_achiever", "full_progress"} <= unlocked
+    assert "long_term_1" not in unlocked
+
+
+def test_comeback_counts_a_streak_rebuilt_after_a_break(db, make_habit):
+    habit = make_habit()
+    today = date.today()
+    complete_habit(db, habit, today - timedelta(days=10))
+    complete_habit(db, habit, today - timedelta(days=2))
+    complete_habit(db, habit, today - timedelta(days=1))
+
+    assert "comeback_3" in {a.key for a in complete_habit(db, habit, today).unlocked}
+
+
+def test_perfect_week(db, make_habit):
+    habit = make_habit(created_at=datetime.now() - timedelta(days=7))
+    today = date.today()
+    for days_ago in range(6, 0, -1):
+        assert "perfect_week" not in {a.key for a in complete_habit(db, habit, today - timedelta(days=days_ago)).unlocked}
+
+    assert "perfect_week" in {a.key for a in complete_habit(db, habit, today).unlocked}
+
+
+def test_page_views(db, user_id):
+    pages = {"Dashboard"}
+    first = {a.key for a in emit_event(db, EVENT_PAGE_VIEWED, user_id=user_id, page="Dashboard", pages=pages)}
+    assert "first_login" in first and "explorer" not in first
+
+    pages = {f"Page {n}" for n in range(APP_PAGE_COUNT - 1)} | {"Analytics"}
+    last = {a.key for a in emit_event(db, EVENT_PAGE_VIEWED, user_id=user_id, page="Analytics", pages=pages)}
+    assert {"analytics_view", "explorer"} <= last
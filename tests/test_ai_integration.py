@@ -0,0 +1,147 @@
+"""LLMProvider retries, deadline and circuit breaker against a local stub HTTP server"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ai_integration
+from ai_integration import CircuitBreaker, LLMProvider
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers each POST with the next scripted (status, delay), then 200s"""
+
+    script = []
+    hits = 0
+
+    def do_POST(self):
+        StubHandler.hits += 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, delay = StubHandler.script.pop(0) if StubHandler.script else (200, 0)
+        time.sleep(delay)
+        body = json.dumps({"reply": "ok"} if status == 200 else {"error": status}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client timed out and hung up
+
+    def log_message(self, *args):
+        pass
+
+
+class StubProvider(LLMProvider):
+    name = "Stub"
+
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        super().__init__(breaker)
+        self.url = url
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def _create_client(self, api_key, base_url):
+        return None  # Requests go through urllib
+
+    def _send(self, prompt, system_prompt, timeout):
+        request = urllib.request.Request(self.url, data=json.dumps({"prompt": prompt}).encode(), method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.load(response)["reply"]
+        except urllib.error.HTTPError as e:
+            e.status_code = e.code
+            raise
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server():
+    StubHandler.script, StubHandler.hits = [], 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ai_integration, "backoff_delay", lambda attempt: 0.0)
+
+
+def test_server_errors_are_retried(server, monkeypatch):
+    monkeypatch.setattr(ai_integration, "LLM_MAX_RETRIES", 2)
+    provider = StubProvider(server, CircuitBreaker(failures=3, cooldown=60))
+    StubHandler.script = [(503, 0), (503, 0)]
+
+    assert provider.complete("hello") == "ok"
+    assert StubHandler.hits == 3
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(server, monkeypatch):
+    monkeypatch.setattr(ai_integration, "LLM_MAX_RETRIES", 2)
+    provider = StubProvider(server, CircuitBreaker(failures=3, cooldown=60))
+    StubHandler.script = [(400, 0)]
+
+    assert provider.complete("hello") is None
+    assert StubHandler.hits == 1
+
+
+def test_breaker_opens_then_half_open_trial_decides(server, monkeypatch):
+    monkeypatch.setattr(ai_integration, "LLM_MAX_RETRIES", 0)
+    clock = FakeClock()
+    provider = StubProvider(server, CircuitBreaker(failures=2, cooldown=60, clock=clock))
+    StubHandler.script = [(500, 0), (500, 0)]
+
+    assert provider.complete("hello") is None
+    assert provider.complete("hello") is None
+    assert provider.breaker.state == CircuitBreaker.OPEN
+
+    # Open: short-circuits without calling the server
+    assert provider.complete("hello") is None
+    assert StubHandler.hits == 2
+
+    # Half-open trial fails: open again for another cooldown
+    clock.now += 60
+    StubHandler.script = [(500, 0)]
+    assert provider.complete("hello") is None
+    assert StubHandler.hits == 3
+    assert provider.breaker.state == CircuitBreaker.OPEN
+    assert provider.complete("hello") is None
+    assert StubHandler.hits == 3
+
+    # Half-open trial succeeds: closed
+    clock.now += 60
+    assert provider.complete("hello") == "ok"
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+    assert StubHandler.hits == 4
+
+
+def test_retries_stop_at_the_call_deadline(server, monkeypatch):
+    monkeypatch.setattr(ai_integration, "LLM_MAX_RETRIES", 5)
+    monkeypatch.setattr(ai_integration, "LLM_CALL_DEADLINE", 0.5)
+    provider = StubProvider(server, CircuitBreaker(failures=10, cooldown=60))
+    StubHandler.script = [(200, 1.0)] * 6
+
+    started = time.monotonic()
+    assert provider.complete("hello") is None
+    assert time.monotonic() - started < 1.0
+    assert provider.breaker.failures == 1
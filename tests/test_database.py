@@ -0,0 +1,32 @@
+"""Engine settings from the environment"""
+
+import pytest
+from sqlalchemy import exc, text
+
+from database import make_engine
+
+# Counts forever unless interrupted
+ENDLESS = "WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r) SELECT count(*) FROM r"
+
+
+def test_sqlite_busy_timeout_is_its_own_setting(monkeypatch, tmp_path):
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "0")
+    monkeypatch.setenv("DB_SQLITE_BUSY_TIMEOUT", "12")
+    engine = make_engine(f"sqlite:///{tmp_path / 'busy.db'}")
+    try:
+        with engine.connect() as connection:
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 12000
+    finally:
+        engine.dispose()
+
+
+def test_sqlite_statement_timeout_interrupts_long_statements(monkeypatch, tmp_path):
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "100")
+    engine = make_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(exc.OperationalError, match="interrupted"):
+                connection.execute(text(ENDLESS))
+            assert connection.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        engine.dispose()
@@ -0,0 +1,80 @@
+"""Purchases debit gold atomically; using consumables applies their effect in the same commit as the spend"""
+
+import threading
+
+import pytest
+
+from database import ActiveEffect, InventoryItem, SessionLocal, UserStats, get_user_stats
+from inventory import get_quantity, purchase_item, use_item
+
+
+@pytest.fixture
+def holding(db, user_id):
+    def hold(item_id, quantity=1):
+        db.add(InventoryItem(user_id=user_id, item_id=item_id, quantity=quantity))
+        db.commit()
+    return hold
+
+
+def test_using_nothing_held_is_declined(db, user_id):
+    assert not use_item(db, "stat_boost_perm", user_id=user_id, stat="strength").ok
+
+
+def test_stat_potion_raises_the_chosen_stat(db, user_id, holding):
+    holding("stat_boost_perm")
+    with pytest.raises(ValueError):
+        use_item(db, "stat_boost_perm", user_id=user_id)
+
+    assert use_item(db, "stat_boost_perm", user_id=user_id, stat="agility").ok
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).one()
+    assert stats.agility == 5
+    assert get_quantity(db, "stat_boost_perm", user_id) == 0
+
+
+def test_scroll_completes_a_habit_once(db, user_id, holding, make_habit):
+    holding("instant_complete_habit", 2)
+    habit = make_habit()
+
+    result = use_item(db, "instant_complete_habit", user_id=user_id, habit=habit)
+    assert result.ok and result.completion.xp > 0
+    # Already done today: the second scroll is kept
+    assert not use_item(db, "instant_complete_habit", user_id=user_id, habit=habit).ok
+    assert get_quantity(db, "instant_complete_habit", user_id) == 1
+
+
+def test_shields_become_charges(db, user_id, holding):
+    holding("streak_shield_mega")
+    assert use_item(db, "streak_shield_mega", user_id=user_id).ok
+    charges = db.query(ActiveEffect.value).filter(
+        ActiveEffect.user_id == user_id, ActiveEffect.effect_type == "streak_protection"
+    ).scalar()
+    assert charges == 5
+
+
+def test_racing_purchases_cannot_overspend(db, user_id):
+    get_user_stats(db, user_id).current_gold = 1000  # Two 500 gold boosts
+    db.commit()
+    buyers = 6
+    start = threading.Barrier(buyers)
+    results = []
+
+    def buy():
+        session = SessionLocal()
+        try:
+            start.wait()
+            results.append(purchase_item(session, "xp_boost_1h", user_id=user_id))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=buy) for _ in range(buyers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == buyers
+    assert sum(result.ok for result in results) == 2
+    assert {result.reason for result in results if not result.ok} == {"Not enough gold"}
+    db.expire_all()
+    assert get_user_stats(db, user_id).current_gold == 0
+    assert get_quantity(db, "xp_boost_1h", user_id) == 2
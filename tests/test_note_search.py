@@ -0,0 +1,46 @@
+"""Notes search: word prefixes, every word required, tag and user scoping"""
+
+import pytest
+
+from database import Note, create_user
+from note_search import _sqlite_fts_available, search_notes
+
+
+@pytest.fixture
+def notes(db, user_id):
+    rows = [
+        Note(user_id=user_id, title="Morning meditation", content="Ten minutes of breathing", tags=["calm", "daily"]),
+        Note(user_id=user_id, title="Reading list", content="Meditations by Marcus Aurelius", tags=["books"]),
+        Note(user_id=user_id, title="Workout plan", content="Squats and running", tags=["daily", "fitness"]),
+    ]
+    db.add_all(rows)
+    db.commit()
+    return {note.title: note.id for note in rows}
+
+
+def _titles(page):
+    return sorted(hit.title for hit in page.hits)
+
+
+def test_search_uses_the_full_text_index(db, notes):
+    assert _sqlite_fts_available(db)
+
+
+def test_word_prefixes_match(db, user_id, notes):
+    assert _titles(search_notes(db, "medit", user_id)) == ["Morning meditation", "Reading list"]
+    assert _titles(search_notes(db, "MEDIT aurel", user_id)) == ["Reading list"]
+    assert _titles(search_notes(db, "squat", user_id)) == ["Workout plan"]
+    assert search_notes(db, "meditx", user_id).hits == []
+
+
+def test_tags_narrow_results(db, user_id, notes):
+    assert _titles(search_notes(db, "", user_id, tags=["daily"])) == ["Morning meditation", "Workout plan"]
+    assert _titles(search_notes(db, "", user_id, tags=["daily", "calm"])) == ["Morning meditation"]
+    assert _titles(search_notes(db, "medit", user_id, tags=["books"])) == ["Reading list"]
+    # A tag is matched whole, not as a substring of another tag
+    assert search_notes(db, "", user_id, tags=["fit"]).hits == []
+
+
+def test_other_users_notes_are_not_found(db, user_id, notes):
+    other = create_user(db, f"other-of-{user_id}")
+    assert search_notes(db, "medit", other.id).hits == []
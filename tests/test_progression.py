@@ -0,0 +1,83 @@
+"""complete_habit and complete_goal: idempotent, one commit, nothing left on rollback"""
+
+from datetime import date
+
+from database import Completion, DailyRollup, Goal, HabitStreak, SessionLocal, UserStats
+from progression import Progress, complete_goal, complete_habit
+from rollups import get_daily_xp
+
+DAY = date(2026, 3, 2)
+
+
+def stats_of(db, user_id):
+    db.expire_all()
+    return db.query(UserStats).filter(UserStats.user_id == user_id).one()
+
+
+def test_completing_twice_rewards_once(db, user_id, make_habit):
+    habit = make_habit()
+    first = complete_habit(db, habit, day=DAY)
+    second = complete_habit(db, habit, day=DAY)
+
+    assert first.created and first.xp > 0
+    assert not second.created and second.xp == 0
+    assert db.query(Completion).filter(Completion.habit_id == habit.id).count() == 1
+    assert stats_of(db, user_id).total_xp == first.xp + sum(a.xp_reward for a in first.unlocked)
+
+
+def test_racing_session_gets_no_rewards(db, user_id, make_habit):
+    habit = make_habit()
+    complete_habit(db, habit, day=DAY)
+    other = SessionLocal()
+    try:
+        assert not complete_habit(other, other.get(type(habit), habit.id), day=DAY).created
+    finally:
+        other.close()
+
+
+def test_rollback_leaves_nothing_behind(db, user_id, make_habit, monkeypatch):
+    habit = make_habit()
+
+    def fail(self):
+        self.emit()
+        raise RuntimeError("commit failed")
+    monkeypatch.setattr(Progress, "commit", fail)
+    try:
+        complete_habit(db, habit, day=DAY)
+    except RuntimeError:
+        db.rollback()
+    monkeypatch.undo()
+
+    assert db.query(Completion).filter(Completion.habit_id == habit.id).count() == 0
+    assert db.query(HabitStreak).filter(HabitStreak.habit_id == habit.id).count() == 0
+    assert db.query(DailyRollup).filter(DailyRollup.user_id == user_id).count() == 0
+    assert (stats_of(db, user_id).total_xp or 0) == 0
+    # And the habit can still be completed afterwards
+    assert complete_habit(db, habit, day=DAY).created
+
+
+def test_goal_completes_once_in_one_rollup(db, user_id):
+    goal = Goal(user_id=user_id, title="Run a marathon", difficulty=2)
+    db.add(goal)
+    db.commit()
+
+    first = complete_goal(db, goal, day=DAY)
+    assert first.created and first.xp > 0
+    assert not complete_goal(db, goal, day=DAY).created
+    assert goal.completed and goal.progress == 100
+    rollup = db.query(DailyRollup).filter(DailyRollup.user_id == user_id, DailyRollup.date == DAY).one()
+    assert rollup.goals_completed == 1
+    assert "goal_complete_1" in [a.key for a in first.unlocked]
+
+
+def test_achievement_rewards_book_to_the_triggering_day(db, user_id, make_habit):
+    habit = make_habit()
+    result = complete_habit(db, habit, day=DAY)
+    reward_xp = sum(a.xp_reward for a in result.unlocked)
+    assert reward_xp > 0
+
+    rollups = db.query(DailyRollup).filter(DailyRollup.user_id == user_id).all()
+    assert [rollup.date for rollup in rollups] == [DAY]
+    assert rollups[0].xp_earned == result.xp + reward_xp
+    assert rollups[0].achievement_xp == reward_xp
+    assert get_daily_xp(db, DAY, user_id) == result.xp
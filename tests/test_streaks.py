@@ -0,0 +1,87 @@
+"""Lapsed streaks are kept by streak protection, or broken without it"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from database import ActiveEffect, InventoryItem
+from effects import EFFECT_CACHE, add_charges
+from progression import complete_habit
+from streaks import SHIELD_COOLDOWN, get_streak_state
+
+START = date(2026, 3, 2)
+
+
+@pytest.fixture
+def owns(db, user_id):
+    def own(*item_ids):
+        for item_id in item_ids:
+            db.add(InventoryItem(user_id=user_id, item_id=item_id, quantity=1))
+        db.commit()
+        EFFECT_CACHE.invalidate(user_id)
+    return own
+
+
+def charges_left(db, user_id):
+    return sum(value for (value,) in db.query(ActiveEffect.value).filter(
+        ActiveEffect.user_id == user_id, ActiveEffect.effect_type == "streak_protection"
+    ))
+
+
+def two_day_streak(make_habit, db):
+    habit = make_habit()
+    complete_habit(db, habit, day=START)
+    complete_habit(db, habit, day=START + timedelta(days=1))
+    return habit
+
+
+def test_lapse_without_protection_restarts(db, user_id, make_habit):
+    habit = two_day_streak(make_habit, db)
+    assert complete_habit(db, habit, day=START + timedelta(days=4)).streak == 1
+
+
+def test_charges_cover_each_missed_day(db, user_id, make_habit):
+    habit = two_day_streak(make_habit, db)
+    add_charges(db, "streak_protection", 3, user_id=user_id)
+    db.commit()
+
+    assert complete_habit(db, habit, day=START + timedelta(days=4)).streak == 3
+    assert charges_left(db, user_id) == 1
+
+
+def test_too_few_charges_spend_nothing(db, user_id, make_habit):
+    habit = two_day_streak(make_habit, db)
+    add_charges(db, "streak_protection", 1, user_id=user_id)
+    db.commit()
+
+    assert complete_habit(db, habit, day=START + timedelta(days=4)).streak == 1
+    assert charges_left(db, user_id) == 1
+
+
+def test_reading_a_lapsed_streak_spends_shields(db, user_id, make_habit):
+    habit = two_day_streak(make_habit, db)
+    add_charges(db, "streak_protection", 1, user_id=user_id)
+    db.commit()
+
+    state = get_streak_state(db, habit.id, today=START + timedelta(days=3))
+    assert state.current_streak == 2
+    assert state.last_completed_date == START + timedelta(days=2)
+    assert charges_left(db, user_id) == 0
+
+
+def test_immunity_bridges_any_gap(db, user_id, make_habit, owns):
+    habit = two_day_streak(make_habit, db)
+    owns("shadow_armor")
+    assert complete_habit(db, habit, day=START + timedelta(days=10)).streak == 3
+
+
+def test_auto_shield_recharges_weekly(db, user_id, make_habit, owns):
+    habit = two_day_streak(make_habit, db)
+    owns("knight_armor")
+
+    assert complete_habit(db, habit, day=START + timedelta(days=3)).streak == 3
+    assert db.query(ActiveEffect).filter(
+        ActiveEffect.user_id == user_id, ActiveEffect.effect_type == SHIELD_COOLDOWN
+    ).count() == 1
+    # Still recharging: the next lapse breaks the streak
+    assert complete_habit(db, habit, day=START + timedelta(days=5)).streak == 1
@@ -0,0 +1,69 @@
+"""Ingested documents are retrievable; updates made during a rebuild are replayed, not lost"""
+
+import io
+
+from database import Note, PhilosophyDocument, SessionLocal
+from document_ingest import STATUS_DONE, process_document, queue_document, store_upload
+from vector_index import SOURCE_NOTE, SOURCE_PASSAGE, VECTOR_INDEX, VectorIndex, _SOURCE_CODES, retrieve
+
+
+def _live_notes(user_id):
+    store = VECTOR_INDEX.store(user_id)
+    rows = store.rows[:store.count]
+    rows = rows[rows["alive"] & (rows["source"] == _SOURCE_CODES[SOURCE_NOTE])]
+    return sorted(int(document_id) for document_id in rows["document_id"])
+
+
+def test_updates_during_a_rebuild_are_replayed(db, user_id, monkeypatch):
+    kept = Note(user_id=user_id, title="Stoic morning", content="Amor fati")
+    deleted = Note(user_id=user_id, title="Old draft", content="Scratch")
+    db.add_all([kept, deleted])
+    db.commit()
+    added = Note(user_id=user_id, title="Evening review", content="What went well")
+
+    add_rows = VectorIndex._add_rows
+
+    def add_rows_with_concurrent_updates(self, store, source, batch):
+        add_rows(self, store, source, batch)
+        if source == SOURCE_NOTE and batch:
+            # Another session edits notes while the rebuild is streaming
+            other = SessionLocal()
+            try:
+                other.delete(other.get(Note, deleted.id))
+                other.add(added)
+                other.commit()
+                VECTOR_INDEX.remove_note(user_id, deleted.id)
+                VECTOR_INDEX.index_note(added)
+                VECTOR_INDEX.index_note(other.get(Note, kept.id))
+            finally:
+                other.close()
+
+    monkeypatch.setattr(VectorIndex, "_add_rows", add_rows_with_concurrent_updates)
+    VECTOR_INDEX.rebuild(db, user_id)
+
+    store = VECTOR_INDEX.store(user_id)
+    assert not store.stale and not store.rebuilding
+    assert _live_notes(user_id) == sorted([kept.id, added.id])
+
+
+def test_ingested_passages_can_be_retrieved(db, user_id):
+    VECTOR_INDEX.rebuild(db, user_id)  # A new user's store starts stale
+    text = (
+        "On the shortness of life. We are not given a short life but we make it short.\n\n"
+        "Gardening notes. Tomatoes want full sun, deep watering and a sturdy cage."
+    )
+    document = PhilosophyDocument(
+        user_id=user_id, title="Seneca", file_name="seneca.txt", file_type="txt",
+        object_path=store_upload(io.BytesIO(text.encode()), "seneca.txt", user_id),
+    )
+    db.add(document)
+    db.flush()
+    queue_document(db, document)
+    db.commit()
+
+    assert process_document(db, document.id).status == STATUS_DONE
+    hits = retrieve(db, "shortness of life", user_id, k=1, sources=(SOURCE_PASSAGE,))
+
+    assert [(hit.document_id, hit.title) for hit in hits] == [(document.id, "Seneca")]
+    assert "shortness of life" in hits[0].text
+    assert hits[0].page == 1
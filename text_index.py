@@ -0,0 +1,156 @@
+"""
+Goal Quest Text Index - In-process inverted index with TF-IDF
+Documents are added as term counts and can be replaced or removed one at a
+time, so an edit only re-tokenizes the changed document. Themes, similar
+documents, free-text queries and term co-occurrence are answered from the
+postings without touching document text. Pure Python, no database.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+DocKey = Hashable  # e.g. ("note", 12)
+
+_TOKEN = re.compile(r"[a-z][a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each even every few for from
+further get got had has have having he her here hers herself him himself his how i if in into is
+it its itself just like make many me more most much must my myself need no nor not now of off on
+once one only or other our ours ourselves out over own really same she should so some still such
+than that the their theirs them themselves then there these they thing things this those through
+to too under until up upon us very was we well were what when where which while who whom why
+will with would yet you your yours yourself yourselves today day days time want going
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of three or more letters, stopwords and trailing 's removed"""
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        token = token.rstrip("'").removesuffix("'s")
+        if len(token) > 2 and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    return dict(Counter(tokenize(text)))
+
+
+class InvertedIndex:
+    """term -> {document: term frequency}, with TF-IDF scoring over the postings"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[DocKey, int]] = {}
+        self.documents: Dict[DocKey, Dict[str, int]] = {}
+        self._norms: Optional[Dict[DocKey, float]] = None  # Cleared whenever the corpus changes
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __contains__(self, key: DocKey) -> bool:
+        return key in self.documents
+
+    # ---- updates ----
+
+    def add(self, key: DocKey, counts: Dict[str, int]):
+        """Index a document's term counts, replacing any previous version"""
+        self.remove(key)
+        counts = {term: count for term, count in counts.items() if count > 0}
+        self.documents[key] = counts
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[key] = count
+        self._norms = None
+
+    def add_text(self, key: DocKey, text: str):
+        self.add(key, term_counts(text))
+
+    def remove(self, key: DocKey):
+        counts = self.documents.pop(key, None)
+        if counts is None:
+            return
+        for term in counts:
+            docs = self.postings[term]
+            del docs[key]
+            if not docs:
+                del self.postings[term]
+        self._norms = None
+
+    # ---- scoring ----
+
+    def idf(self, term: str) -> float:
+        """Smoothed inverse document frequency"""
+        return math.log((1 + len(self.documents)) / (1 + len(self.postings.get(term, ())))) + 1
+
+    def weight(self, term: str, count: int) -> float:
+        """Sublinear TF times IDF"""
+        return (1 + math.log(count)) * self.idf(term) if count > 0 else 0.0
+
+    def _norm(self, key: DocKey) -> float:
+        if self._norms is None:
+            idf = {term: self.idf(term) for term in self.postings}
+            self._norms = {
+                doc: math.sqrt(sum(((1 + math.log(c)) * idf[t]) ** 2 for t, c in counts.items())) or 1.0
+                for doc, counts in self.documents.items()
+            }
+        return self._norms.get(key, 1.0)
+
+    def top_terms(self, keys: Optional[Iterable[DocKey]] = None, k: int = 10) -> List[Tuple[str, float]]:
+        """Terms with the highest summed TF-IDF over some (default: all) documents"""
+        keys = self.documents.keys() if keys is None else [key for key in keys if key in self.documents]
+        scores: Counter = Counter()
+        for key in keys:
+            for term, count in self.documents[key].items():
+                scores[term] += self.weight(term, count)
+        return scores.most_common(k)
+
+    def _rank(self, query: Dict[str, float], k: int, exclude: Optional[DocKey] = None,
+              candidates: Optional[set] = None) -> List[Tuple[DocKey, float]]:
+        """Cosine similarity of a weighted query vector against documents sharing a term"""
+        query_norm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+        scores: Dict[DocKey, float] = {}
+        for term, query_weight in query.items():
+            for doc, count in self.postings.get(term, {}).items():
+                if doc == exclude or (candidates is not None and doc not in candidates):
+                    continue
+                scores[doc] = scores.get(doc, 0.0) + query_weight * self.weight(term, count)
+        ranked = [(doc, score / (query_norm * self._norm(doc))) for doc, score in scores.items()]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def similar(self, key: DocKey, k: int = 5, candidates: Optional[Iterable[DocKey]] = None) -> List[Tuple[DocKey, float]]:
+        """Documents most similar to an indexed document"""
+        counts = self.documents.get(key)
+        if not counts:
+            return []
+        query = {term: self.weight(term, count) for term, count in counts.items()}
+        return self._rank(query, k, exclude=key, candidates=set(candidates) if candidates is not None else None)
+
+    def query(self, text: str, k: int = 5, candidates: Optional[Iterable[DocKey]] = None) -> List[Tuple[DocKey, float]]:
+        """Documents most similar to free text"""
+        query = {term: self.weight(term, count) for term, count in term_counts(text).items()}
+        return self._rank(query, k, candidates=set(candidates) if candidates is not None else None)
+
+    def shared_terms(self, a: DocKey, b: DocKey, k: int = 5) -> List[str]:
+        """Terms two documents have in common, most distinctive first"""
+        first, second = self.documents.get(a, {}), self.documents.get(b, {})
+        common = [(term, min(first[term], second[term]) * self.idf(term)) for term in first.keys() & second.keys()]
+        common.sort(key=lambda item: item[1], reverse=True)
+        return [term for term, _ in common[:k]]
+
+    def cooccurring(self, term: str, k: int = 10, keys: Optional[Iterable[DocKey]] = None) -> List[Tuple[str, int]]:
+        """Terms appearing in the most documents together with `term`"""
+        docs = self.postings.get(term, {})
+        if keys is not None:
+            allowed = set(keys)
+            docs = {doc: count for doc, count in docs.items() if doc in allowed}
+        counts: Counter = Counter()
+        for doc in docs:
+            counts.update(self.documents[doc].keys())
+        counts.pop(term, None)
+        return counts.most_common(k)
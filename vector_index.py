@@ -0,0 +1,602 @@
+"""
+Goal Quest Vector Index - Local embedding retrieval over the philosophy library
+Document passages and notes are embedded on the CPU and stored per user as
+memory-mapped NumPy arrays under VECTOR_DIR, so the index survives restarts
+and is paged in by the OS rather than loaded into the heap. Small stores are
+searched exactly; large ones through an inverted-file (IVF) index that scores
+a few clusters of vectors, keeping top-k retrieval to a few milliseconds at
+100k passages. Passages are limited to documents marked use_for_ai.
+
+The embedder is pluggable (EMBEDDER environment variable). The default
+hashing embedder needs no model download or network; "sentence-transformers:<model>"
+uses that package when installed. Changing the embedder rebuilds the index on
+a background thread; until it finishes, retrieval returns nothing, and updates
+made meanwhile are queued and replayed on top of the rebuilt store.
+
+Rebuild from the database with: python vector_index.py rebuild [user_id ...]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sqlalchemy import tuple_
+
+from database import (
+    DocumentPassage, Note, PhilosophyDocument, User, SessionLocal, init_db, session_scope, DEFAULT_USER_ID
+)
+from text_index import term_counts
+
+logger = logging.getLogger(__name__)
+
+# sentence-transformers is optional and heavy - only imported when configured
+SENTENCE_TRANSFORMERS_AVAILABLE = find_spec("sentence_transformers") is not None
+
+VECTOR_DIR = os.environ.get("VECTOR_DIR", "./vectors")
+EMBEDDER_NAME = os.environ.get("EMBEDDER", "hashing")
+HASHING_DIM = 256
+INITIAL_CAPACITY = 1024
+EMBED_BATCH = 256
+COMPACT_RATIO = 0.5  # Rewrite the arrays once half the rows are deleted
+
+# Inverted-file (IVF) approximate search, used once a store is large
+IVF_MIN_ROWS = 20_000
+IVF_LISTS = 256
+IVF_PROBES = 32
+IVF_SAMPLE = 10_000  # Rows sampled to train the centroids
+IVF_ITERATIONS = 8
+
+SOURCE_PASSAGE = "passage"
+SOURCE_NOTE = "note"
+_SOURCE_CODES = {SOURCE_PASSAGE: 1, SOURCE_NOTE: 2}
+_SOURCE_NAMES = {code: name for name, code in _SOURCE_CODES.items()}
+
+# One row per vector: what it embeds and whether it is still live
+ROW_DTYPE = np.dtype([
+    ("source", "u1"), ("alive", "?"), ("document_id", "<i8"), ("position", "<i4"), ("list", "<i4"),
+])
+
+
+# ============ EMBEDDERS ============
+
+class Embedder(Protocol):
+    name: str  # Stored with the index; a different name forces a rebuild
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32 rows with unit length (or zero)"""
+
+
+class HashingEmbedder:
+    """Signed feature hashing of TF-weighted terms - deterministic, no model, no network"""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, count in term_counts(text).items():
+                bucket = zlib.crc32(term.encode("utf-8"))
+                sign = 1.0 if bucket & 0x80000000 else -1.0
+                vectors[row, bucket % self.dim] += sign * (1 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEmbedder:
+    """A sentence-transformers model run on the CPU, loaded on first use"""
+
+    def __init__(self, model_name: str):
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise ValueError("The sentence-transformers package is not installed")
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers:{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self._model.encode(
+            list(texts), batch_size=EMBED_BATCH, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def get_embedder(name: str = EMBEDDER_NAME) -> Embedder:
+    """The embedder for a configuration name: hashing, hashing-<dim> or sentence-transformers:<model>"""
+    if name == "hashing":
+        return HashingEmbedder()
+    if name.startswith("hashing-"):
+        return HashingEmbedder(int(name.split("-", 1)[1]))
+    if name.startswith("sentence-transformers:"):
+        return SentenceTransformerEmbedder(name.split(":", 1)[1])
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+# ============ STORAGE ============
+
+class VectorStore:
+    """
+    One user's vectors and row metadata as .npy memmaps plus a JSON header.
+    Rows are appended; deletes clear `alive` and compaction rewrites the files.
+
+    Past IVF_MIN_ROWS the store trains IVF_LISTS centroids (spherical k-means
+    on a sample) and tags every row with its nearest one; a search then scores
+    only the rows of the IVF_PROBES lists closest to the query instead of
+    scanning every vector.
+    """
+
+    def __init__(self, directory: str, embedder: Embedder):
+        self.directory = directory
+        self.embedder = embedder
+        self._lock = threading.RLock()
+        self.count = 0
+        self.dead = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None  # (row order, list offsets), rebuilt after changes
+        self.stale = False  # Created or reset: contents must be rebuilt from the database
+        self.rebuilding = False  # A rebuild is scheduled or running
+        self._pending: List[Tuple[str, tuple]] = []  # Updates made while rebuilding, replayed after it
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self):
+        header = None
+        if os.path.exists(self._path("header.json")):
+            with open(self._path("header.json")) as f:
+                header = json.load(f)
+        if not header or header.get("embedder") != self.embedder.name or header.get("dim") != self.embedder.dim:
+            self.reset()
+            self.stale = True
+            return
+        self.vectors = open_memmap(self._path("vectors.npy"), mode="r+")
+        self.rows = open_memmap(self._path("rows.npy"), mode="r+")
+        self.count = header["count"]
+        self.dead = header.get("dead", 0)
+        if header.get("lists"):
+            self.centroids = np.load(self._path("centroids.npy"))
+
+    def reset(self, capacity: int = INITIAL_CAPACITY):
+        """Empty the store"""
+        with self._lock:
+            self._allocate(capacity)
+            self.count = self.dead = 0
+            self.centroids = None
+            self._write_header()
+
+    def _allocate(self, capacity: int, keep=None):
+        """Write fresh arrays of `capacity` rows (optionally copying the kept rows) and swap them in"""
+        vectors = open_memmap(self._path("vectors.npy.tmp"), mode="w+", dtype=np.float32,
+                              shape=(capacity, self.embedder.dim))
+        rows = open_memmap(self._path("rows.npy.tmp"), mode="w+", dtype=ROW_DTYPE, shape=(capacity,))
+        if keep is not None:
+            kept = self.rows[keep]
+            vectors[:len(kept)] = self.vectors[keep]
+            rows[:len(kept)] = kept
+        vectors.flush()
+        rows.flush()
+        del vectors, rows
+        self.vectors = self.rows = None
+        os.replace(self._path("vectors.npy.tmp"), self._path("vectors.npy"))
+        os.replace(self._path("rows.npy.tmp"), self._path("rows.npy"))
+        self.vectors = open_memmap(self._path("vectors.npy"), mode="r+")
+        self.rows = open_memmap(self._path("rows.npy"), mode="r+")
+        self._lists = None
+
+    def _write_header(self):
+        self.vectors.flush()
+        self.rows.flush()
+        with open(self._path("header.json.tmp"), "w") as f:
+            json.dump({"embedder": self.embedder.name, "dim": self.embedder.dim, "count": self.count,
+                       "dead": self.dead, "lists": 0 if self.centroids is None else len(self.centroids)}, f)
+        os.replace(self._path("header.json.tmp"), self._path("header.json"))
+
+    def add(self, source: str, document_ids, positions: Sequence[int], vectors: np.ndarray):
+        """
+        Append vectors; document_ids is one id for all rows or one per row.
+        Queued while rebuilding; skipped while stale, as the next rebuild reads them.
+        """
+        with self._lock:
+            if self.rebuilding:
+                self._pending.append(("add", (source, document_ids, positions, vectors)))
+            elif not self.stale:
+                self._append(source, document_ids, positions, vectors)
+
+    def _append(self, source: str, document_ids, positions: Sequence[int], vectors: np.ndarray):
+        if not len(positions):
+            return
+        with self._lock:
+            needed = self.count + len(positions)
+            if needed > len(self.rows):
+                self._allocate(max(needed, 2 * len(self.rows)), keep=slice(0, self.count))
+            end = self.count + len(positions)
+            self.vectors[self.count:end] = vectors
+            rows = self.rows[self.count:end]
+            rows["source"] = _SOURCE_CODES[source]
+            rows["alive"] = True
+            rows["document_id"] = document_ids
+            rows["position"] = positions
+            if self.centroids is not None:
+                rows["list"] = self._nearest_lists(vectors)
+            self.count = end
+            self._lists = None
+            if self.centroids is None and self.count - self.dead >= IVF_MIN_ROWS:
+                self.train()
+            self._write_header()
+
+    def remove(self, source: str, document_id: int) -> int:
+        """
+        Drop every vector of one note or document. Returns how many were live.
+        Queued while rebuilding (returning 0); skipped while stale.
+        """
+        with self._lock:
+            if self.rebuilding:
+                self._pending.append(("remove", (source, document_id)))
+                return 0
+            if self.stale:
+                return 0
+            return self._remove(source, document_id)
+
+    def _remove(self, source: str, document_id: int) -> int:
+        with self._lock:
+            rows = self.rows[:self.count]
+            match = rows["alive"] & (rows["source"] == _SOURCE_CODES[source]) & (rows["document_id"] == document_id)
+            removed = int(match.sum())
+            if removed:
+                rows["alive"][match] = False
+                self.dead += removed
+                if self.dead > COMPACT_RATIO * self.count:
+                    self.compact()
+                else:
+                    self._write_header()
+            return removed
+
+    def _replace(self, source: str, document_ids, positions: Sequence[int], vectors: np.ndarray):
+        """Append vectors, first dropping live rows for the same (document, position)"""
+        with self._lock:
+            ids = np.broadcast_to(np.asarray(document_ids, dtype=np.int64), (len(positions),))
+            keys = set(zip(ids.tolist(), [int(position) for position in positions]))
+            rows = self.rows[:self.count]
+            candidates = np.flatnonzero(
+                rows["alive"] & (rows["source"] == _SOURCE_CODES[source]) & np.isin(rows["document_id"], ids)
+            )
+            duplicates = [
+                i for i in candidates if (int(rows["document_id"][i]), int(rows["position"][i])) in keys
+            ]
+            if duplicates:
+                rows["alive"][duplicates] = False
+                self.dead += len(duplicates)
+            self._append(source, document_ids, positions, vectors)
+
+    def finish_rebuild(self):
+        """
+        Replay the updates queued during a rebuild and open the store again.
+        Adds replace rows the rebuild already read, so replaying is idempotent.
+        """
+        with self._lock:
+            for operation, args in self._pending:
+                if operation == "add":
+                    self._replace(*args)
+                else:
+                    self._remove(*args)
+            self._pending = []
+            self.stale = self.rebuilding = False
+            self._write_header()
+
+    def abandon_rebuild(self):
+        """A failed rebuild: drop the queue and leave the store stale for the next attempt"""
+        with self._lock:
+            self._pending = []
+            self.rebuilding = False
+
+    def compact(self):
+        """Rewrite the arrays without deleted rows (list assignments are kept)"""
+        with self._lock:
+            keep = np.flatnonzero(self.rows["alive"][:self.count])
+            self._allocate(max(INITIAL_CAPACITY, 2 * len(keep)), keep=keep)
+            self.count, self.dead = len(keep), 0
+            self._write_header()
+
+    # ---- IVF ----
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def train(self):
+        """Fit the IVF centroids on a sample of live rows and assign every row to one"""
+        with self._lock:
+            live = np.flatnonzero(self.rows["alive"][:self.count])
+            rng = np.random.default_rng(0)
+            sample = np.asarray(self.vectors[np.sort(rng.choice(live, min(len(live), IVF_SAMPLE), replace=False))])
+            centroids = sample[rng.choice(len(sample), min(IVF_LISTS, len(sample)), replace=False)]
+            for _ in range(IVF_ITERATIONS):
+                assigned = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assigned, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = np.where(norms > 0, sums / np.where(norms > 0, norms, 1.0), centroids)
+            self.centroids = centroids.astype(np.float32)
+            for start in range(0, self.count, IVF_SAMPLE):
+                end = min(start + IVF_SAMPLE, self.count)
+                self.rows["list"][start:end] = self._nearest_lists(self.vectors[start:end])
+            with open(self._path("centroids.npy.tmp"), "wb") as f:
+                np.save(f, self.centroids)
+            os.replace(self._path("centroids.npy.tmp"), self._path("centroids.npy"))
+            self._lists = None
+            self._write_header()
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Row indices grouped by list, and where each list starts"""
+        with self._lock:
+            if self._lists is None:
+                lists = self.rows["list"][:self.count]
+                order = np.argsort(lists, kind="stable")
+                offsets = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1))
+                self._lists = (order, offsets)
+            return self._lists
+
+    # ---- search ----
+
+    def search(self, query: np.ndarray, k: int, sources: Iterable[str],
+               documents: Optional[np.ndarray] = None) -> List[Tuple[str, int, int, float]]:
+        """
+        (source, document_id, position, cosine) of the k best live rows.
+        `documents` limits passages to those document ids; notes are not limited.
+        """
+        with self._lock:
+            count, centroids = self.count, self.centroids
+            vectors, rows = self.vectors, self.rows
+            lists = self._inverted_lists() if centroids is not None else None
+        if not count or k < 1:
+            return []
+        codes = [_SOURCE_CODES[source] for source in sources]
+        if lists is None:
+            return self._score(vectors, rows, np.arange(count), query, k, codes, documents)
+
+        # Probe more lists until enough rows survive the filters
+        order, offsets = lists
+        ranked_lists = np.argsort(-(centroids @ query))
+        probes = IVF_PROBES
+        while True:
+            probed = ranked_lists[:probes]
+            candidates = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in probed])
+            candidates.sort()  # Sequential reads from the memmap
+            found = self._score(vectors, rows, candidates, query, k, codes, documents)
+            if len(found) >= k or probes >= len(centroids):
+                return found
+            probes *= 4
+
+    @staticmethod
+    def _score(vectors, rows, candidates: np.ndarray, query: np.ndarray, k: int,
+               codes: List[int], documents: Optional[np.ndarray]) -> List[Tuple[str, int, int, float]]:
+        meta = rows[candidates]
+        allowed = meta["alive"] & np.isin(meta["source"], codes)
+        if documents is not None:
+            allowed &= (meta["source"] != _SOURCE_CODES[SOURCE_PASSAGE]) | np.isin(meta["document_id"], documents)
+        candidates, meta = candidates[allowed], meta[allowed]
+        if not len(candidates):
+            return []
+        if candidates[-1] - candidates[0] + 1 == len(candidates):  # A contiguous run: slice, don't gather
+            scores = vectors[candidates[0]:candidates[-1] + 1] @ query
+        else:
+            scores = vectors[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (_SOURCE_NAMES[int(meta["source"][i])], int(meta["document_id"][i]), int(meta["position"][i]), float(scores[i]))
+            for i in top if scores[i] > 0
+        ]
+
+
+class VectorIndex:
+    """Per-process cache of each user's vector store"""
+
+    def __init__(self, directory: str = VECTOR_DIR, embedder_name: str = EMBEDDER_NAME):
+        self.directory = directory
+        self.embedder_name = embedder_name
+        self._lock = threading.Lock()
+        self._stores: Dict[int, VectorStore] = {}
+
+    @property
+    def embedder(self) -> Embedder:
+        return get_embedder(self.embedder_name)
+
+    def store(self, user_id: int = DEFAULT_USER_ID) -> VectorStore:
+        with self._lock:
+            store = self._stores.get(user_id)
+            if store is None:
+                store = VectorStore(os.path.join(self.directory, str(user_id)), self.embedder)
+                self._stores[user_id] = store
+            return store
+
+    def _embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.concatenate([
+            self.embedder.embed(texts[start:start + EMBED_BATCH]) for start in range(0, len(texts), EMBED_BATCH)
+        ]) if texts else np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+    # ---- updates (call after the rows they describe are committed) ----
+
+    def add_passages(self, user_id: int, document_id: int, passages: Sequence[Tuple[int, str]]):
+        """Embed (position, text) passages of a document"""
+        self.store(user_id).add(
+            SOURCE_PASSAGE, document_id, [position for position, _ in passages],
+            self._embed([text for _, text in passages])
+        )
+
+    def remove_document(self, user_id: int, document_id: int):
+        self.store(user_id).remove(SOURCE_PASSAGE, document_id)
+
+    def index_note(self, note: Note):
+        """Embed a note, replacing its previous vector"""
+        store = self.store(note.user_id)
+        store.remove(SOURCE_NOTE, note.id)
+        store.add(SOURCE_NOTE, note.id, [0], self._embed([f"{note.title or ''}\n{note.content or ''}"]))
+
+    def remove_note(self, user_id: int, note_id: int):
+        self.store(user_id).remove(SOURCE_NOTE, note_id)
+
+    def rebuild(self, db, user_id: int = DEFAULT_USER_ID) -> int:
+        """
+        Re-embed all of a user's notes and passages, streaming them in batches.
+        Returns rows indexed. The store stays stale, so searches skip it, until
+        the rebuild completes; updates from other threads are queued meanwhile
+        and replayed at the end, so none made during the rebuild are lost.
+        """
+        store = self.store(user_id)
+        with store._lock:
+            store.stale = store.rebuilding = True
+            store.reset()
+        try:
+            notes = db.query(Note.id, Note.title, Note.content).filter(Note.user_id == user_id)
+            passages = db.query(DocumentPassage.document_id, DocumentPassage.position, DocumentPassage.text).filter(
+                DocumentPassage.user_id == user_id
+            )
+            for source, query in ((SOURCE_NOTE, notes), (SOURCE_PASSAGE, passages)):
+                batch = []
+                for row in query.yield_per(EMBED_BATCH):
+                    batch.append(row)
+                    if len(batch) == EMBED_BATCH:
+                        self._add_rows(store, source, batch)
+                        batch = []
+                self._add_rows(store, source, batch)
+        except Exception:
+            store.abandon_rebuild()
+            raise
+        store.finish_rebuild()
+        return store.count
+
+    def rebuild_in_background(self, user_id: int = DEFAULT_USER_ID):
+        """Start a rebuild of a stale store on a daemon thread, unless one is already running"""
+        store = self.store(user_id)
+        with store._lock:
+            if not store.stale or store.rebuilding:
+                return
+            store.rebuilding = True
+
+        def run():
+            try:
+                with session_scope() as db:
+                    self.rebuild(db, user_id)
+            except Exception as e:
+                store.abandon_rebuild()
+                logger.warning("Vector index rebuild for user %s failed: %s", user_id, e)
+
+        threading.Thread(target=run, name=f"vector-rebuild-{user_id}", daemon=True).start()
+
+    def _add_rows(self, store: VectorStore, source: str, batch: List[tuple]):
+        if not batch:
+            return
+        if source == SOURCE_NOTE:
+            ids, positions = [row[0] for row in batch], [0] * len(batch)
+            texts = [f"{title or ''}\n{content or ''}" for _, title, content in batch]
+        else:
+            ids, positions, texts = [row[0] for row in batch], [row[1] for row in batch], [row[2] for row in batch]
+        store._append(source, ids, positions, self._embed(texts))
+
+
+VECTOR_INDEX = VectorIndex()
+
+
+# ============ RETRIEVAL ============
+
+@dataclass
+class Retrieved:
+    source: str  # passage or note
+    document_id: int  # PhilosophyDocument id, or the note id
+    position: int
+    score: float
+    title: str = ""
+    text: str = ""
+    page: Optional[int] = None
+
+
+def retrieve(db, query: str, user_id: int = DEFAULT_USER_ID, k: int = 5,
+             sources: Sequence[str] = (SOURCE_PASSAGE, SOURCE_NOTE)) -> List[Retrieved]:
+    """
+    The user's passages (from documents used for AI) and notes closest to a
+    query. Empty while the user's store is being rebuilt in the background.
+    """
+    store = VECTOR_INDEX.store(user_id)
+    if store.stale:
+        VECTOR_INDEX.rebuild_in_background(user_id)
+        return []
+    vector = VECTOR_INDEX.embedder.embed([query])[0]
+    if not vector.any():
+        return []
+    documents = np.fromiter(
+        (doc_id for (doc_id,) in db.query(PhilosophyDocument.id).filter(
+            PhilosophyDocument.user_id == user_id, PhilosophyDocument.use_for_ai.is_(True)
+        )), dtype=np.int64
+    )
+    hits = [Retrieved(*hit) for hit in store.search(vector, k, sources, documents)]
+
+    passage_keys = [(hit.document_id, hit.position) for hit in hits if hit.source == SOURCE_PASSAGE]
+    note_ids = [hit.document_id for hit in hits if hit.source == SOURCE_NOTE]
+    passages, notes = {}, {}
+    if passage_keys:
+        passages = {
+            (row.document_id, row.position): row
+            for row in db.query(
+                DocumentPassage.document_id, DocumentPassage.position, DocumentPassage.page,
+                DocumentPassage.text, PhilosophyDocument.title
+            ).join(PhilosophyDocument, PhilosophyDocument.id == DocumentPassage.document_id).filter(
+                DocumentPassage.user_id == user_id,
+                tuple_(DocumentPassage.document_id, DocumentPassage.position).in_(passage_keys)
+            )
+        }
+    if note_ids:
+        notes = {
+            row.id: row for row in db.query(Note.id, Note.title, Note.content).filter(
+                Note.user_id == user_id, Note.id.in_(note_ids)
+            )
+        }
+
+    results = []
+    for hit in hits:
+        if hit.source == SOURCE_PASSAGE and (hit.document_id, hit.position) in passages:
+            row = passages[(hit.document_id, hit.position)]
+            hit.title, hit.text, hit.page = row.title, row.text, row.page
+        elif hit.source == SOURCE_NOTE and hit.document_id in notes:
+            row = notes[hit.document_id]
+            hit.title, hit.text = row.title, row.content or ""
+        else:
+            continue  # Deleted since it was indexed
+        results.append(hit)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal Quest vector index maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Re-embed notes and passages from the database")
+    rebuild.add_argument("user_ids", nargs="*", type=int)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        for user_id in args.user_ids or [user_id for (user_id,) in db.query(User.id)]:
+            indexed = VECTOR_INDEX.rebuild(db, user_id)
+            print(f"User {user_id}: indexed {indexed} vectors with {VECTOR_INDEX.embedder.name}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()